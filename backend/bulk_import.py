@@ -0,0 +1,248 @@
+"""Streaming bulk import of listings from NDJSON or CSV.
+
+Rows are read one at a time, validated in chunks and applied as `bulk_write`
+upserts keyed on `id`, so memory stays flat whatever the input size.
+Re-running an import is idempotent: unchanged rows are matched but not
+modified, and `updated_at` only moves when a field actually changed.
+
+    python bulk_import.py import listings.ndjson
+    python bulk_import.py import listings.csv --ordered
+    python bulk_import.py generate 100000 > synthetic.ndjson
+
+CSV files use the listing field names as headers; `features` is a
+`|`-separated list.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional, TextIO, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from catalog_sync import CatalogChangeLog
+from http_cache import CatalogRevision
+from models import MCPServerImport
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+FEATURE_SEPARATOR = "|"
+
+
+def detect_format(path: str) -> str:
+    return CSV if path.lower().endswith(".csv") else NDJSON
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield `(row_number, row)` pairs; unparseable rows yield the exception instead"""
+    if fmt == CSV:
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            row = {key: value for key, value in row.items() if key and value != ""}
+            if "features" in row:
+                row["features"] = [f.strip() for f in row["features"].split(FEATURE_SEPARATOR) if f.strip()]
+            yield number, row
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+
+def listing_id(row: dict) -> str:
+    """Rows without an id get a stable one derived from their official URL"""
+    return row.get("id") or str(uuid.uuid5(uuid.NAMESPACE_URL, row["official_url"]))
+
+
+def listing_fields(doc: dict) -> dict:
+    """The fields an import writes; timestamps are managed by the upsert"""
+    return {key: value for key, value in doc.items() if key not in ("created_at", "updated_at")}
+
+
+def upsert_operation(doc: dict, now: datetime) -> UpdateOne:
+    """Upsert keyed on id that leaves timestamps alone when nothing changed"""
+    fields = listing_fields(doc)
+    changed = {"$or": [{"$ne": [f"${key}", {"$literal": value}]} for key, value in fields.items()]}
+    return UpdateOne({"id": doc["id"]}, [{"$set": {
+        **{key: {"$literal": value} for key, value in fields.items()},
+        "created_at": {"$ifNull": ["$created_at", now]},
+        "updated_at": {"$cond": [changed, now, {"$ifNull": ["$updated_at", now]}]},
+    }}], upsert=True)
+
+
+class BulkImporter:
+    def __init__(
+        self,
+        collection,
+        model: Type[BaseModel],
+        chunk_size: int = 1000,
+        ordered: bool = False,
+        max_errors: int = 1000,
+        on_chunk: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    ):
+        self.collection = collection
+        self.model = model
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.max_errors = max_errors
+        self.on_chunk = on_chunk
+        self.report = {"received": 0, "inserted": 0, "updated": 0, "unchanged": 0, "failed": 0, "errors": []}
+
+    def _error(self, row: int, error: str, server_id: Optional[str] = None):
+        self.report["failed"] += 1
+        if len(self.report["errors"]) < self.max_errors:
+            self.report["errors"].append({"row": row, "id": server_id, "error": error})
+
+    def _validate(self, number: int, row) -> Optional[dict]:
+        if isinstance(row, Exception):
+            self._error(number, f"Invalid {NDJSON} line: {row}")
+            return None
+        if not isinstance(row, dict):
+            self._error(number, "Row must be an object")
+            return None
+        try:
+            doc = self.model(**row).dict()
+            doc["id"] = listing_id(doc)
+        except (ValidationError, KeyError, TypeError) as exc:
+            self._error(number, str(exc), row.get("id"))
+            return None
+        return doc
+
+    async def _changed(self, chunk: List[Tuple[int, dict]]) -> set:
+        """Indexes of the chunk's rows that differ from the stored listing"""
+        ids = [doc["id"] for _, doc in chunk]
+        stored = {doc["id"]: doc async for doc in self.collection.find({"id": {"$in": ids}}, {"_id": 0})}
+        return {
+            index for index, (_, doc) in enumerate(chunk)
+            if doc["id"] not in stored
+            or any(stored[doc["id"]].get(key) != value for key, value in listing_fields(doc).items())
+        }
+
+    async def _write(self, chunk: List[Tuple[int, dict]]) -> bool:
+        """Apply one chunk; returns False if an ordered import must stop"""
+        # Read before writing, so `on_chunk` only sees rows the write actually changed
+        changed = await self._changed(chunk) if self.on_chunk else set()
+        now = datetime.utcnow()
+        operations = [upsert_operation(doc, now) for _, doc in chunk]
+        failed = set()
+        try:
+            result = await self.collection.bulk_write(operations, ordered=self.ordered)
+            details = result.bulk_api_result
+        except BulkWriteError as exc:
+            details = exc.details
+            for error in details["writeErrors"]:
+                number, doc = chunk[error["index"]]
+                failed.add(error["index"])
+                self._error(number, error.get("errmsg", "write failed"), doc["id"])
+            if self.ordered:
+                # Rows after the failing one were never attempted
+                for index in range(max(failed) + 1, len(chunk)):
+                    number, doc = chunk[index]
+                    failed.add(index)
+                    self._error(number, "Not attempted after an earlier error (ordered import)", doc["id"])
+
+        self.report["inserted"] += details["nUpserted"]
+        self.report["updated"] += details["nModified"]
+        self.report["unchanged"] += details["nMatched"] - details["nModified"]
+        if self.on_chunk:
+            upserted = {entry["index"] for entry in details["upserted"]}
+            modified = changed - upserted - failed
+            if details["nModified"] > len(modified):
+                # A concurrent write changed rows after they were read; pass every written row
+                modified = set(range(len(chunk))) - upserted - failed
+            await self.on_chunk([doc for index, (_, doc) in enumerate(chunk) if index in upserted or index in modified])
+        return not (self.ordered and failed)
+
+    async def run(self, rows: Iterable[Tuple[int, object]]) -> dict:
+        chunk: List[Tuple[int, dict]] = []
+        for number, row in rows:
+            self.report["received"] += 1
+            doc = self._validate(number, row)
+            if doc is None:
+                if self.ordered:
+                    if chunk:
+                        await self._write(chunk)
+                    return self.report
+                continue
+            chunk.append((number, doc))
+            if len(chunk) >= self.chunk_size:
+                if not await self._write(chunk):
+                    return self.report
+                chunk = []
+        if chunk:
+            await self._write(chunk)
+        return self.report
+
+
+def change_logger(db) -> Callable[[List[dict]], Awaitable[None]]:
+    """An `on_chunk` callback for writers outside the API: bump the catalog revision and log the ids"""
+    revision, change_log = CatalogRevision(db), CatalogChangeLog(db)
+
+    async def log_chunk(servers):
+        # Running API workers replay logged chunks into their indexes and caches
+        if servers:
+            await change_log.append(await revision.bump(), [server["id"] for server in servers])
+
+    return log_chunk
+
+
+async def _import(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    importer = BulkImporter(db.mcp_servers, MCPServerImport, chunk_size=args.chunk_size, ordered=args.ordered,
+                            on_chunk=change_logger(db))
+    try:
+        with open(args.path, newline="", encoding="utf-8") as stream:
+            report = await importer.run(read_rows(stream, args.format or detect_format(args.path)))
+    finally:
+        client.close()
+    for error in report.pop("errors"):
+        print(f"row {error['row']} ({error['id']}): {error['error']}", file=sys.stderr)
+    print(json.dumps(report))
+    return 1 if report["failed"] else 0
+
+
+def _generate(args):
+    from seed_data import generate_servers
+
+    for server in generate_servers(args.count, seed=args.seed):
+        sys.stdout.write(json.dumps(server) + "\n")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import MCP server listings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_cmd = commands.add_parser("import", help="upsert listings from an NDJSON or CSV file")
+    import_cmd.add_argument("path")
+    import_cmd.add_argument("--format", choices=[NDJSON, CSV], help="defaults to the file extension")
+    import_cmd.add_argument("--ordered", action="store_true", help="stop at the first invalid or failed row")
+    import_cmd.add_argument("--chunk-size", type=int, default=1000)
+
+    generate_cmd = commands.add_parser("generate", help="write N synthetic listings as NDJSON to stdout")
+    generate_cmd.add_argument("count", type=int)
+    generate_cmd.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+    if args.command == "import":
+        return asyncio.run(_import(args))
+    return _generate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
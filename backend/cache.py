@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+def make_key(endpoint: str, **params) -> Tuple:
+    """Build a cache key from an endpoint name and its query parameters.
+
+    Parameters left at None are dropped and enums are reduced to their value,
+    so equivalent requests share a key regardless of argument order.
+    """
+    normalized = tuple(sorted(
+        (name, getattr(value, "value", value))
+        for name, value in params.items()
+        if value is not None
+    ))
+    return (endpoint, normalized)
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire `ttl` seconds after being stored.
+
+    `get_or_load` collapses concurrent misses on the same key into a single
+    call of the loader. Any invalidation bumps a generation counter, and a
+    load that started before it is returned to its callers but not stored,
+    so a write can never be overwritten by a read that raced it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.coalesced = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return `(found, value)` without counting towards hit/miss metrics"""
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._generation
+        try:
+            value = await loader()
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        if generation == self._generation:
+            self.set(key, value)
+        future.set_result(value)
+        return value
+
+    async def get_or_load_many(
+        self, keys: List[Hashable], loader: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+    ) -> Dict[Hashable, Any]:
+        """Look up several keys, loading all misses with one call of `loader`.
+
+        `loader` receives the missing keys and returns a dict of the values it
+        found; keys it leaves out are cached as None. Misses are not coalesced
+        with concurrent single-key loads.
+        """
+        values = {}
+        missing = []
+        for key in keys:
+            found, value = self.get(key)
+            if found:
+                values[key] = value
+            else:
+                missing.append(key)
+        self.hits += len(values)
+        self.misses += len(missing)
+        if missing:
+            generation = self._generation
+            loaded = await loader(missing)
+            for key in missing:
+                values[key] = loaded.get(key)
+                if generation == self._generation:
+                    self.set(key, values[key])
+        return values
+
+    def invalidate(self, key: Hashable):
+        self._generation += 1
+        self.invalidations += 1
+        self._data.pop(key, None)
+
+    def invalidate_endpoint(self, endpoint: str):
+        """Drop every entry cached for an endpoint, whatever its parameters"""
+        self._generation += 1
+        self.invalidations += 1
+        for key in [key for key in self._data if key[0] == endpoint]:
+            del self._data[key]
+
+    def clear(self):
+        self._generation += 1
+        self.invalidations += 1
+        self._data.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
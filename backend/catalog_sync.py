@@ -0,0 +1,221 @@
+"""Keeps every worker's in-memory catalog structures coherent.
+
+Each listing write bumps the catalog revision and appends one document to
+`catalog_changes` naming the listings it touched. Every worker polls that
+log, re-reads the touched listings from the primary and applies them to its
+own indexes and caches, so all workers converge within about one poll
+interval of a write, whichever worker served it.
+
+A worker only advances its revision (and with it the catalog ETag) once it
+has applied every change up to that revision. Writers bump the counter
+before appending to the log, so a revision can briefly be missing from the
+log; the poller waits for it, and if it has not appeared after
+`gap_timeout` seconds (the writer died in between, or the entry expired)
+it rebuilds everything from the database instead.
+
+The same log backs the public change feed (`read_changes`): consumers hold
+a revision token and receive the listings touched since, or are told to
+resync once the log no longer covers their token.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from http_cache import CatalogRevision
+
+logger = logging.getLogger(__name__)
+
+CHANGES_COLLECTION = "catalog_changes"
+
+
+class CatalogChangeLog:
+    """One document per catalog revision listing the ids it touched"""
+
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db[CHANGES_COLLECTION]
+
+    async def append(self, revision: int, server_ids: Iterable[str]):
+        await self.collection.insert_one({"revision": revision, "ids": list(server_ids), "at": datetime.utcnow()})
+
+    async def since(self, revision: int, limit: int = 100) -> List[dict]:
+        cursor = self.collection.find({"revision": {"$gt": revision}}, {"_id": 0})
+        return await cursor.sort("revision", 1).limit(limit).to_list(limit)
+
+    async def oldest(self) -> Optional[int]:
+        """The oldest revision still retained"""
+        doc = await self.collection.find_one({}, {"revision": 1}, sort=[("revision", 1)])
+        return doc["revision"] if doc else None
+
+    async def revision_at(self, at: datetime) -> Optional[int]:
+        """The last revision logged at or before `at`"""
+        doc = await self.collection.find_one({"at": {"$lte": at}}, {"revision": 1}, sort=[("at", -1)])
+        return doc["revision"] if doc else None
+
+
+class ChangesExpired(Exception):
+    """The log no longer covers a token, so its holder has to resync"""
+
+
+class ChangeBatch(NamedTuple):
+    revisions: Dict[str, int]  # listing id -> last revision that touched it, in revision order
+    revision: int  # token for the next read
+    has_more: bool
+
+
+async def read_changes(log: CatalogChangeLog, since: int, max_ids: int, gap_timeout: float) -> ChangeBatch:
+    """Listings touched by the contiguous run of revisions after `since`.
+
+    Stops before a revision that is not in the log yet; raises ChangesExpired
+    when it has expired, or stayed missing for `gap_timeout` seconds (its
+    writer died before logging it). A revision is never split across
+    batches, so one may exceed `max_ids`.
+    """
+    entries = await log.since(since, max_ids)
+    revisions: Dict[str, int] = {}
+    revision = since
+    for entry in entries:
+        if entry["revision"] != revision + 1:
+            if revision == since:
+                await _check_gap(log, since, entry, gap_timeout)
+            return ChangeBatch(revisions, revision, False)
+        touched = set(entry["ids"]) - revisions.keys()
+        if revisions and len(revisions) + len(touched) > max_ids:
+            return ChangeBatch(revisions, revision, True)
+        for server_id in entry["ids"]:
+            revisions.pop(server_id, None)
+            revisions[server_id] = entry["revision"]
+        revision = entry["revision"]
+    return ChangeBatch(revisions, revision, len(entries) == max_ids)
+
+
+async def _check_gap(log: CatalogChangeLog, since: int, entry: dict, gap_timeout: float):
+    oldest = await log.oldest()
+    if oldest is not None and oldest > since + 1:
+        raise ChangesExpired(f"Revision {since + 1} has expired from the change log")
+    if datetime.utcnow() - entry["at"] > timedelta(seconds=gap_timeout):
+        raise ChangesExpired(f"Revision {since + 1} was never logged")
+
+
+class CatalogSync:
+    """Polls the change log and replays other workers' writes locally.
+
+    `apply` receives the ids touched by a run of revisions and must bring
+    local structures up to date with the database. `resync` rebuilds them
+    from scratch. Replaying this worker's own writes is harmless, so the
+    log is applied in full rather than filtered by origin.
+    """
+
+    def __init__(
+        self,
+        log: CatalogChangeLog,
+        revision: CatalogRevision,
+        apply: Callable[[List[str]], Awaitable[None]],
+        resync: Callable[[], Awaitable[None]],
+        interval: float = 0.5,
+        gap_timeout: float = 5.0,
+        batch_size: int = 100,
+    ):
+        self.log = log
+        self.revision = revision
+        self.apply = apply
+        self.resync = resync
+        self.interval = interval
+        self.gap_timeout = gap_timeout
+        self.batch_size = batch_size
+        self.applied = revision.value
+        self.polls = 0
+        self.changes_applied = 0
+        self.resyncs = 0
+        self.failures = 0
+        self.last_change_at: Optional[datetime] = None
+        self._gap_since: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll(self) -> int:
+        """Catch up with the shared revision; return how many revisions were applied.
+
+        An idle poll costs one read of the revision counter.
+        """
+        async with self._lock:
+            self.polls += 1
+            target = await self.revision.current()
+            applied = 0
+            while self.applied < target:
+                entries = await self.log.since(self.applied, self.batch_size)
+                run = []
+                for entry in entries:
+                    if entry["revision"] != self.applied + len(run) + 1:
+                        break
+                    run.append(entry)
+                if not run:
+                    await self._wait_for_gap(self.applied + 1)
+                    return applied
+                self._gap_since = None
+                await self.apply(sorted({server_id for entry in run for server_id in entry["ids"]}))
+                self._advance(run[-1]["revision"])
+                self.last_change_at = run[-1]["at"]
+                self.changes_applied += len(run)
+                applied += len(run)
+            self._gap_since = None
+            return applied
+
+    async def _wait_for_gap(self, missing: int):
+        now = time.monotonic()
+        if self._gap_since is None:
+            self._gap_since = now
+        elif now - self._gap_since > self.gap_timeout:
+            logger.warning("Catalog revision %d never reached the change log, resyncing", missing)
+            await self._resync()
+
+    async def _resync(self):
+        # Read the revision first: anything written after it is replayed by the next poll
+        current = await self.revision.current()
+        await self.resync()
+        self.resyncs += 1
+        self._gap_since = None
+        self._advance(current)
+
+    def _advance(self, revision: int):
+        self.applied = max(self.applied, revision)
+        self.revision.observe(self.applied)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to poll the catalog change log")
+
+    def start(self):
+        self.applied = max(self.applied, self.revision.value)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "revision": self.applied,
+            "polls": self.polls,
+            "changes_applied": self.changes_applied,
+            "resyncs": self.resyncs,
+            "failures": self.failures,
+            "waiting_for_revision": self.applied + 1 if self._gap_since is not None else None,
+            "seconds_since_last_change": (datetime.utcnow() - self.last_change_at).total_seconds() if self.last_change_at else None,
+        }
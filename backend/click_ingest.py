@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when a click could not be queued within the backpressure timeout"""
+
+
+class ClickIngestQueue:
+    """Buffers click events in memory and writes them to Mongo in batches.
+
+    `put` returns as soon as the event is queued. A single writer task drains
+    the queue, flushing when `max_batch` events are waiting or `flush_interval`
+    seconds have passed since the first event of the batch arrived.
+    `write_batch` may return how many events it stored when only part of a
+    batch was written; the rest are counted as failed.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[dict]], Awaitable[Optional[int]]],
+        max_batch: int = 500,
+        flush_interval: float = 0.25,
+        max_queue: int = 50000,
+        put_timeout: float = 0.05,
+    ):
+        self.write_batch = write_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def running(self):
+        return self._writer is not None and not self._writer.done()
+
+    def start(self):
+        """Start the writer task on the running event loop"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = False
+        self._writer = asyncio.create_task(self._run())
+
+    async def put(self, event: dict):
+        """Queue an event, waiting up to `put_timeout` for room before dropping it"""
+        if not self.running:
+            # No writer (startup hasn't run or shutdown has): write through
+            self.accepted += 1
+            await self._write([event])
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(event), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                raise QueueFull()
+        self.accepted += 1
+
+    async def _next_batch(self) -> List[dict]:
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if self._stopping or remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+            # The flush window starts when the first event of a batch arrives
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    async def _write(self, batch: List[dict]):
+        start = time.perf_counter()
+        try:
+            written = await self.write_batch(batch)
+            written = len(batch) if written is None else written
+            self.written += written
+            self.failed += len(batch) - written
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d click events", len(batch))
+        self.batches += 1
+        self.last_batch_size = len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    async def stop(self):
+        """Stop the writer once everything still queued has been flushed"""
+        if self._writer is None:
+            return
+        self._stopping = True
+        await self._writer
+        self._writer = None
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "accepted": self.accepted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_seen,
+            "avg_batch_size": (self.written + self.failed) / self.batches if self.batches else 0,
+            "last_flush_ms": self.last_flush_ms,
+        }
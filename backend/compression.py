@@ -0,0 +1,246 @@
+"""Response compression negotiated from Accept-Encoding.
+
+`CompressionMiddleware` compresses JSON and NDJSON responses of at least
+`minimum_size` bytes with the best encoding the client accepts: zstd and
+brotli when the `zstandard` / `brotli` packages are installed, gzip always.
+Streamed responses are compressed chunk by chunk, flushing after each one
+so records still reach the client as they are produced.
+
+Responses that carry an ETag are versioned (the catalog revision or a
+content hash), so their compressed bytes are cached under the URL, the
+ETag and the encoding, and compressed once at a higher level instead of
+on every request. A new revision changes the key, so stale entries are
+never served and simply age out.
+
+When the client accepts an encoding, JSON responses and 304s get a weak
+ETag, since the bytes differ per encoding; a small body sent as-is gets one
+too, so a 304 always repeats the ETag of the 200 it validates. All of them
+get `Vary: Accept-Encoding`.
+"""
+import gzip
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from cache import TTLCache
+from metrics import Counter, phase, registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+compression_bytes = registry.register(Counter(
+    "http_compression_bytes_total", "Response bytes before and after compression", ("encoding", "stage")))
+
+
+class Codec(NamedTuple):
+    name: str
+    compress: Callable[[bytes, int], bytes]
+    stream: Callable[[int], "StreamCompressor"]
+    dynamic_level: int  # per-request bodies
+    static_level: int  # bodies compressed once and cached
+
+
+class StreamCompressor:
+    """Wraps a streaming compressor so each chunk is flushed as it is written"""
+
+    def __init__(self, process: Callable[[bytes], bytes], flush: Callable[[], bytes], finish: Callable[[], bytes]):
+        self._process = process
+        self._flush = flush
+        self._finish = finish
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._process(chunk) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _gzip_stream(level: int) -> StreamCompressor:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return StreamCompressor(compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush)
+
+
+def _brotli_stream(level: int) -> StreamCompressor:
+    compressor = brotli.Compressor(quality=level)
+    return StreamCompressor(compressor.process, compressor.flush, compressor.finish)
+
+
+def _zstd_stream(level: int) -> StreamCompressor:
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return StreamCompressor(
+        compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush)
+
+
+def available_codecs() -> List[Codec]:
+    """Installed codecs, most preferred first"""
+    codecs = []
+    if zstandard is not None:
+        codecs.append(Codec("zstd", lambda data, level: zstandard.ZstdCompressor(level=level).compress(data),
+                            _zstd_stream, 3, 12))
+    if brotli is not None:
+        codecs.append(Codec("br", lambda data, level: brotli.compress(data, quality=level), _brotli_stream, 4, 9))
+    codecs.append(Codec("gzip", lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+                        _gzip_stream, 5, 9))
+    return codecs
+
+
+def negotiate(accept_encoding: str, codecs: List[Codec]) -> Optional[Codec]:
+    """The codec with the highest q-value in Accept-Encoding, ties going to server preference"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for codec in codecs:
+        q = weights.get(codec.name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = codec, q
+    return best
+
+
+def _header(headers: list, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _set_header(headers: list, name: bytes, value: bytes) -> list:
+    return [(key, val) for key, val in headers if key.lower() != name] + [(name, value)]
+
+
+def _weak(etag: bytes) -> bytes:
+    return etag if etag.startswith(b"W/") else b"W/" + etag
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing eligible responses; see the module docstring"""
+
+    def __init__(self, app, minimum_size: int = 1024, cache: Optional[TTLCache] = None,
+                 codecs: Optional[List[Codec]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.codecs = available_codecs() if codecs is None else codecs
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope["headers"])
+        codec = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"), self.codecs)
+        responder = _Responder(self, scope, send, codec)
+        await self.app(scope, receive, responder.send)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, scope, send, codec: Optional[Codec]):
+        self.middleware = middleware
+        self.scope = scope
+        self._send = send
+        self.codec = codec
+        self.start: Optional[dict] = None
+        self.stream: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+        if self.stream is not None:
+            await self._send_chunk(message)
+            return
+
+        headers = list(self.start.get("headers", []))
+        content_type = _header(headers, b"content-type") or b""
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        status = self.start["status"]
+        negotiated = status == 304 or (
+            status == 200
+            and _header(headers, b"content-encoding") is None
+            and content_type.decode("latin-1").startswith(COMPRESSIBLE_TYPES)
+        )
+        if negotiated:
+            vary = _header(headers, b"vary")
+            headers = _set_header(headers, b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding")
+            etag = _header(headers, b"etag")
+            if etag is not None and self.codec is not None:
+                # Weak whether or not this body is compressed, so a 304 carries the ETag of the 200 it stands for
+                headers = _set_header(headers, b"etag", _weak(etag))
+        eligible = (
+            negotiated
+            and status == 200
+            and self.codec is not None
+            and (more_body or len(body) >= self.middleware.minimum_size)
+        )
+        if not eligible:
+            self.passthrough = True
+            await self._send({**self.start, "headers": headers})
+            await self._send(message)
+            return
+
+        headers = _set_header(headers, b"content-encoding", self.codec.name.encode())
+        if more_body:
+            # Length unknown up front: compress the stream as it is produced
+            self.stream = self.codec.stream(self.codec.dynamic_level)
+            headers = [(key, value) for key, value in headers if key.lower() != b"content-length"]
+            await self._send({**self.start, "headers": headers})
+            await self._send_chunk(message)
+            return
+
+        compressed = self._compress(body, etag)
+        headers = _set_header(headers, b"content-length", str(len(compressed)).encode())
+        await self._send({**self.start, "headers": headers})
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    def _compress(self, body: bytes, etag: Optional[bytes]) -> bytes:
+        cache = self.middleware.cache
+        codec = self.codec
+        key = None
+        if cache is not None and etag is not None and self.scope["method"] == "GET":
+            key = (self.scope["path"], self.scope.get("query_string", b""), etag, codec.name)
+            found, compressed = cache.get(key)
+            if found:
+                cache.hits += 1
+                return compressed
+            cache.misses += 1
+        with phase("compression"):
+            compressed = codec.compress(body, codec.static_level if key else codec.dynamic_level)
+        if key is not None:
+            cache.set(key, compressed)
+        compression_bytes.inc(len(body), codec.name, "in")
+        compression_bytes.inc(len(compressed), codec.name, "out")
+        return compressed
+
+    async def _send_chunk(self, message):
+        chunk = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        with phase("compression"):
+            compressed = self.stream.compress(chunk) if chunk else b""
+            if not more_body:
+                compressed += self.stream.finish()
+        compression_bytes.inc(len(chunk), self.codec.name, "in")
+        compression_bytes.inc(len(compressed), self.codec.name, "out")
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
@@ -0,0 +1,160 @@
+"""MongoDB access through separate reader and writer connection pools.
+
+Catalog reads go through `Database.read`, a client with its own pool and a
+configurable read preference. It defaults to the primary: catalog reads
+feed caches validated by the catalog revision, and a lagging secondary
+would let a reload after a write cache old data under the new ETag.
+Analytics and reports, which tolerate lag, go through `Database.analytics`
+on the same pool with their own read preference (secondaryPreferred by
+default, which falls back to the primary when there are no secondaries).
+Writes, click ingestion and read-your-writes paths use `Database.write`.
+Sizing the pools apart keeps a burst of slow catalog queries from starving
+`track_click` of connections.
+
+Each pool has a default time budget applied through the driver's
+client-side timeout (`timeoutMS`): it bounds the wait for a connection and
+is sent to the server as maxTimeMS, so an overrunning query is killed
+instead of holding its connection. `budget()` overrides it for a block.
+
+Clients are created on first use, with `connect=False`, so importing does
+no network I/O and no configuration is needed until the database is first
+touched: `read`, `analytics` and `write` are `LazyDatabase` stand-ins that create their
+client then. `connect()` establishes both pools at startup and `warm()`
+opens a number of connections in each ahead of traffic.
+"""
+import asyncio
+import logging
+from typing import Dict, NamedTuple, Optional
+
+import pymongo
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from metrics import CommandTimer, PoolTimer
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+
+class PoolConfig(NamedTuple):
+    max_size: int = 100
+    min_size: int = 0
+    timeout_ms: int = 5000  # default budget for every operation on the pool
+
+
+def make_preference(name: str, max_staleness_seconds: Optional[int] = None):
+    """A driver read preference from its name, e.g. "secondaryPreferred"; staleness is ignored for the primary"""
+    mode = read_pref_mode_from_name(name)
+    staleness = max_staleness_seconds if max_staleness_seconds and name != "primary" else -1
+    return make_read_preference(mode, None, staleness)
+
+
+def budget(seconds: float):
+    """Time budget for every MongoDB operation in the block, replacing the pool default"""
+    return pymongo.timeout(seconds)
+
+
+class LazyDatabase:
+    """Stands in for a Motor database until first use, then forwards to it"""
+
+    def __init__(self, database: "Database", pool: str, preference=None):
+        self._database = database
+        self._pool = pool
+        self._preference = preference  # None keeps the client's read preference
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            client = self._database.client(self._pool)
+            self._target = client.get_database(self._database.name, read_preference=self._preference)
+        return self._target
+
+    def reset(self):
+        self._target = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name: str):
+        return self._resolve()[name]
+
+
+class Database:
+    def __init__(
+        self,
+        url: Optional[str],
+        name: Optional[str],
+        reader: PoolConfig = PoolConfig(),
+        writer: PoolConfig = PoolConfig(),
+        read_preference: str = "primary",
+        analytics_read_preference: str = "secondaryPreferred",
+        max_staleness_seconds: Optional[int] = None,
+    ):
+        self.url = url
+        self.name = name
+        self.configs = {READ: reader, WRITE: writer}
+        self._pool_timers = {pool: PoolTimer(pool) for pool in self.configs}
+        self._options = {READ: {"read_preference": make_preference(read_preference, max_staleness_seconds)},
+                         WRITE: {}}
+        self.clients: Dict[str, AsyncIOMotorClient] = {}
+        self.read = LazyDatabase(self, READ)
+        self.analytics = LazyDatabase(
+            self, READ, make_preference(analytics_read_preference, max_staleness_seconds))
+        self.write = LazyDatabase(self, WRITE)
+
+    def client(self, pool: str) -> AsyncIOMotorClient:
+        """The pool's client, created on first use"""
+        if pool not in self.clients:
+            if not self.url or not self.name:
+                raise RuntimeError("MONGO_URL and DB_NAME must be set to use the database")
+            self.clients[pool] = self._client(pool)
+        return self.clients[pool]
+
+    def _client(self, pool: str) -> AsyncIOMotorClient:
+        config = self.configs[pool]
+        return AsyncIOMotorClient(
+            self.url,
+            connect=False,
+            appname=f"mcp-directory-{pool}",
+            maxPoolSize=config.max_size,
+            minPoolSize=config.min_size,
+            timeoutMS=config.timeout_ms,
+            event_listeners=[CommandTimer(), self._pool_timers[pool]],
+            **self._options[pool],
+        )
+
+    async def connect(self):
+        """Open both pools now rather than on the first request"""
+        for pool in self.configs:
+            await self.client(pool).admin.command("ping")
+            logger.info("Connected %s pool (max %d connections)", pool, self.configs[pool].max_size)
+
+    async def warm(self, connections: int):
+        """Open up to `connections` connections in each pool by running that many pings at once"""
+        for pool, config in self.configs.items():
+            client = self.client(pool)
+            count = min(connections, config.max_size)
+            await asyncio.gather(*(client.admin.command("ping") for _ in range(count)))
+            logger.info("Warmed %s pool with %d connections", pool, count)
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        # Used again, e.g. by an app started a second time in the same process, it opens new clients
+        self.clients.clear()
+        self.read.reset()
+        self.analytics.reset()
+        self.write.reset()
+
+    def stats(self) -> dict:
+        """Per-pool checkout counts and saturation (checked out / max size)"""
+        pools = {}
+        for pool, timer in self._pool_timers.items():
+            stats = timer.stats()
+            stats["max_size"] = self.configs[pool].max_size
+            stats["saturation"] = stats["checked_out"] / self.configs[pool].max_size
+            stats["timeout_ms"] = self.configs[pool].timeout_ms
+            pools[pool] = stats
+        return pools
@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from serialization import encode_json
+
+logger = logging.getLogger(__name__)
+
+
+class HomepageSnapshot:
+    """Pre-encoded homepage payload, rebuilt in the background.
+
+    `compute` gathers everything the homepage renders; its result is encoded
+    once and served from memory until the next rebuild. Catalog writes call
+    `invalidate`, which coalesces bursts of changes into one rebuild after
+    `debounce` seconds. The snapshot is also refreshed every
+    `refresh_interval` seconds so click totals don't go stale.
+
+    The ETag is a hash of the payload without the `unhashed` keys (e.g. a
+    generation timestamp), so workers and refreshes that produce the same
+    content share a validator. It is weak, since those keys may still differ.
+    """
+
+    def __init__(self, compute: Callable[[], Awaitable[dict]], refresh_interval: float = 60, debounce: float = 0.1,
+                 unhashed: Tuple[str, ...] = ()):
+        self.compute = compute
+        self.unhashed = unhashed
+        self.refresh_interval = refresh_interval
+        self.debounce = debounce
+        self.body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self.builds = 0
+        self.failures = 0
+        self._dirty = False
+        self._rebuild_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._build_lock = asyncio.Lock()
+
+    async def rebuild(self):
+        async with self._build_lock:
+            payload = await self.compute()
+            body = encode_json(payload)
+            content = encode_json({k: v for k, v in payload.items() if k not in self.unhashed}) if self.unhashed else body
+            self.body = body
+            # A content hash keeps the validator identical across workers
+            self.etag = 'W/"h' + hashlib.blake2b(content, digest_size=8).hexdigest() + '"'
+            self.built_at = time.time()
+            self.builds += 1
+
+    async def get(self) -> bytes:
+        if self.body is None:
+            await self.rebuild()
+        return self.body
+
+    def invalidate(self):
+        """Schedule a rebuild; safe to call from synchronous code on the event loop"""
+        self._dirty = True
+        if self._rebuild_task is None or self._rebuild_task.done():
+            try:
+                self._rebuild_task = asyncio.get_running_loop().create_task(self._rebuild_pending())
+            except RuntimeError:
+                # No running loop (e.g. a CLI import); the next get() or refresh picks it up
+                self.body = None
+
+    async def _rebuild_pending(self):
+        while self._dirty:
+            await asyncio.sleep(self.debounce)
+            self._dirty = False
+            try:
+                await self.rebuild()
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to rebuild homepage snapshot")
+
+    async def _refresh(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            self.invalidate()
+
+    def start(self):
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def stop(self):
+        for task in (self._refresh_task, self._rebuild_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._refresh_task = self._rebuild_task = None
+
+    def stats(self) -> dict:
+        return {
+            "builds": self.builds,
+            "failures": self.failures,
+            "bytes": len(self.body) if self.body else 0,
+            "age_seconds": time.time() - self.built_at if self.built_at else None,
+        }
@@ -0,0 +1,92 @@
+import time
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+from starlette.requests import Request
+from starlette.responses import Response
+
+COUNTERS_COLLECTION = "counters"
+CATALOG_COUNTER_ID = "catalog"
+
+
+class CatalogRevision:
+    """Monotonic catalog revision used as the validator for cacheable GETs.
+
+    The authoritative counter lives in Mongo and is bumped on every listing
+    write; `value` is the latest revision this process has fully applied,
+    so conditional requests are answered without a database round-trip.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.value = 0
+
+    @property
+    def collection(self):
+        return self.db[COUNTERS_COLLECTION]
+
+    @property
+    def etag(self) -> str:
+        return f'"r{self.value}"'
+
+    def observe(self, revision: int):
+        self.value = max(self.value, revision)
+
+    async def load(self):
+        """Read the current revision, creating the counter on first start.
+
+        A fresh counter starts at the current time in milliseconds rather
+        than zero, so a lost counter can't reissue ETags clients already hold.
+        """
+        doc = await self.collection.find_one_and_update(
+            {"_id": CATALOG_COUNTER_ID},
+            {"$setOnInsert": {"revision": int(time.time() * 1000)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        self.observe(doc["revision"])
+        return self.value
+
+    async def current(self) -> int:
+        """The shared revision, without observing it"""
+        doc = await self.collection.find_one({"_id": CATALOG_COUNTER_ID})
+        return doc["revision"] if doc else self.value
+
+    async def bump(self) -> int:
+        """Take the next revision for a write.
+
+        The caller observes it once the write is applied locally; see
+        `catalog_sync.CatalogSync`.
+        """
+        doc = await self.collection.find_one_and_update(
+            {"_id": CATALOG_COUNTER_ID},
+            {"$inc": {"revision": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["revision"]
+
+
+def cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={max_age * 5}",
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" validate the same representation
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(request: Request, etag: str, max_age: int) -> Optional[Response]:
+    """Return a 304 response if the client already holds the current representation"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=cache_headers(etag, max_age))
+    return None
@@ -0,0 +1,252 @@
+"""Declarative index registry and query-plan verification.
+
+`INDEXES` lists every index the API relies on and is applied at startup.
+`QUERY_SHAPES` lists every query the request path and background jobs
+issue, with representative values; `python indexes.py check` explains each
+one and exits non-zero if a plan contains a COLLSCAN or an in-memory SORT.
+Shapes that read the whole collection on purpose are marked `full_scan`
+and only fail on an in-memory SORT.
+
+    python indexes.py ensure   # create missing indexes
+    python indexes.py check    # ensure, then verify query plans
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from link_health import LINK_FIELDS
+from models import MCPServerSummary
+from serialization import ModelEncoder
+
+logger = logging.getLogger(__name__)
+
+# Raw click events are deleted this long after they happen; rollups keep the counts
+RAW_CLICK_RETENTION = timedelta(days=30)
+# Workers further behind than this resync from scratch instead of replaying the log
+CATALOG_CHANGE_RETENTION = timedelta(days=7)
+
+INDEX_OPTIONS_CONFLICT = 85
+
+LISTING_ORDER = [("is_sponsored", DESCENDING), ("is_featured", DESCENDING), ("rating", DESCENDING), ("id", ASCENDING)]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "mcp_servers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(LISTING_ORDER, name="listing_order"),
+        IndexModel([("category", ASCENDING)] + LISTING_ORDER, name="category_listing_order"),
+        IndexModel([("pricing_model", ASCENDING)] + LISTING_ORDER, name="pricing_listing_order"),
+        IndexModel([("is_featured", ASCENDING), ("rating", DESCENDING)], name="featured_rating"),
+        IndexModel([("is_sponsored", ASCENDING), ("rating", DESCENDING)], name="sponsored_rating"),
+        IndexModel([("broken_links", ASCENDING), ("id", ASCENDING)], name="broken_links"),
+    ],
+    "click_tracking": [
+        IndexModel([("server_id", ASCENDING), ("click_type", ASCENDING), ("timestamp", ASCENDING)], name="server_type_time"),
+        IndexModel([("timestamp", ASCENDING)], name="timestamp_ttl",
+                   expireAfterSeconds=int(RAW_CLICK_RETENTION.total_seconds())),
+    ],
+    "click_rollups": [
+        IndexModel(
+            [("server_id", ASCENDING), ("click_type", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="rollup_key",
+            unique=True,
+        ),
+        # Fine-grained buckets carry an expiry; day and total counters never expire
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "catalog_changes": [
+        IndexModel([("revision", ASCENDING)], name="revision_unique", unique=True),
+        IndexModel([("at", ASCENDING)], name="at_ttl", expireAfterSeconds=int(CATALOG_CHANGE_RETENTION.total_seconds())),
+    ],
+    "link_checks": [
+        IndexModel([("url", ASCENDING)], name="url_unique", unique=True),
+    ],
+}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+    limit: int = 0
+    pipeline: Optional[list] = None  # aggregate shapes use this instead of filter/sort
+    projection: Optional[dict] = None
+    full_scan: bool = False  # reads every document by design, so a COLLSCAN is expected
+
+
+_now = datetime(2024, 1, 1)
+_after = {"$or": [
+    {"is_sponsored": {"$lt": True}},
+    {"is_sponsored": True, "is_featured": {"$lt": True}},
+    {"is_sponsored": True, "is_featured": True, "rating": {"$lt": 4.5}},
+    {"is_sponsored": True, "is_featured": True, "rating": 4.5, "id": {"$gt": "1"}},
+]}
+_summary = ModelEncoder(MCPServerSummary).projection
+_facet_match = {"$match": {"category": "SEO Analytics"}}
+
+QUERY_SHAPES = [
+    QueryShape("get_server", "mcp_servers", {"id": "1"}),
+    QueryShape("search_page", "mcp_servers", {"id": {"$in": ["1", "2", "3"]}}),
+    QueryShape("search_page_summary", "mcp_servers", {"id": {"$in": ["1", "2", "3"]}}, projection=_summary),
+    QueryShape("list_servers", "mcp_servers", {}, LISTING_ORDER, 50),
+    QueryShape("list_servers_cursor", "mcp_servers", {"$and": [{}, _after]}, LISTING_ORDER, 50),
+    QueryShape("list_by_category", "mcp_servers", {"category": "SEO Analytics"}, LISTING_ORDER, 50),
+    QueryShape("list_by_pricing", "mcp_servers", {"pricing_model": "Freemium"}, LISTING_ORDER, 50),
+    QueryShape("list_by_category_and_pricing", "mcp_servers",
+               {"category": "SEO Analytics", "pricing_model": "Freemium"}, LISTING_ORDER, 50),
+    QueryShape("list_featured_only", "mcp_servers", {"is_featured": True}, LISTING_ORDER, 50),
+    QueryShape("featured_servers", "mcp_servers", {"is_featured": True}, [("rating", DESCENDING)], 6),
+    QueryShape("sponsored_servers", "mcp_servers", {"is_sponsored": True}, [("rating", DESCENDING)], 3),
+    QueryShape("count_featured", "mcp_servers", {"is_featured": True}),
+    QueryShape("count_sponsored", "mcp_servers", {"is_sponsored": True}),
+    QueryShape("suggest_fallback", "mcp_servers", {"name": {"$regex": "^seo", "$options": "i"}}, LISTING_ORDER, 8,
+               projection={"_id": 0, "id": 1, "name": 1}),
+    # Facet counts cover every listing the search matches, so the facet query reads them all
+    QueryShape("server_facets", "mcp_servers", {}, full_scan=True, pipeline=[
+        {"$match": {}},
+        {"$facet": {
+            "results": [_facet_match, {"$sort": dict(LISTING_ORDER)}, {"$limit": 50}, {"$project": _summary}],
+            "total": [_facet_match, {"$count": "n"}],
+            "category": [{"$match": {}}, {"$group": {"_id": "$category", "n": {"$sum": 1}}}],
+            "pricing_model": [_facet_match, {"$group": {"_id": "$pricing_model", "n": {"$sum": 1}}}],
+            "featured": [{"$match": {"category": "SEO Analytics", "is_featured": True}}, {"$count": "n"}],
+            "sponsored": [_facet_match, {"$match": {"is_sponsored": True}}, {"$count": "n"}],
+        }},
+    ]),
+    QueryShape("clicks_by_server_and_type", "click_tracking", {"server_id": "1", "click_type": "affiliate"}),
+    QueryShape("rollup_total", "click_rollups",
+               {"server_id": "1", "click_type": "*", "granularity": "total", "bucket": None}),
+    QueryShape("rollup_first_bucket", "click_rollups",
+               {"server_id": "1", "click_type": "*", "granularity": "day"}, [("bucket", ASCENDING)], 1),
+    QueryShape("rollup_series", "click_rollups",
+               {"server_id": "1", "click_type": "*", "granularity": "minute",
+                "bucket": {"$gte": _now - timedelta(hours=1), "$lt": _now}}, [("bucket", ASCENDING)]),
+    QueryShape("broken_links", "mcp_servers", {"broken_links": {"$in": ["affiliate_url", "logo_url"]}},
+               [("id", ASCENDING)], 100),
+    # Each link check run walks the whole catalog, then loads per-URL state in batches
+    QueryShape("link_health_scan", "mcp_servers", {}, full_scan=True,
+               projection={"_id": 0, "id": 1, "link_health": 1, **dict.fromkeys(LINK_FIELDS, 1)}),
+    QueryShape("link_checks_by_url", "link_checks", {"url": {"$in": ["https://example.com/a", "https://example.com/b"]}}),
+    QueryShape("catalog_changes_since", "catalog_changes", {"revision": {"$gt": 1}}, [("revision", ASCENDING)], 100),
+    QueryShape("catalog_changes_oldest", "catalog_changes", {}, [("revision", ASCENDING)], 1),
+    QueryShape("catalog_changes_at", "catalog_changes", {"at": {"$lte": _now}}, [("at", DESCENDING)], 1),
+    QueryShape("rollup_range", "click_rollups", {}, pipeline=[
+        {"$match": {"server_id": "1", "click_type": "*", "$or": [
+            {"granularity": "day", "bucket": {"$gte": _now, "$lt": _now + timedelta(days=7)}},
+            {"granularity": "hour", "bucket": {"$gte": _now - timedelta(hours=5), "$lt": _now}},
+        ]}},
+        {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+    ]),
+]
+
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None):
+    """Create any registered index that does not exist yet.
+
+    A TTL index whose expiry changed in the registry is updated in place.
+    """
+    for name in collections or INDEXES:
+        try:
+            created = await db[name].create_indexes(INDEXES[name])
+        except OperationFailure as exc:
+            if exc.code != INDEX_OPTIONS_CONFLICT:
+                raise
+            await update_ttls(db, name)
+            created = await db[name].create_indexes(INDEXES[name])
+        logger.info("Ensured indexes on %s: %s", name, ", ".join(created))
+
+
+async def update_ttls(db, collection: str):
+    existing = {index["name"]: index async for index in db[collection].list_indexes()}
+    for model in INDEXES[collection]:
+        spec = model.document
+        if "expireAfterSeconds" not in spec or spec["name"] not in existing:
+            continue
+        if existing[spec["name"]].get("expireAfterSeconds") != spec["expireAfterSeconds"]:
+            await db.command("collMod", collection, index={"name": spec["name"], "expireAfterSeconds": spec["expireAfterSeconds"]})
+            logger.info("Changed TTL of %s.%s to %ds", collection, spec["name"], spec["expireAfterSeconds"])
+
+
+def plan_stages(plan: dict) -> List[str]:
+    """Flatten an explain() plan tree into its stage names"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+def winning_plans(explain: dict) -> List[dict]:
+    if "queryPlanner" in explain:
+        return [explain["queryPlanner"]["winningPlan"]]
+    # Aggregations report the planner per pipeline stage
+    plans = []
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor", {})
+        if "queryPlanner" in cursor:
+            plans.append(cursor["queryPlanner"]["winningPlan"])
+    return plans
+
+
+async def explain_shape(db, shape: QueryShape) -> dict:
+    if shape.pipeline is not None:
+        return await db.command("aggregate", shape.collection, pipeline=shape.pipeline, explain=True)
+    cursor = db[shape.collection].find(shape.filter, shape.projection)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    if shape.limit:
+        cursor = cursor.limit(shape.limit)
+    return await cursor.explain()
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain every query shape; return a description of each bad plan"""
+    failures = []
+    for shape in QUERY_SHAPES:
+        explain = await explain_shape(db, shape)
+        stages = [stage for plan in winning_plans(explain) for stage in plan_stages(plan)]
+        bad = sorted({stage for stage in stages if stage == "SORT" or (stage == "COLLSCAN" and not shape.full_scan)})
+        status = "FAIL" if bad else "ok"
+        print(f"{status:<5} {shape.name:<32} {' > '.join(stages)}")
+        if bad:
+            failures.append(f"{shape.name}: {', '.join(bad)}")
+    return failures
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Manage and verify MongoDB indexes")
+    parser.add_argument("command", choices=["ensure", "check"])
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        if args.command == "check":
+            failures = await check_query_plans(db)
+            if failures:
+                print("Query plans without index support:\n  " + "\n  ".join(failures))
+                return 1
+            print(f"All {len(QUERY_SHAPES)} query shapes are index-backed")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main()))
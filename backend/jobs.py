@@ -0,0 +1,56 @@
+"""Leases that keep a background job to one worker at a time.
+
+A job's lease is a document in `job_runs` keyed by the job name; it also
+keeps the summary of the job's last run.
+"""
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+JOBS_COLLECTION = "job_runs"
+
+
+class JobLease:
+    """A named lease in `job_runs` so only one worker runs a job at a time"""
+
+    def __init__(self, db, name: str, ttl: timedelta):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def collection(self):
+        return self.db[JOBS_COLLECTION]
+
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.collection.update_one(
+                {"_id": self.name, "$or": [{"lease_until": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "lease_until": now + self.ttl}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def renew(self):
+        await self.collection.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"lease_until": datetime.utcnow() + self.ttl}},
+        )
+
+    async def release(self, last_run: Optional[dict] = None):
+        update = {"lease_until": datetime.utcnow()}
+        if last_run is not None:
+            update["last_run"] = last_run
+        await self.collection.update_one({"_id": self.name, "owner": self.owner}, {"$set": update})
+
+    async def last_run(self) -> Optional[dict]:
+        doc = await self.collection.find_one({"_id": self.name}, {"last_run": 1})
+        return doc.get("last_run") if doc else None
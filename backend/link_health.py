@@ -0,0 +1,546 @@
+"""Background health checks for every listing's external URLs.
+
+`LinkChecker.run` scans the catalog and checks each listing's
+`affiliate_url`, `official_url` and `logo_url` with a shared async HTTP
+client: a fixed pool of worker tasks bounds concurrency, `HostLimiter`
+spaces requests to the same host, and URLs are queued round-robin across
+hosts so one slow or rate-limited host does not park every worker.
+
+A URL is checked with HEAD (GET when the server rejects HEAD) and carries
+the ETag / Last-Modified of its previous check, so unchanged targets
+answer 304. Timeouts, connection errors, 429 and 5xx are retried within the
+run with exponential backoff (honouring Retry-After). Per-URL state lives in
+`link_checks`; healthy URLs are re-checked after `recheck_interval`, broken
+ones after `failure_backoff` doubling per consecutive failure, capped at
+`recheck_interval`. Each result is copied onto the listings that use the
+URL as `link_health.<field>`, and `broken_links` lists the failing fields.
+URLs whose host resolves to a private, loopback, link-local or otherwise
+non-public address are never requested (redirects included) and are
+reported as broken. `PublicBackend` makes that check when a connection is
+opened and connects to the address it checked, so the host cannot
+re-resolve somewhere else in between.
+
+Only one worker runs a check at a time: runs hold a lease in `job_runs`,
+which also keeps the summary of the last run. Run one from cron with:
+
+    python link_health.py check [--force]
+"""
+import argparse
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import socket
+import sys
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import AsyncExitStack
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pymongo import UpdateOne
+
+from jobs import JobLease
+
+# httpx (and certifi with it) is imported when a run starts, not with the API
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+LINK_FIELDS = ("affiliate_url", "official_url", "logo_url")
+CHECKS_COLLECTION = "link_checks"
+JOB_NAME = "link_health"
+
+# Worth retrying within a run; anything else >= 400 is a broken link
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+HEAD_UNSUPPORTED = frozenset({403, 405, 501})
+
+USER_AGENT = "mcp-directory-link-checker/1.0"
+
+# Pending database writes are flushed in bulk once this many accumulate
+WRITE_BATCH = 500
+
+# httpcore scans its whole pool on every request, so hosts are spread over
+# clients of this many connections each instead of one large pool
+CONNECTIONS_PER_CLIENT = 10
+
+
+class PrivateAddress(Exception):
+    """Raised for a request to a host the checker must not reach"""
+
+
+async def public_address(host: str, port: int) -> str:
+    """An address to connect to for `host`, refusing hosts with any non-public address"""
+    try:
+        addresses = [ipaddress.ip_address(host)]
+    except ValueError:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = [ipaddress.ip_address(info[4][0]) for info in infos]
+    if not all(address.is_global and not address.is_multicast for address in addresses):
+        raise PrivateAddress(host)
+    return str(addresses[0])
+
+
+class PublicBackend:
+    """httpcore network backend that only opens connections to public addresses.
+
+    The host is resolved and checked here, then the connection is made to
+    that checked address rather than handing the name back to the resolver,
+    so DNS rebinding cannot swap in a private address after the check. Every
+    redirect to a new origin opens a new connection and is checked again.
+    TLS verification, SNI and the Host header still use the name from the
+    URL. Resolutions are kept for the life of the backend (one run).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._resolved: Dict[Tuple[str, int], str] = {}
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None, local_address=None,
+                          socket_options=None):
+        import httpcore
+
+        address = self._resolved.get((host, port))
+        if address is None:
+            try:
+                address = self._resolved[host, port] = await public_address(host, port)
+            except socket.gaierror as exc:
+                raise httpcore.ConnectError(str(exc)) from exc
+        return await self.backend.connect_tcp(address, port, timeout=timeout, local_address=local_address,
+                                              socket_options=socket_options)
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        raise PrivateAddress(path)
+
+    async def sleep(self, seconds: float):
+        await self.backend.sleep(seconds)
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def retry_after(response: "httpx.Response") -> Optional[float]:
+    """Seconds requested by a Retry-After header, as a delay or an HTTP date"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (at - datetime.now(tz=at.tzinfo)).total_seconds())
+
+
+class HostLimiter:
+    """Spaces requests to the same host at least `1 / rate` seconds apart.
+
+    Callers for one host take turns; the gap is measured from when the
+    previous caller actually went ahead, so a busy event loop waking several
+    sleepers at once cannot turn into a burst.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._last: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        async with self._locks[host]:
+            delay = self._last.get(host, float("-inf")) + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last[host] = time.monotonic()
+
+
+class LinkJob:
+    __slots__ = ("url", "state", "refs", "result")
+
+    def __init__(self, url: str, state: Optional[dict]):
+        self.url = url
+        self.state = state
+        self.refs: List[Tuple[str, str]] = []
+        self.result: Optional[dict] = None
+
+
+class LinkChecker:
+    def __init__(
+        self,
+        db,
+        read_db=None,
+        concurrency: int = 50,
+        host_rate: float = 2.0,
+        timeout: float = 10.0,
+        recheck_interval: timedelta = timedelta(hours=24),
+        failure_backoff: timedelta = timedelta(hours=1),
+        retries: int = 2,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+        batch_size: int = 1000,
+        lease_ttl: timedelta = timedelta(minutes=5),
+        transport: Optional["httpx.AsyncBaseTransport"] = None,
+        allow_private: bool = False,
+    ):
+        self.db = db
+        self.read_db = read_db if read_db is not None else db
+        self.concurrency = concurrency
+        self.host_rate = host_rate
+        self.timeout = timeout
+        self.recheck_interval = recheck_interval
+        self.failure_backoff = failure_backoff
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.batch_size = batch_size
+        self.transport = transport
+        self.allow_private = allow_private
+        self.lease = JobLease(db, JOB_NAME, lease_ttl)
+        self.running = False
+        self.runs = 0
+        self._run_stats: Counter = Counter()
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._writes: List[Tuple[str, UpdateOne]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._run_task: Optional[asyncio.Task] = None
+
+    async def check(self, clients: List["httpx.AsyncClient"], url: str, state: Optional[dict]) -> dict:
+        """Check one URL with retries; return its health (status, ok, latency_ms, error, ...)"""
+        import httpx
+
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            return {"status": None, "ok": False, "latency_ms": None, "error": "invalid URL"}
+        # A host always maps to the same client, so its keep-alive connections are reused
+        client = clients[hash(parts.netloc) % len(clients)]
+        headers = {}
+        if state and state.get("ok"):
+            if state.get("etag"):
+                headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                headers["If-Modified-Since"] = state["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            response = error = None
+            try:
+                response = await client.head(url, headers=headers)
+                if response.status_code in HEAD_UNSUPPORTED:
+                    # Only the status matters, so close the stream without reading the body
+                    async with client.stream("GET", url, headers=headers) as response:
+                        pass
+            except PrivateAddress:
+                return {"status": None, "ok": False, "latency_ms": None, "error": "private address"}
+            except httpx.HTTPError as exc:
+                error = type(exc).__name__
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+
+            status = response.status_code if response is not None else None
+            transient = error is not None or status in TRANSIENT_STATUSES
+            if transient and attempt < self.retries:
+                delay = retry_after(response) if response is not None else None
+                if delay is None:
+                    delay = self.retry_delay * 2 ** attempt * (1 + random.random())
+                self._run_stats["retries"] += 1
+                await asyncio.sleep(min(delay, self.max_retry_delay))
+                continue
+            break
+
+        if status == 304 and state:
+            self._run_stats["not_modified"] += 1
+            return {"status": state.get("status"), "ok": True, "latency_ms": latency_ms, "error": None,
+                    "etag": state.get("etag"), "last_modified": state.get("last_modified")}
+        return {
+            "status": status,
+            "ok": status is not None and status < 400,
+            "latency_ms": latency_ms,
+            "error": error or (f"HTTP {status}" if status is not None and status >= 400 else None),
+            "etag": response.headers.get("etag") if response is not None else None,
+            "last_modified": response.headers.get("last-modified") if response is not None else None,
+        }
+
+    def _next_state(self, url: str, result: dict, state: Optional[dict], now: datetime) -> dict:
+        failures = 0 if result["ok"] else (state or {}).get("failures", 0) + 1
+        if failures:
+            delay = min(self.recheck_interval, self.failure_backoff * 2 ** (failures - 1))
+        else:
+            delay = self.recheck_interval
+        return {**result, "url": url, "failures": failures, "checked_at": now, "next_check_at": now + delay}
+
+    def _write_ref(self, server_id: str, field: str, state: dict):
+        health = {key: state.get(key) for key in ("url", "status", "ok", "latency_ms", "error", "checked_at")}
+        update = {"$set": {f"link_health.{field}": health}}
+        update["$pull" if state["ok"] else "$addToSet"] = {"broken_links": field}
+        # Matching on the URL keeps a result from landing on a listing whose link changed meanwhile
+        self._writes.append(("mcp_servers", UpdateOne({"id": server_id, field: state["url"]}, update)))
+
+    async def _record(self, job: LinkJob, result: dict):
+        state = self._next_state(job.url, result, job.state, datetime.utcnow())
+        job.result = state
+        self._writes.append((CHECKS_COLLECTION, UpdateOne({"url": job.url}, {"$set": state}, upsert=True)))
+        for server_id, field in job.refs:
+            self._write_ref(server_id, field, state)
+            if result["latency_ms"] is not None:
+                self._latencies[field].append(result["latency_ms"])
+            self._run_stats["ok" if state["ok"] else "broken"] += 1
+        self._run_stats["urls_checked"] += 1
+        if len(self._writes) >= WRITE_BATCH:
+            await self._flush()
+
+    async def _flush(self):
+        writes, self._writes = self._writes, []
+        by_collection = defaultdict(list)
+        for collection, operation in writes:
+            by_collection[collection].append(operation)
+        for collection, operations in by_collection.items():
+            await self.db[collection].bulk_write(operations, ordered=False)
+
+    async def _load_states(self, urls) -> Dict[str, dict]:
+        cursor = self.db[CHECKS_COLLECTION].find({"url": {"$in": list(urls)}}, {"_id": 0})
+        return {state["url"]: state async for state in cursor}
+
+    def _due(self, state: Optional[dict], now: datetime, force: bool) -> bool:
+        return force or state is None or state["next_check_at"] <= now
+
+    async def _produce(self, queue: asyncio.Queue, force: bool):
+        """Scan the catalog a batch at a time and queue every URL that is due, interleaving hosts"""
+        jobs: Dict[str, LinkJob] = {}
+        projection = {"_id": 0, "id": 1, "link_health": 1, **{field: 1 for field in LINK_FIELDS}}
+        cursor = self.read_db.mcp_servers.find({}, projection).batch_size(self.batch_size)
+        batch = []
+        async for listing in cursor:
+            batch.append(listing)
+            if len(batch) >= self.batch_size:
+                await self._enqueue(batch, jobs, queue, force)
+                batch = []
+        if batch:
+            await self._enqueue(batch, jobs, queue, force)
+
+    async def _enqueue(self, listings: List[dict], jobs: Dict[str, LinkJob], queue: asyncio.Queue, force: bool):
+        refs = defaultdict(list)
+        for listing in listings:
+            self._run_stats["listings_scanned"] += 1
+            for field in LINK_FIELDS:
+                if listing.get(field):
+                    refs[listing[field]].append((listing["id"], field, listing.get("link_health", {}).get(field)))
+        states = await self._load_states(url for url in refs if url not in jobs)
+        now = datetime.utcnow()
+        by_host = defaultdict(deque)
+        for url, url_refs in refs.items():
+            job = jobs.get(url)
+            if job is None and not self._due(states.get(url), now, force):
+                # Checked recently; only copy the result onto listings that lack it
+                state = states[url]
+                self._run_stats["skipped_fresh"] += 1
+                for server_id, field, health in url_refs:
+                    if not health or health.get("url") != url or health.get("checked_at") != state["checked_at"]:
+                        self._write_ref(server_id, field, state)
+                continue
+            if job is None:
+                job = jobs[url] = LinkJob(url, states.get(url))
+                by_host[urlsplit(url).netloc].append(job)
+            for server_id, field, _ in url_refs:
+                if job.result is None:
+                    job.refs.append((server_id, field))
+                else:
+                    self._write_ref(server_id, field, job.result)
+        while by_host:
+            for host in list(by_host):
+                await queue.put(by_host[host].popleft())
+                if not by_host[host]:
+                    del by_host[host]
+
+    async def _work(self, clients: List["httpx.AsyncClient"], queue: asyncio.Queue):
+        while True:
+            job = await queue.get()
+            try:
+                await self._record(job, await self.check(clients, job.url, job.state))
+            except Exception:
+                logger.exception("Failed to check %s", job.url)
+            finally:
+                queue.task_done()
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease.ttl.total_seconds() / 3)
+            try:
+                await self.lease.renew()
+            except Exception:
+                logger.exception("Failed to renew the link check lease")
+
+    async def run(self, force: bool = False) -> Optional[dict]:
+        """Check every due URL; return the run summary, or None if another worker holds the lease"""
+        if self.running or not await self.lease.acquire():
+            return None
+        self.running = True
+        self._run_stats = Counter()
+        self._latencies = defaultdict(list)
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat())
+        summary = None
+        try:
+            async with AsyncExitStack() as stack:
+                clients = [await stack.enter_async_context(client) for client in self._clients(HostLimiter(self.host_rate))]
+                queue = asyncio.Queue(maxsize=self.concurrency * 4)
+                workers = [asyncio.create_task(self._work(clients, queue)) for _ in range(self.concurrency)]
+                try:
+                    await self._produce(queue, force)
+                    await queue.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            await self._flush()
+            summary = self._summary(started_at, time.perf_counter() - start)
+            logger.info("Link check finished: %s", summary)
+            return summary
+        finally:
+            heartbeat.cancel()
+            self.running = False
+            self.runs += 1
+            await self.lease.release(summary)
+
+    def _clients(self, limiter: HostLimiter) -> List["httpx.AsyncClient"]:
+        import httpx
+
+        count = max(1, -(-self.concurrency // CONNECTIONS_PER_CLIENT))
+        size = -(-self.concurrency // count)
+        limits = httpx.Limits(max_connections=size, max_keepalive_connections=size)
+
+        async def rate_limit(request: "httpx.Request"):
+            # Runs for every request, so redirects and GET fallbacks are spaced too
+            await limiter.wait(request.url.netloc.decode("ascii"))
+
+        backend = None
+        clients = []
+        for _ in range(count):
+            transport = self.transport
+            if transport is None and not self.allow_private:
+                transport = httpx.AsyncHTTPTransport(limits=limits)
+                # An injected transport makes its own connections. httpx has no public
+                # hook for the network backend, so wrap the pool's own one
+                backend = backend or PublicBackend(transport._pool._network_backend)
+                transport._pool._network_backend = backend
+            clients.append(httpx.AsyncClient(timeout=self.timeout, limits=limits, follow_redirects=True,
+                                             headers={"User-Agent": USER_AGENT}, transport=transport,
+                                             event_hooks={"request": [rate_limit]}))
+        return clients
+
+    def _summary(self, started_at: datetime, seconds: float) -> dict:
+        stats = self._run_stats
+        return {
+            "started_at": started_at,
+            "duration_s": round(seconds, 2),
+            "listings_scanned": stats["listings_scanned"],
+            "urls_checked": stats["urls_checked"],
+            "urls_per_second": round(stats["urls_checked"] / seconds, 1) if seconds else None,
+            "skipped_fresh": stats["skipped_fresh"],
+            "not_modified": stats["not_modified"],
+            "retries": stats["retries"],
+            "ok": stats["ok"],
+            "broken": stats["broken"],
+            "latency_ms": {
+                field: {"p50": percentile(samples, 0.5), "p95": percentile(samples, 0.95)}
+                for field, samples in self._latencies.items()
+            },
+        }
+
+    def trigger(self, force: bool = False) -> bool:
+        """Start a run in the background unless one is already running here"""
+        if self.running or (self._run_task and not self._run_task.done()):
+            return False
+        self._run_task = asyncio.get_running_loop().create_task(self._run_logged(force))
+        return True
+
+    async def _run_logged(self, force: bool = False):
+        try:
+            await self.run(force)
+        except Exception:
+            logger.exception("Link check run failed")
+
+    async def _schedule(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self._run_logged()
+
+    def start(self, interval: float):
+        """Attempt a run every `interval` seconds; the lease keeps it to one worker"""
+        if self._task is None and interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._schedule(interval))
+
+    async def stop(self):
+        for task in (self._task, self._run_task):
+            if task and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._run_task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "runs": self.runs,
+            "urls_checked": self._run_stats["urls_checked"],
+            "broken": self._run_stats["broken"],
+            "retries": self._run_stats["retries"],
+        }
+
+
+async def broken_listings(db, field: Optional[str] = None, limit: int = 100) -> List[dict]:
+    """Listings with at least one failing link (or failing `field`), with the failing checks"""
+    fields = [field] if field else list(LINK_FIELDS)
+    query = {"broken_links": {"$in": fields}}
+    projection = {"_id": 0, "id": 1, "name": 1, "broken_links": 1, "link_health": 1}
+    report = []
+    async for listing in db.mcp_servers.find(query, projection).sort("id", 1).limit(limit):
+        for name in listing["broken_links"]:
+            if name in fields:
+                report.append({"id": listing["id"], "name": listing["name"], "field": name,
+                               **listing.get("link_health", {}).get(name, {})})
+    return report
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Check every listing's external links")
+    parser.add_argument("command", choices=["check"])
+    parser.add_argument("--force", action="store_true", help="re-check URLs that are not due yet")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--host-rate", type=float, default=2.0, help="requests per second per host")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        checker = LinkChecker(client[os.environ['DB_NAME']], concurrency=args.concurrency, host_rate=args.host_rate)
+        summary = await checker.run(force=args.force)
+        if summary is None:
+            print("Another worker is running the link check")
+            return 1
+        print(f"Checked {summary['urls_checked']} URLs: {summary['ok']} ok, {summary['broken']} broken")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main()))
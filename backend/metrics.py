@@ -0,0 +1,375 @@
+"""Request latency instrumentation and Prometheus text exposition.
+
+`MetricsMiddleware` times every HTTP request and splits it into phases:
+
+- db: time spent in MongoDB commands, from the driver's command monitoring
+- pool_wait: time waiting to check a connection out of the Motor pool
+- validation / serialization / compression: time inside `phase(...)` blocks
+
+Phase totals are attributed to the request through a context variable,
+which Motor copies into its executor threads along with each operation.
+
+Setting PROFILE_SLOW_REQUEST_MS enables a sampling profiler: the event loop
+thread's stack is sampled every PROFILE_INTERVAL_MS, and requests slower
+than the threshold get the stacks sampled during their lifetime written to
+PROFILE_DIR in collapsed ("folded") format for flamegraph.pl or speedscope.
+Samples cover everything the loop ran meanwhile, not only that request.
+"""
+import contextvars
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as Tally, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("db", "pool_wait", "validation", "serialization", "compression")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                names, values = self.labels + ("le",), labels + (bound,)
+                lines.append(f"{self.name}_bucket{_labels(names, values)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, float]]]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[Tuple[str, str, float]]]):
+        """Register a callback yielding `(name, help, value)` gauges at scrape time"""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            for name, help, value in collect():
+                if value is None:
+                    continue
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")))
+request_phase = registry.register(Histogram(
+    "http_request_phase_seconds", "Per-request time spent in each phase", ("route", "phase")))
+requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being served"))
+mongo_command_latency = registry.register(Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency", ("command",)))
+mongo_pool_wait = registry.register(Histogram(
+    "mongo_pool_wait_seconds", "Time waiting to check out a pooled connection", ("pool",)))
+mongo_connections_checked_out = registry.register(Gauge(
+    "mongo_connections_checked_out", "Connections currently checked out of the pool", ("pool",)))
+
+
+class RequestTimings:
+    __slots__ = ("db", "pool_wait", "validation", "serialization", "compression", "lock")
+
+    def __init__(self):
+        self.db = 0.0
+        self.pool_wait = 0.0
+        self.validation = 0.0
+        self.serialization = 0.0
+        self.compression = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float):
+        with self.lock:
+            setattr(self, phase, getattr(self, phase) + seconds)
+
+
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Attribute the time spent in the block to a phase of the current request"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class CommandTimer(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def _finished(self, event):
+        seconds = event.duration_micros / 1e6
+        mongo_command_latency.observe(seconds, event.command_name)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add("db", seconds)
+
+    succeeded = _finished
+    failed = _finished
+
+
+class PoolTimer(monitoring.ConnectionPoolListener):
+    """Measures checkout waits and pool occupancy for one named client.
+
+    Start and finish events for a checkout arrive on the same thread.
+    """
+
+    def __init__(self, pool: str = "default"):
+        self.pool = pool
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+
+    def _waited(self):
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return None
+        self._local.started = None
+        return time.perf_counter() - started
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+        mongo_connections_checked_out.inc(1, self.pool)
+        waited = self._waited()
+        if waited is not None:
+            mongo_pool_wait.observe(waited, self.pool)
+            timings = current_timings.get()
+            if timings is not None:
+                timings.add("pool_wait", waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+        self._waited()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+        mongo_connections_checked_out.inc(-1, self.pool)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval into a bounded ring buffer"""
+
+    def __init__(self, thread_id: int, interval: float, max_samples: int = 20000):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: deque = deque(maxlen=max_samples)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples.append((time.monotonic(), ";".join(reversed(stack))))
+
+    def folded(self, start: float, end: float) -> str:
+        counts = Tally(stack for ts, stack in list(self.samples) if start <= ts <= end)
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, phases and in-flight requests"""
+
+    def __init__(self, app, slow_request_ms: Optional[float] = None, profile_dir: str = ".", profile_interval_ms: float = 5):
+        self.app = app
+        self.slow_request = slow_request_ms / 1000 if slow_request_ms else None
+        self.profile_dir = profile_dir
+        self.profile_interval = profile_interval_ms / 1000
+        self.sampler: Optional[StackSampler] = None
+
+    def _ensure_sampler(self):
+        if self.slow_request and self.sampler is None:
+            # The middleware runs on the event loop thread, which is the one to sample
+            self.sampler = StackSampler(threading.get_ident(), self.profile_interval)
+            self.sampler.start()
+            logger.info("Sampling profiler enabled for requests slower than %.0f ms", self.slow_request * 1000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self._ensure_sampler()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        requests_in_flight.inc(1)
+        start_wall = time.monotonic()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.inc(-1)
+            current_timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            request_latency.observe(elapsed, scope["method"], route_path, status[0])
+            for name in PHASES:
+                request_phase.observe(getattr(timings, name), route_path, name)
+            if self.sampler is not None and elapsed >= self.slow_request:
+                self._dump_profile(scope, route_path, start_wall, elapsed)
+
+    def _dump_profile(self, scope, route_path: str, start: float, elapsed: float):
+        folded = self.sampler.folded(start, start + elapsed)
+        if not folded:
+            return
+        slug = route_path.strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        path = os.path.join(self.profile_dir, f"slow-{slug}-{int(time.time() * 1000)}.folded")
+        try:
+            with open(path, "w") as out:
+                out.write(folded)
+            logger.warning("Slow request %s %s took %.0f ms, stacks written to %s",
+                           scope["method"], scope["path"], elapsed * 1000, path)
+        except OSError:
+            logger.exception("Failed to write profile to %s", path)
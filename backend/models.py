@@ -0,0 +1,76 @@
+"""Catalog listing models shared by the API, the bulk importer and the seed script"""
+import uuid
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+
+class MCPCategory(str, Enum):
+    SEO_ANALYTICS = "SEO Analytics"
+    CONTENT_GENERATION = "Content Generation"
+    SOCIAL_MEDIA = "Social Media Management"
+    EMAIL_MARKETING = "Email Marketing"
+    PERFORMANCE_TRACKING = "Performance Tracking"
+    KEYWORD_RESEARCH = "Keyword Research"
+    COMPETITOR_ANALYSIS = "Competitor Analysis"
+    AUTOMATION = "Marketing Automation"
+
+class PricingModel(str, Enum):
+    FREE = "Free"
+    FREEMIUM = "Freemium"
+    PAID = "Paid"
+    ENTERPRISE = "Enterprise"
+
+class MCPServer(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    name: str
+    description: str
+    detailed_description: str
+    category: MCPCategory
+    features: List[str]
+    pricing_model: PricingModel
+    pricing_details: str
+    affiliate_url: str
+    official_url: str
+    logo_url: str
+    rating: float = Field(ge=0, le=5)
+    total_reviews: int = Field(default=0)
+    is_sponsored: bool = Field(default=False)
+    is_featured: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class MCPServerCreate(BaseModel):
+    name: str
+    description: str
+    detailed_description: str
+    category: MCPCategory
+    features: List[str]
+    pricing_model: PricingModel
+    pricing_details: str
+    affiliate_url: str
+    official_url: str
+    logo_url: str
+    rating: float = Field(ge=0, le=5)
+    total_reviews: int = Field(default=0)
+    is_sponsored: bool = Field(default=False)
+    is_featured: bool = Field(default=False)
+
+class MCPServerSummary(BaseModel):
+    """Fields rendered by the directory grid"""
+    id: str
+    name: str
+    description: str
+    category: MCPCategory
+    pricing_model: PricingModel
+    affiliate_url: str
+    logo_url: str
+    rating: float = Field(ge=0, le=5)
+    total_reviews: int = Field(default=0)
+    is_sponsored: bool = Field(default=False)
+    is_featured: bool = Field(default=False)
+
+class MCPServerImport(MCPServerCreate):
+    """Bulk import row; rows without an id are keyed on their official_url"""
+    id: Optional[str] = None
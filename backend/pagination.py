@@ -0,0 +1,77 @@
+import base64
+import json
+import math
+from typing import List, Optional
+
+# Directory ordering; `id` breaks ties so every listing has a unique position
+LISTING_SORT = [("is_sponsored", -1), ("is_featured", -1), ("rating", -1), ("id", 1)]
+
+DEFAULT_MODE = "default"
+RELEVANCE_MODE = "relevance"
+RANKED_MODE = "ranked"
+# Change feed tokens carry the last catalog revision read
+CHANGES_MODE = "changes"
+
+# Type of each element of a mode's sort key: listing order, [score, id],
+# [score, id, ranking generation] or [revision]
+NUMBER = "number"
+KEY_TYPES = {
+    DEFAULT_MODE: (bool, bool, NUMBER, str),
+    RELEVANCE_MODE: (NUMBER, str),
+    RANKED_MODE: (NUMBER, str, str),
+    CHANGES_MODE: (int,),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(mode: str, key: list) -> str:
+    """Serialize the sort key of the last returned listing into an opaque token"""
+    raw = json.dumps({"m": mode, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, mode: str) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = payload["k"]
+        cursor_mode = payload["m"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor")
+    types = KEY_TYPES[mode]
+    if cursor_mode != mode or not isinstance(key, list) or len(key) != len(types):
+        raise InvalidCursor("Cursor does not match the requested sort")
+    if not all(_is_type(value, kind) for value, kind in zip(key, types)):
+        raise InvalidCursor("Malformed cursor")
+    return key
+
+
+def _is_type(value, kind) -> bool:
+    # bool is an int subclass, so it is neither a number nor a revision here
+    if kind is bool:
+        return isinstance(value, bool)
+    if isinstance(value, bool):
+        return False
+    if kind == NUMBER:
+        return isinstance(value, (int, float)) and math.isfinite(value)
+    return isinstance(value, kind)
+
+
+def listing_key(server: dict) -> list:
+    """Position of a listing in LISTING_SORT order"""
+    return [server["is_sponsored"], server["is_featured"], server["rating"], server["id"]]
+
+
+def keyset_query(after: Optional[list]) -> dict:
+    """Mongo filter for listings that sort strictly after the `after` key"""
+    if not after:
+        return {}
+    clauses: List[dict] = []
+    equal: dict = {}
+    for (field, direction), value in zip(LISTING_SORT, after):
+        clauses.append({**equal, field: {"$lt" if direction < 0 else "$gt": value}})
+        equal[field] = value
+    return {"$or": clauses}
@@ -0,0 +1,307 @@
+"""Columnar listing ranking with pluggable composite scores.
+
+`RankingEngine` keeps the ranking features of every listing in NumPy
+columns (rating, review count, sponsored and featured flags, category and
+pricing codes, recent clicks) and orders listings by a weighted sum of
+scorer outputs. Scoring the whole catalog is one vectorised pass, cached
+until the next write, and a page is the top-k of the filtered rows via
+`argpartition`, so re-ranking a million listings costs milliseconds.
+
+Scorers map the engine to one float per row and are registered by name in
+`SCORERS`; the weights pick which ones take part. The defaults keep the
+directory's tiers (sponsored, then featured) and order within them by a
+Bayesian-average rating and a click-through boost instead of raw rating.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Clicks that count as a conversion, and the click type used as the view count
+CONVERSION_CLICKS = ("affiliate", "official")
+VIEW_CLICKS = "details"
+
+DEFAULT_WEIGHTS = {"sponsored": 100.0, "featured": 10.0, "bayesian_rating": 1.0, "ctr": 2.0}
+
+
+def bayesian_rating(engine: "RankingEngine") -> np.ndarray:
+    """Rating shrunk towards the catalog mean, by `prior_reviews` pseudo-reviews"""
+    alive = engine.alive
+    if not alive.any():
+        return np.zeros(len(alive))
+    reviews = engine.reviews
+    total = reviews[alive].sum()
+    mean = float((engine.rating[alive] * reviews[alive]).sum() / total) if total else float(engine.rating[alive].mean())
+    prior = engine.prior_reviews
+    return (prior * mean + engine.rating * reviews) / (prior + reviews)
+
+
+def ctr_boost(engine: "RankingEngine") -> np.ndarray:
+    """Smoothed conversions per detail view, relative to the catalog rate (0 for an average listing)"""
+    views = engine.views
+    conversions = engine.conversions
+    total_views = views.sum()
+    base = float(conversions.sum() / total_views) if total_views else 0.0
+    prior = engine.prior_views
+    return (conversions + prior * base) / (views + prior) - base
+
+
+SCORERS: Dict[str, Callable[["RankingEngine"], np.ndarray]] = {
+    "sponsored": lambda engine: engine.sponsored.astype(np.float64),
+    "featured": lambda engine: engine.featured.astype(np.float64),
+    "bayesian_rating": bayesian_rating,
+    "ctr": ctr_boost,
+}
+
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """Parse "name=weight,name=weight"; raises ValueError for unknown scorers"""
+    weights = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, value = part.partition("=")
+        if name not in SCORERS:
+            raise ValueError(f"Unknown ranking scorer {name!r}; known: {', '.join(SCORERS)}")
+        weights[name] = float(value)
+    return weights
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+def click_generation(clicks: Dict[str, Tuple[int, int]]) -> str:
+    """Short digest of click counts; changes whenever a refresh can reorder listings"""
+    raw = repr(sorted((server_id, tuple(counts)) for server_id, counts in clicks.items())).encode()
+    return hashlib.blake2b(raw, digest_size=6).hexdigest()
+
+
+class RankingEngine:
+    def __init__(self, weights: Optional[Dict[str, float]] = None, prior_reviews: float = 50, prior_views: float = 100,
+                 capacity: int = 1024):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.prior_reviews = prior_reviews
+        self.prior_views = prior_views
+        self.ready = False
+        self._ids: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._codes: Dict[str, Dict[str, int]] = {"category": {}, "pricing_model": {}}
+        self._allocate(capacity)
+        self._clicks: Dict[str, Tuple[int, int]] = {}
+        self._scores: Optional[np.ndarray] = None
+        # Digest of the click counts, so every worker with the same counts agrees on it
+        self.generation = click_generation(self._clicks)
+        self.score_seconds = 0.0
+        self.clicks_refreshed_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _allocate(self, capacity: int):
+        self._capacity = capacity
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._rating = np.zeros(capacity)
+        self._reviews = np.zeros(capacity)
+        self._sponsored = np.zeros(capacity, dtype=bool)
+        self._featured = np.zeros(capacity, dtype=bool)
+        self._category = np.full(capacity, -1, dtype=np.int16)
+        self._pricing = np.full(capacity, -1, dtype=np.int16)
+        self._views = np.zeros(capacity)
+        self._conversions = np.zeros(capacity)
+
+    def _grow(self):
+        size = len(self._ids)
+        columns = {name: getattr(self, name)[:size] for name in (
+            "_alive", "_rating", "_reviews", "_sponsored", "_featured", "_category", "_pricing", "_views", "_conversions")}
+        self._allocate(self._capacity * 2)
+        for name, column in columns.items():
+            getattr(self, name)[:size] = column
+
+    # Columns trimmed to the rows in use; scorers read these
+    alive = property(lambda self: self._alive[:len(self._ids)])
+    rating = property(lambda self: self._rating[:len(self._ids)])
+    reviews = property(lambda self: self._reviews[:len(self._ids)])
+    sponsored = property(lambda self: self._sponsored[:len(self._ids)])
+    featured = property(lambda self: self._featured[:len(self._ids)])
+    views = property(lambda self: self._views[:len(self._ids)])
+    conversions = property(lambda self: self._conversions[:len(self._ids)])
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _code(self, field: str, value) -> int:
+        codes = self._codes[field]
+        value = _enum_value(value)
+        if value not in codes:
+            codes[value] = len(codes)
+        return codes[value]
+
+    def build(self, docs: Iterable[dict]):
+        """Replace the contents with the given listings, filling each column in one pass"""
+        docs = list(docs)
+        count = len(docs)
+        self._ids = [doc["id"] for doc in docs]
+        self._rows = {server_id: row for row, server_id in enumerate(self._ids)}
+        self._free = []
+        self._allocate(max(1024, count + count // 4))
+        if len(self._rows) != count:
+            # Repeated ids: fall back to upserting one by one
+            self._ids, self._rows = [], {}
+            for doc in docs:
+                self.add(doc)
+        else:
+            def column(value, dtype):
+                return np.fromiter((value(doc) for doc in docs), dtype, count)
+
+            self._alive[:count] = True
+            self._rating[:count] = column(lambda doc: float(doc.get("rating") or 0), np.float64)
+            self._reviews[:count] = column(lambda doc: float(doc.get("total_reviews") or 0), np.float64)
+            self._sponsored[:count] = column(lambda doc: bool(doc.get("is_sponsored")), bool)
+            self._featured[:count] = column(lambda doc: bool(doc.get("is_featured")), bool)
+            self._category[:count] = column(lambda doc: self._code("category", doc.get("category")), np.int16)
+            self._pricing[:count] = column(lambda doc: self._code("pricing_model", doc.get("pricing_model")), np.int16)
+        self.set_clicks(self._clicks)
+        self.ready = True
+
+    def add(self, doc: dict):
+        """Insert or update one listing's features"""
+        server_id = doc["id"]
+        row = self._rows.get(server_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+                self._ids[row] = server_id
+            else:
+                if len(self._ids) == self._capacity:
+                    self._grow()
+                row = len(self._ids)
+                self._ids.append(server_id)
+            self._rows[server_id] = row
+            views, conversions = self._clicks.get(server_id, (0, 0))
+            self._views[row] = views
+            self._conversions[row] = conversions
+        self._alive[row] = True
+        self._rating[row] = float(doc.get("rating") or 0)
+        self._reviews[row] = float(doc.get("total_reviews") or 0)
+        self._sponsored[row] = bool(doc.get("is_sponsored"))
+        self._featured[row] = bool(doc.get("is_featured"))
+        self._category[row] = self._code("category", doc.get("category"))
+        self._pricing[row] = self._code("pricing_model", doc.get("pricing_model"))
+        self._scores = None
+
+    def remove(self, server_id: str):
+        row = self._rows.pop(server_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._ids[row] = None
+        self._views[row] = self._conversions[row] = 0
+        self._free.append(row)
+        self._scores = None
+
+    def set_clicks(self, clicks: Dict[str, Tuple[int, int]]):
+        """Replace recent `(views, conversions)` per server id"""
+        self._clicks = clicks
+        self.generation = click_generation(clicks)
+        self._views[:] = 0
+        self._conversions[:] = 0
+        for server_id, (views, conversions) in clicks.items():
+            row = self._rows.get(server_id)
+            if row is not None:
+                self._views[row] = views
+                self._conversions[row] = conversions
+        if clicks:
+            self.clicks_refreshed_at = time.time()
+        self._scores = None
+
+    def scores(self) -> np.ndarray:
+        """Composite score per row, -inf for free rows; cached until the next change"""
+        if self._scores is None:
+            start = time.perf_counter()
+            scores = np.zeros(len(self._ids))
+            for name, weight in self.weights.items():
+                if weight:
+                    scores += weight * SCORERS[name](self)
+            scores[~self.alive] = -np.inf
+            self._scores = scores
+            self.score_seconds = time.perf_counter() - start
+        return self._scores
+
+    def top(
+        self,
+        limit: Optional[int],
+        category=None,
+        pricing_model=None,
+        featured_only: bool = False,
+        sponsored_only: bool = False,
+        after: Optional[list] = None,
+    ) -> List[Tuple[str, float]]:
+        """Highest-scoring `(id, score)` pairs, ties broken by id.
+
+        `after` is the `[score, id]` of the last listing of the previous page;
+        `limit=None` returns every match.
+        """
+        scores = self.scores()
+        mask = self.alive.copy()
+        for field, column, value in (("category", self._category, category), ("pricing_model", self._pricing, pricing_model)):
+            if value is not None:
+                code = self._codes[field].get(_enum_value(value))
+                if code is None:
+                    return []
+                mask &= column[:len(self._ids)] == code
+        if featured_only:
+            mask &= self.featured
+        if sponsored_only:
+            mask &= self.sponsored
+        if after:
+            last_score, last_id = after
+            ties = np.flatnonzero(mask & (scores == last_score))
+            mask &= scores < last_score
+            mask[[row for row in ties if self._ids[row] > last_id]] = True
+
+        rows = np.flatnonzero(mask)
+        if limit is not None and len(rows) > limit:
+            # Keep everything tied with the k-th score so the id tie-break stays exact
+            kth = scores[rows[np.argpartition(-scores[rows], limit - 1)[limit - 1]]]
+            rows = rows[scores[rows] >= kth]
+        ids = self._ids
+        ordered = sorted(rows.tolist(), key=lambda row: (-scores[row], ids[row]))[:limit]
+        return [(ids[row], float(scores[row])) for row in ordered]
+
+    async def refresh_clicks(self, load: Callable[[], Awaitable[Dict[str, Tuple[int, int]]]]):
+        self.set_clicks(await load())
+
+    async def _refresh(self, load, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh_clicks(load)
+            except Exception:
+                logger.exception("Failed to refresh ranking click counts")
+
+    def start(self, load: Callable[[], Awaitable[Dict[str, Tuple[int, int]]]], interval: float):
+        """Reload click counts every `interval` seconds"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh(load, interval))
+
+    async def stop(self):
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+        self._refresh_task = None
+
+    def stats(self) -> dict:
+        return {
+            "listings": len(self._rows),
+            "rows": len(self._ids),
+            "weights": self.weights,
+            "score_ms": round(self.score_seconds * 1000, 3),
+            "generation": self.generation,
+            "clicks_age_seconds": time.time() - self.clicks_refreshed_at if self.clicks_refreshed_at else None,
+        }
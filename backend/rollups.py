@@ -0,0 +1,401 @@
+"""Pre-aggregated click counters.
+
+Every ingested click increments counters in `click_rollups` for each
+combination of server (or "*" for all servers), click type (or "*" for all
+types) and granularity ("total", "day", "hour", "minute"). All-time counts are
+a single document read; ranged counts sum whole-day buckets plus hourly
+buckets at the edges of the range and minute buckets for partial hours;
+`series` reads one granularity as a zero-filled time series. Times are
+naive UTC; `naive_utc` converts timezone-aware input.
+
+Storage stays bounded by tiered retention: raw `click_tracking` events are
+TTL-deleted after `RAW_CLICK_RETENTION`, minute buckets after
+`RETENTION[MINUTE]` and hour buckets after `RETENTION[HOUR]`. Day and total
+counters are kept forever, so older ranges resolve to whole days, and
+partial hours older than the minute retention to whole hours.
+
+Rebuild the counters from the raw events still retained with:
+
+    python rollups.py rebuild          # keeps counters older than the raw retention
+    python rollups.py rebuild --full   # recompute everything from raw events
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from indexes import INDEXES, RAW_CLICK_RETENTION, ensure_indexes
+from jobs import JobLease
+
+logger = logging.getLogger(__name__)
+
+ALL = "*"
+TOTAL = "total"
+DAY = "day"
+HOUR = "hour"
+MINUTE = "minute"
+GRANULARITIES = (TOTAL, DAY, HOUR, MINUTE)
+
+STEP = {DAY: timedelta(days=1), HOUR: timedelta(hours=1), MINUTE: timedelta(minutes=1)}
+
+# How long each fine-grained bucket is kept after it closes
+RETENTION = {MINUTE: timedelta(days=2), HOUR: timedelta(days=90)}
+
+# Upper bound on points returned by one `series` call
+MAX_SERIES_POINTS = 2000
+
+ROLLUP_COLLECTION = "click_rollups"
+# Lease held in `job_runs` while the counters are rebuilt
+REBUILD_JOB = "click_rollups_rebuild"
+
+
+def truncate(ts: datetime, granularity: str) -> Optional[datetime]:
+    if granularity == MINUTE:
+        return ts.replace(second=0, microsecond=0)
+    if granularity == HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == DAY:
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+def ceil_hour(ts: datetime) -> datetime:
+    floor = truncate(ts, HOUR)
+    return floor if floor == ts else floor + timedelta(hours=1)
+
+
+def ceil_minute(ts: datetime) -> datetime:
+    floor = truncate(ts, MINUTE)
+    return floor if floor == ts else floor + timedelta(minutes=1)
+
+
+def naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    """Timezone-aware datetimes converted to the naive UTC the counters are stored in"""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def expires_at(granularity: str, bucket: Optional[datetime]) -> Optional[datetime]:
+    if granularity not in RETENTION:
+        return None
+    return bucket + STEP[granularity] + RETENTION[granularity]
+
+
+def rollup_keys(click: dict):
+    """Yield every (server_id, click_type, granularity, bucket) a click counts towards"""
+    for server_id in (click["server_id"], ALL):
+        for click_type in (click["click_type"], ALL):
+            for granularity in GRANULARITIES:
+                yield server_id, click_type, granularity, truncate(click["timestamp"], granularity)
+
+
+def split_range(start: datetime, end: datetime, now: Optional[datetime] = None) -> List[Tuple[str, datetime, datetime]]:
+    """Cover [start, end) with minute buckets for partial hours, hourly edges and whole days in between.
+
+    Bounds are widened to whole minutes; a partial hour whose minute buckets
+    have expired is widened to the whole hour.
+    """
+    minutes_from = (now or datetime.utcnow()) - RETENTION[MINUTE]
+    start = truncate(start, MINUTE)
+    end = ceil_minute(end)
+    if start < minutes_from:
+        start = truncate(start, HOUR)
+    if truncate(end, HOUR) < minutes_from:
+        end = ceil_hour(end)
+    hour_start, hour_end = ceil_hour(start), truncate(end, HOUR)
+    if hour_start > hour_end:
+        return [(MINUTE, start, end)]
+    parts = _split_hours(hour_start, hour_end)
+    if start < hour_start:
+        parts.append((MINUTE, start, hour_start))
+    if hour_end < end:
+        parts.append((MINUTE, hour_end, end))
+    return parts
+
+
+def covered_range(start: datetime, end: datetime, now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+    """The bounds `split_range` actually counts for [start, end)"""
+    parts = split_range(start, end, now)
+    return min(lo for _, lo, _ in parts), max(hi for _, _, hi in parts)
+
+
+def _split_hours(start: datetime, end: datetime) -> List[Tuple[str, datetime, datetime]]:
+    """Cover whole-hour [start, end) with hourly edges and whole days in between"""
+    if start >= end:
+        return []
+    first_day = truncate(start, DAY)
+    if first_day < start:
+        first_day += timedelta(days=1)
+    last_day = truncate(end, DAY)
+    if first_day >= last_day:
+        return [(HOUR, start, end)]
+    parts = [(DAY, first_day, last_day)]
+    if start < first_day:
+        parts.append((HOUR, start, first_day))
+    if last_day < end:
+        parts.append((HOUR, last_day, end))
+    return parts
+
+
+class ClickRollups:
+    def __init__(self, db):
+        self.db = db
+
+    @property
+    def collection(self):
+        return self.db[ROLLUP_COLLECTION]
+
+    async def ensure_indexes(self):
+        await ensure_indexes(self.db, [ROLLUP_COLLECTION])
+
+    async def record(self, clicks: Iterable[dict], retries: int = 2):
+        """Increment counters for a batch of raw click events in one bulk write.
+
+        Updates that fail (e.g. two upserts racing to create a bucket) are
+        retried up to `retries` times; the ones already applied are not, so
+        nothing is counted twice.
+        """
+        counts = Counter(key for click in clicks for key in rollup_keys(click))
+        if not counts:
+            return
+        operations = []
+        for (server_id, click_type, granularity, bucket), n in counts.items():
+            update = {"$inc": {"count": n}}
+            expiry = expires_at(granularity, bucket)
+            if expiry:
+                update["$setOnInsert"] = {"expires_at": expiry}
+            operations.append(UpdateOne(
+                {"server_id": server_id, "click_type": click_type, "granularity": granularity, "bucket": bucket},
+                update,
+                upsert=True,
+            ))
+        for attempt in range(retries + 1):
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+                return
+            except BulkWriteError as exc:
+                failed = [operations[error["index"]] for error in exc.details["writeErrors"]]
+                if not failed or attempt == retries:
+                    raise
+                operations = failed
+
+    async def count(
+        self,
+        server_id: str = ALL,
+        click_type: str = ALL,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> int:
+        """Number of clicks matching the server/type, optionally within [start, end)"""
+        key = {"server_id": server_id, "click_type": click_type}
+        if start is None and end is None:
+            doc = await self.collection.find_one({**key, "granularity": TOTAL, "bucket": None}, {"count": 1})
+            return doc["count"] if doc else 0
+
+        if start is None:
+            # Day buckets never expire, so the first one marks the start of history
+            first = await self.collection.find_one({**key, "granularity": DAY}, {"bucket": 1}, sort=[("bucket", ASCENDING)])
+            if not first:
+                return 0
+            start = first["bucket"]
+        end = end or datetime.utcnow()
+        if start >= end:
+            return 0
+
+        clauses = [
+            {"granularity": granularity, "bucket": {"$gte": lo, "$lt": hi}}
+            for granularity, lo, hi in split_range(start, end)
+        ]
+        pipeline = [
+            {"$match": {**key, "$or": clauses}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+        ]
+        result = await self.collection.aggregate(pipeline).to_list(1)
+        return result[0]["count"] if result else 0
+
+    async def series(
+        self,
+        start: datetime,
+        end: datetime,
+        granularity: str,
+        server_id: str = ALL,
+        click_type: str = ALL,
+    ) -> List[Tuple[datetime, int]]:
+        """Click counts per `granularity` bucket in [start, end), zero-filled.
+
+        Raises ValueError for an unknown granularity or too many points.
+        Buckets older than the granularity's retention read as zero.
+        """
+        if granularity not in STEP:
+            raise ValueError(f"granularity must be one of {', '.join(STEP)}")
+        step = STEP[granularity]
+        start = truncate(start, granularity)
+        if truncate(end, granularity) < end:
+            end = truncate(end, granularity) + step
+        if (end - start) / step > MAX_SERIES_POINTS:
+            raise ValueError(f"window spans more than {MAX_SERIES_POINTS} {granularity} buckets")
+
+        query = {
+            "server_id": server_id,
+            "click_type": click_type,
+            "granularity": granularity,
+            "bucket": {"$gte": start, "$lt": end},
+        }
+        counts = {
+            doc["bucket"]: doc["count"]
+            async for doc in self.collection.find(query, {"_id": 0, "bucket": 1, "count": 1}).sort("bucket", ASCENDING)
+        }
+        points = []
+        bucket = start
+        while bucket < end:
+            points.append((bucket, counts.get(bucket, 0)))
+            bucket += step
+        return points
+
+    async def counts_by_server(self, start: datetime, click_types: Iterable[str]) -> dict:
+        """Clicks per `(server_id, click_type)` since `start`, from whole-day buckets.
+
+        Scans every server's day buckets in the range; meant for periodic
+        background jobs, not the request path.
+        """
+        pipeline = [
+            {"$match": {
+                "granularity": DAY,
+                "bucket": {"$gte": truncate(start, DAY)},
+                "click_type": {"$in": list(click_types)},
+                "server_id": {"$ne": ALL},
+            }},
+            {"$group": {"_id": {"server_id": "$server_id", "click_type": "$click_type"}, "count": {"$sum": "$count"}}},
+        ]
+        return {
+            (doc["_id"]["server_id"], doc["_id"]["click_type"]): doc["count"]
+            async for doc in self.collection.aggregate(pipeline, allowDiskUse=True)
+        }
+
+    async def is_empty(self) -> bool:
+        return await self.collection.find_one({}, {"_id": 1}) is None
+
+    async def rebuild(self, full: bool = False, lease_ttl: timedelta = timedelta(minutes=5)) -> Optional[int]:
+        """Recompute counters from the raw click events; returns the number of counters.
+
+        Raw events are only retained for `RAW_CLICK_RETENTION`, so by default
+        buckets from before the oldest whole day still in the raw store are
+        carried over unchanged and only later ones are recomputed. `full`
+        (implied when there are no counters yet) recomputes everything.
+
+        Counters are built into a scratch collection and swapped in with a
+        rename, so readers never see a partial rebuild. Clicks ingested while
+        the rebuild runs are lost from the counters; run it before starting
+        the API or during a quiet period.
+
+        The scratch collection is shared, so a rebuild holds a lease in
+        `job_runs` and returns None without doing anything when another one
+        is already running.
+        """
+        lease = JobLease(self.db, REBUILD_JOB, lease_ttl)
+        if not await lease.acquire():
+            logger.info("Click rollups are already being rebuilt by another worker")
+            return None
+        heartbeat = asyncio.get_running_loop().create_task(_renew(lease))
+        try:
+            return await self._rebuild(full)
+        finally:
+            heartbeat.cancel()
+            await lease.release()
+
+    async def _rebuild(self, full: bool) -> int:
+        now = datetime.utcnow()
+        since = None
+        if not full and not await self.is_empty():
+            since = truncate(now - RAW_CLICK_RETENTION, DAY) + timedelta(days=1)
+
+        pipeline = [{"$match": {"timestamp": {"$gte": since}}}] if since else []
+        pipeline.append({"$group": {
+            "_id": {
+                "server_id": "$server_id",
+                "click_type": "$click_type",
+                "minute": {"$dateToString": {"format": "%Y-%m-%dT%H:%M", "date": "$timestamp"}},
+            },
+            "count": {"$sum": 1},
+        }})
+        counts = Counter()
+        async for group in self.db.click_tracking.aggregate(pipeline, allowDiskUse=True):
+            minute = datetime.strptime(group["_id"]["minute"], "%Y-%m-%dT%H:%M")
+            click = {"server_id": group["_id"]["server_id"], "click_type": group["_id"]["click_type"], "timestamp": minute}
+            for key in rollup_keys(click):
+                counts[key] += group["count"]
+
+        docs = []
+        if since:
+            carried = {"granularity": {"$ne": TOTAL}, "bucket": {"$lt": since}}
+            async for doc in self.collection.find(carried, {"_id": 0}):
+                docs.append(doc)
+                if doc["granularity"] == DAY:
+                    counts[doc["server_id"], doc["click_type"], TOTAL, None] += doc["count"]
+
+        for (server_id, click_type, granularity, bucket), n in counts.items():
+            expiry = expires_at(granularity, bucket)
+            if expiry and expiry <= now:
+                continue
+            doc = {"server_id": server_id, "click_type": click_type, "granularity": granularity, "bucket": bucket, "count": n}
+            if expiry:
+                doc["expires_at"] = expiry
+            docs.append(doc)
+
+        scratch = self.db[ROLLUP_COLLECTION + "_rebuild"]
+        await scratch.drop()
+        await scratch.create_indexes(INDEXES[ROLLUP_COLLECTION])
+        for i in range(0, len(docs), 10000):
+            await scratch.insert_many(docs[i:i + 10000])
+        if docs:
+            await scratch.rename(ROLLUP_COLLECTION, dropTarget=True)
+        else:
+            await self.collection.drop()
+        await self.ensure_indexes()
+        logger.info("Rebuilt %d click rollup counters", len(docs))
+        return len(docs)
+
+
+async def _renew(lease: JobLease):
+    while True:
+        await asyncio.sleep(lease.ttl.total_seconds() / 3)
+        try:
+            await lease.renew()
+        except Exception:
+            logger.exception("Failed to renew the click rollup rebuild lease")
+
+
+async def _main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Maintain pre-aggregated click counters")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--full", action="store_true", help="recompute counters older than the raw event retention too")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        count = await ClickRollups(client[os.environ['DB_NAME']]).rebuild(full=args.full)
+        if count is None:
+            print("Another worker is rebuilding the click rollups")
+            return 1
+        print(f"Successfully rebuilt {count} click rollup counters")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main()))
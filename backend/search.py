@@ -0,0 +1,324 @@
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Relative weight of each listing field when scoring a match
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "features": 1.5,
+    "description": 1.0,
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Prefix expansions score slightly below exact term matches
+PREFIX_PENALTY = 0.8
+
+# Relative change in average document length before BM25 norms are recomputed
+NORM_DRIFT = 0.1
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def field_text(doc: dict, field: str) -> str:
+    value = doc.get(field) or ""
+    if isinstance(value, list):
+        return " ".join(value)
+    return value
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+class SearchIndex:
+    """In-memory inverted index over listing text with BM25 relevance scoring.
+
+    Besides postings, the index keeps the handful of attributes that
+    `get_servers` filters and sorts on, so a search can be filtered, ranked
+    and truncated to `limit` ids before Mongo is asked for any documents.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ready = False
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._terms: List[str] = []  # sorted vocabulary for prefix lookups
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._total_len = 0.0
+        # BM25 length normalisation, refreshed when the average length drifts
+        self._norm: Dict[str, float] = {}
+        self._norm_avgdl = 0.0
+        # Filter and ordering attributes
+        self._by_category: Dict[str, Set[str]] = defaultdict(set)
+        self._by_pricing: Dict[str, Set[str]] = defaultdict(set)
+        self._featured: Set[str] = set()
+        self._sponsored: Set[str] = set()
+        self._order: Dict[str, tuple] = {}
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._doc_len
+
+    def build(self, docs: Iterable[dict]):
+        """Replace the index contents with the given documents"""
+        self.clear()
+        for doc in docs:
+            self.add(doc)
+        self.ready = True
+
+    def clear(self):
+        self._postings.clear()
+        self._terms.clear()
+        self._doc_terms.clear()
+        self._doc_len.clear()
+        self._total_len = 0.0
+        self._norm.clear()
+        self._norm_avgdl = 0.0
+        self._by_category.clear()
+        self._by_pricing.clear()
+        self._featured.clear()
+        self._sponsored.clear()
+        self._order.clear()
+
+    def add(self, doc: dict):
+        """Index a listing, replacing any previous version with the same id"""
+        doc_id = doc["id"]
+        if doc_id in self._doc_len:
+            self.remove(doc_id)
+
+        weighted_tf: Dict[str, float] = defaultdict(float)
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(field_text(doc, field)):
+                weighted_tf[token] += weight
+                length += weight
+
+        for term, tf in weighted_tf.items():
+            postings = self._postings[term]
+            if not postings:
+                insort(self._terms, term)
+            postings[doc_id] = tf
+
+        self._doc_terms[doc_id] = list(weighted_tf)
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        if self._norm_avgdl:
+            self._norm[doc_id] = self._length_norm(length, self._norm_avgdl)
+
+        self._by_category[_enum_value(doc.get("category"))].add(doc_id)
+        self._by_pricing[_enum_value(doc.get("pricing_model"))].add(doc_id)
+        if doc.get("is_featured"):
+            self._featured.add(doc_id)
+        if doc.get("is_sponsored"):
+            self._sponsored.add(doc_id)
+        self._order[doc_id] = (
+            not doc.get("is_sponsored", False),
+            not doc.get("is_featured", False),
+            -float(doc.get("rating", 0)),
+            doc_id,
+        )
+
+    def remove(self, doc_id: str):
+        """Drop a listing from the index; unknown ids are ignored"""
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+                i = bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    del self._terms[i]
+        self._total_len -= self._doc_len.pop(doc_id)
+        self._norm.pop(doc_id, None)
+        for ids in (*self._by_category.values(), *self._by_pricing.values()):
+            ids.discard(doc_id)
+        self._featured.discard(doc_id)
+        self._sponsored.discard(doc_id)
+        del self._order[doc_id]
+
+    def expand_prefix(self, prefix: str) -> List[str]:
+        """Return every indexed term starting with `prefix`"""
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\uffff")
+        return self._terms[start:end]
+
+    def _expansions(self, token: str, prefix: bool) -> List[Tuple[str, float]]:
+        expansions = [(token, 1.0)] if token in self._postings else []
+        if prefix:
+            expansions += [(t, PREFIX_PENALTY) for t in self.expand_prefix(token) if t != token]
+        return expansions
+
+    def _length_norm(self, length: float, avgdl: float) -> float:
+        return self.k1 * (1 - self.b + self.b * length / avgdl)
+
+    def _refresh_norms(self):
+        avgdl = self._total_len / len(self._doc_len) if self._doc_len else 1.0
+        if self._norm_avgdl and abs(avgdl - self._norm_avgdl) <= NORM_DRIFT * self._norm_avgdl:
+            return
+        self._norm_avgdl = avgdl
+        self._norm = {doc_id: self._length_norm(length, avgdl) for doc_id, length in self._doc_len.items()}
+
+    def _idf(self, term: str) -> float:
+        n = len(self._doc_len)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _score(self, token_expansions, candidates: Set[str]) -> Dict[str, float]:
+        self._refresh_norms()
+        k1 = self.k1
+        scores = dict.fromkeys(candidates, 0.0)
+        for expansions in token_expansions:
+            best: Dict[str, float] = {}
+            for term, boost in expansions:
+                idf = self._idf(term) * boost
+                postings = self._postings[term]
+                for doc_id in candidates.intersection(postings):
+                    tf = postings[doc_id]
+                    score = idf * tf * (k1 + 1) / (tf + self._norm[doc_id])
+                    # A token matches a document once, through its best expansion
+                    if score > best.get(doc_id, 0.0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+        return scores
+
+    def _text_matches(self, query: str):
+        """Per-token expansions and the id set each token matches, or None if any token matches nothing"""
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        token_expansions = [
+            self._expansions(token, prefix=(i == len(tokens) - 1))
+            for i, token in enumerate(tokens)
+        ]
+        if not all(token_expansions):
+            return None
+        matches = [
+            set().union(*(self._postings[term].keys() for term, _ in expansions))
+            for expansions in token_expansions
+        ]
+        return token_expansions, matches
+
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        pricing_model: Optional[str] = None,
+        featured_only: bool = False,
+        relevance: bool = False,
+        limit: Optional[int] = None,
+        after: Optional[list] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return `(id, score)` pairs for listings matching every query token.
+
+        The last token is treated as a prefix to support search-as-you-type.
+        Results are ordered by score when `relevance` is set, otherwise by the
+        directory's default ordering (sponsored, featured, rating, id).
+        `after` is a `cursor_key` from a previous page; only hits ordered
+        strictly after it are returned.
+        """
+        text = self._text_matches(query)
+        if text is None:
+            return []
+        token_expansions, matches = text
+
+        # Intersect the smallest sets first so the candidate set shrinks quickly
+        category = _enum_value(category)
+        pricing_model = _enum_value(pricing_model)
+        if category:
+            matches.append(self._by_category.get(category, set()))
+        if pricing_model:
+            matches.append(self._by_pricing.get(pricing_model, set()))
+        if featured_only:
+            matches.append(self._featured)
+        matches.sort(key=len)
+        candidates = matches[0].intersection(*matches[1:])
+        if not candidates:
+            return []
+
+        if relevance:
+            scores = self._score(token_expansions, candidates)
+            hits = scores.items()
+            if after:
+                after_key = (-after[0], after[1])
+                hits = [hit for hit in hits if (-hit[1], hit[0]) > after_key]
+            if limit is None:
+                return sorted(hits, key=lambda hit: (-hit[1], hit[0]))
+            return heapq.nsmallest(limit, hits, key=lambda hit: (-hit[1], hit[0]))
+
+        if after:
+            is_sponsored, is_featured, rating, doc_id = after
+            after_key = (not is_sponsored, not is_featured, -rating, doc_id)
+            candidates = [doc_id for doc_id in candidates if self._order[doc_id] > after_key]
+        if limit is None:
+            ordered = sorted(candidates, key=self._order.__getitem__)
+        else:
+            ordered = heapq.nsmallest(limit, candidates, key=self._order.__getitem__)
+        scores = self._score(token_expansions, set(ordered))
+        return [(doc_id, scores[doc_id]) for doc_id in ordered]
+
+    def facets(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        pricing_model: Optional[str] = None,
+        featured_only: bool = False,
+    ) -> dict:
+        """Count listings per category, pricing model and flag for a filtered search.
+
+        Each facet is counted with every filter applied except its own, so
+        the counts tell the caller what selecting another value would match.
+        """
+        if query and query.strip():
+            text = self._text_matches(query)
+            if text is None:
+                matched: Set[str] = set()
+            else:
+                sets = sorted(text[1], key=len)
+                matched = sets[0].intersection(*sets[1:])
+        else:
+            matched = set(self._doc_len)
+
+        category = _enum_value(category)
+        pricing_model = _enum_value(pricing_model)
+        by_category = self._by_category.get(category, set()) if category else None
+        by_pricing = self._by_pricing.get(pricing_model, set()) if pricing_model else None
+        featured = self._featured if featured_only else None
+
+        def narrow(*filters):
+            ids = matched
+            for ids_with in sorted((f for f in filters if f is not None), key=len):
+                ids = ids & ids_with
+            return ids
+
+        total = narrow(by_category, by_pricing, featured)
+        without_category = narrow(by_pricing, featured)
+        without_pricing = narrow(by_category, featured)
+        return {
+            "total": len(total),
+            "category": {value: len(without_category & ids) for value, ids in self._by_category.items() if value},
+            "pricing_model": {value: len(without_pricing & ids) for value, ids in self._by_pricing.items() if value},
+            "featured": len(narrow(by_category, by_pricing) & self._featured),
+            "sponsored": len(total & self._sponsored),
+        }
+
+    def cursor_key(self, doc_id: str, score: float, relevance: bool = False) -> list:
+        """Sort key of a hit, suitable for resuming with `search(after=...)`"""
+        if relevance:
+            return [score, doc_id]
+        not_sponsored, not_featured, neg_rating, _ = self._order[doc_id]
+        return [not not_sponsored, not not_featured, -neg_rating, doc_id]
@@ -1,4 +1,8 @@
+import argparse
 import asyncio
+import copy
+import itertools
+import random
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -7,9 +11,14 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pathlib import Path
 
+from bulk_import import BulkImporter, change_logger
+from models import MCPServerImport
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+SEED_CHUNK_SIZE = 5000
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
@@ -219,16 +228,55 @@ sample_servers = [
     }
 ]
 
-async def seed_database():
-    """Seed the database with sample MCP servers"""
-    
-    # Clear existing data
-    await db.mcp_servers.delete_many({})
+def generate_servers(count, seed=42):
+    """Yield `count` synthetic listings derived from the samples above"""
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        word.strip(".,").lower()
+        for server in sample_servers
+        for word in (server["description"] + " " + server["detailed_description"]).split()
+        if len(word) > 3
+    })
+    features = sorted({feature for server in sample_servers for feature in server["features"]})
+    for i in range(count):
+        server = copy.deepcopy(sample_servers[i % len(sample_servers)])
+        slug = f"synthetic-{i}"
+        server["id"] = slug
+        server["name"] = f"{server['name']} {rng.choice(vocabulary).title()} {i}"
+        server["description"] = " ".join(rng.sample(vocabulary, 12)).capitalize()
+        server["features"] = rng.sample(features, rng.randint(3, 8))
+        server["affiliate_url"] = f"https://{slug}.example.com/affiliate"
+        server["official_url"] = f"https://{slug}.example.com"
+        server["rating"] = round(rng.uniform(1, 5), 1)
+        server["total_reviews"] = rng.randint(0, 5000)
+        server["is_sponsored"] = rng.random() < 0.05
+        server["is_featured"] = rng.random() < 0.1
+        yield server
+
+async def seed_database(reset=False, synthetic=0):
+    """Seed the database with sample MCP servers, plus optional synthetic ones.
+
+    Every write is logged like a bulk import, so running API workers pick it up.
+    """
+    log_chunk = change_logger(db)
+    if reset:
+        # Clear existing data, logging the deleted ids so workers drop them too
+        deleted = await db.mcp_servers.find({}, {"_id": 0, "id": 1}).to_list(None)
+        await db.mcp_servers.delete_many({})
+        for start in range(0, len(deleted), SEED_CHUNK_SIZE):
+            await log_chunk(deleted[start:start + SEED_CHUNK_SIZE])
     
-    # Insert sample data
-    await db.mcp_servers.insert_many(sample_servers)
+    # Upsert sample data, streaming synthetic listings in chunks
+    importer = BulkImporter(db.mcp_servers, MCPServerImport, chunk_size=SEED_CHUNK_SIZE, on_chunk=log_chunk)
+    rows = itertools.chain(sample_servers, generate_servers(synthetic))
+    report = await importer.run(enumerate(rows, start=1))
     
-    print(f"Successfully seeded {len(sample_servers)} MCP servers")
+    print(f"Successfully seeded {report['received'] - report['failed']} MCP servers "
+          f"({report['inserted']} inserted, {report['updated']} updated, {report['unchanged']} unchanged)")
 
 if __name__ == "__main__":
-    asyncio.run(seed_database())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed the MCP server directory")
+    parser.add_argument("--reset", action="store_true", help="delete every listing first")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N", help="also add N generated listings")
+    args = parser.parse_args()
+    asyncio.run(seed_database(reset=args.reset, synthetic=args.synthetic))
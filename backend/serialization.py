@@ -0,0 +1,52 @@
+from typing import Iterable, Type
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from metrics import phase
+
+
+def encode_json(value) -> bytes:
+    return orjson.dumps(value)
+
+
+class JSONBytesResponse(Response):
+    """Response whose body is already-encoded JSON bytes"""
+    media_type = "application/json"
+
+
+class ModelEncoder:
+    """Encodes Mongo documents as a pydantic model's JSON without re-validating them.
+
+    Documents written by this service already match the model, so they are
+    projected to the model's fields and handed straight to orjson. Documents
+    missing a field (e.g. seeded without timestamps) go through the model
+    once so its defaults apply, keeping the response schema unchanged.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._field_set = frozenset(self.fields)
+        self.projection = {"_id": 0, **dict.fromkeys(self.fields, 1)}
+
+    def document(self, doc: dict) -> dict:
+        if doc.keys() == self._field_set:
+            return doc
+        if self._field_set <= doc.keys():
+            return {field: doc[field] for field in self.fields}
+        return self.model(**doc).model_dump()
+
+    def encode(self, doc: dict) -> bytes:
+        with phase("serialization"):
+            return orjson.dumps(self.document(doc))
+
+    def encode_many(self, docs: Iterable[dict]) -> bytes:
+        with phase("serialization"):
+            return orjson.dumps([self.document(doc) for doc in docs])
+
+    def encode_line(self, doc: dict) -> bytes:
+        """Encode one document as an NDJSON record"""
+        with phase("serialization"):
+            return orjson.dumps(self.document(doc), option=orjson.OPT_APPEND_NEWLINE)
@@ -1,83 +1,308 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pymongo.errors import BulkWriteError, ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Union
+import re
+import secrets
 import uuid
-from datetime import datetime
+import io
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from enum import Enum
 
+from bulk_import import CSV, NDJSON, BulkImporter, read_rows
+from cache import TTLCache, make_key
+from catalog_sync import CatalogChangeLog, CatalogSync, ChangesExpired, read_changes
+from database import Database, PoolConfig, budget
+from click_filter import BotClassifier, ClickFilter, DedupWindow
+from click_ingest import ClickIngestQueue, QueueFull
+from compression import CompressionMiddleware
+from homepage import HomepageSnapshot
+from http_cache import CatalogRevision, cache_headers, not_modified
+from indexes import ensure_indexes
+from link_health import LINK_FIELDS, LinkChecker, broken_listings
+from metrics import MetricsMiddleware, phase, registry
+from models import MCPCategory, MCPServer, MCPServerCreate, MCPServerImport, MCPServerSummary, PricingModel
+from pagination import (
+    CHANGES_MODE, DEFAULT_MODE, LISTING_SORT, RANKED_MODE, RELEVANCE_MODE, InvalidCursor,
+    decode_cursor, encode_cursor, keyset_query, listing_key,
+)
+from ranking import CONVERSION_CLICKS, VIEW_CLICKS, RankingEngine, parse_weights
+from rollups import ALL, DAY, HOUR, MINUTE, RETENTION, ClickRollups, covered_range, naive_utc
+from search import SearchIndex, tokenize
+from suggest import SuggestIndex
+from serialization import JSONBytesResponse, ModelEncoder, encode_json
+from warmup import warm_up
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# MongoDB connection: catalog reads use their own pool, on the primary by default so
+# caches reloaded after a write never see a lagging secondary; analytics may use secondaries.
+# Clients are created on first use, so a missing MONGO_URL fails at startup, not on import
+mongo = Database(
+    os.environ.get('MONGO_URL'),
+    os.environ.get('DB_NAME'),
+    reader=PoolConfig(
+        max_size=int(os.environ.get('MONGO_READ_POOL_SIZE', 100)),
+        min_size=int(os.environ.get('MONGO_READ_MIN_POOL_SIZE', 0)),
+        timeout_ms=int(os.environ.get('MONGO_READ_TIMEOUT_MS', 2000)),
+    ),
+    writer=PoolConfig(
+        max_size=int(os.environ.get('MONGO_WRITE_POOL_SIZE', 50)),
+        min_size=int(os.environ.get('MONGO_WRITE_MIN_POOL_SIZE', 0)),
+        timeout_ms=int(os.environ.get('MONGO_WRITE_TIMEOUT_MS', 5000)),
+    ),
+    read_preference=os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+    analytics_read_preference=os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred'),
+    max_staleness_seconds=int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', 0)) or None,
+)
+db = mongo.write
+read_db = mongo.read
+analytics_db = mongo.analytics
+registry.add_collector(lambda: [
+    (f"mongo_{pool}_pool_{name}", f"MongoDB {pool} pool {name.replace('_', ' ')}", value)
+    for pool, stats in mongo.stats().items()
+    for name, value in stats.items()
+])
+# Budgets for queries that legitimately outlast the pool defaults
+ANALYTICS_TIMEOUT = float(os.environ.get('MONGO_ANALYTICS_TIMEOUT_MS', 10000)) / 1000
+MAINTENANCE_TIMEOUT = float(os.environ.get('MONGO_MAINTENANCE_TIMEOUT_MS', 600000)) / 1000
+
+# In-memory full-text index backing /api/servers?search=
+search_index = SearchIndex()
+
+# Prefix index over names, features and categories backing /api/suggest
+suggest_index = SuggestIndex()
+
+# Columnar ranking features backing sort=ranked; RANKING_WEIGHTS is "scorer=weight,..."
+ranking = RankingEngine(weights=parse_weights(os.environ['RANKING_WEIGHTS']) if os.environ.get('RANKING_WEIGHTS') else None)
+RANKING_CTR_WINDOW = timedelta(days=int(os.environ.get('RANKING_CTR_DAYS', 7)))
+RANKING_REFRESH_INTERVAL = float(os.environ.get('RANKING_REFRESH_INTERVAL', 300))
+
+# Per-server, per-click-type and per-hour/day click counters
+rollups = ClickRollups(db)
+# Reports read the counters through the reader pool, away from click ingestion
+rollup_reports = ClickRollups(analytics_db)
+
+async def write_clicks(batch):
+    """Store a batch of clicks and count the ones that were inserted; returns how many were"""
+    inserted = batch
+    try:
+        await db.click_tracking.insert_many(batch, ordered=False)
+    except BulkWriteError as exc:
+        failed = {error["index"] for error in exc.details["writeErrors"]}
+        inserted = [click for index, click in enumerate(batch) if index not in failed]
+        logger.error("Failed to insert %d of %d click events, error codes %s", len(failed), len(batch),
+                     sorted({error["code"] for error in exc.details["writeErrors"]}))
+    try:
+        await rollups.record(inserted)
+    except Exception:
+        # The raw events are stored, so a rebuild recovers the counters
+        logger.exception("Failed to count %d click events, run `python rollups.py rebuild`", len(inserted))
+    return len(inserted)
+
+# Clicks are acknowledged once queued and written to Mongo in batches
+click_queue = ClickIngestQueue(
+    write_clicks,
+    max_batch=int(os.environ.get('CLICK_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('CLICK_FLUSH_INTERVAL', 0.25)),
+    max_queue=int(os.environ.get('CLICK_QUEUE_SIZE', 50000)),
+)
+# Drops crawler traffic and repeats of the same click within CLICK_DEDUP_WINDOW seconds
+click_filter = ClickFilter(
+    DedupWindow(
+        window=float(os.environ.get('CLICK_DEDUP_WINDOW', 10)),
+        maxsize=int(os.environ.get('CLICK_DEDUP_MAXSIZE', 100000)),
+    ),
+    BotClassifier(),
+)
+registry.add_collector(lambda: [
+    (f"click_filter_{name}", f"Click filter {name.replace('_', ' ')}", value)
+    for name, value in click_filter.stats().items()
+])
+registry.add_collector(lambda: [
+    (f"click_queue_{name}", f"Click ingestion queue {name.replace('_', ' ')}", value)
+    for name, value in click_queue.stats().items()
+])
+
+# Read-through cache for the hot listing endpoints
+listing_cache = TTLCache(
+    maxsize=int(os.environ.get('CACHE_MAXSIZE', 1024)),
+    ttl=float(os.environ.get('CACHE_TTL', 30)),
+)
+registry.add_collector(lambda: [
+    (f"listing_cache_{name}", f"Listing cache {name.replace('_', ' ')}", value)
+    for name, value in listing_cache.stats().items()
+])
+
+# Compressed bodies of versioned (ETag-carrying) responses, keyed by URL, ETag and encoding
+compressed_cache = TTLCache(
+    maxsize=int(os.environ.get('COMPRESS_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('COMPRESS_CACHE_TTL', 300)),
+)
+registry.add_collector(lambda: [
+    (f"compressed_cache_{name}", f"Compressed response cache {name.replace('_', ' ')}", value)
+    for name, value in compressed_cache.stats().items()
+])
+
+# Catalog revision doubles as the ETag of every catalog-derived GET
+catalog_revision = CatalogRevision(db)
+CATALOG_MAX_AGE = int(os.environ.get('CATALOG_MAX_AGE', 60))
+
+def catalog_headers():
+    return cache_headers(catalog_revision.etag, CATALOG_MAX_AGE)
+
+def ranked_generation():
+    """Identifies one ranked order: catalog writes move scores just as click refreshes do"""
+    return f"r{catalog_revision.value}-g{ranking.generation}"
+
+def ranked_headers():
+    """Catalog headers for ranked responses, whose order also moves with each click refresh"""
+    return cache_headers(f'"{ranked_generation()}"', CATALOG_MAX_AGE)
+
+def apply_catalog_changes(changes):
+    """Bring in-memory read structures up to date after listings are written or deleted.
+
+    `changes` is a list of `(server_id, server)` pairs, with `server=None` for a deletion.
+    """
+    for server_id, server in changes:
+        if server is None:
+            search_index.remove(server_id)
+            suggest_index.remove(server_id)
+            ranking.remove(server_id)
+        else:
+            search_index.add(server)
+            suggest_index.add(server)
+            ranking.add(server)
+        listing_cache.invalidate(make_key("server", server_id=server_id))
+    listing_cache.invalidate_endpoint("featured-servers")
+    listing_cache.invalidate_endpoint("sponsored-servers")
+    homepage.invalidate()
 
-# Create the main app without a prefix
-app = FastAPI(title="MCP Server Directory API", version="1.0.0")
+async def record_catalog_changes(changes):
+    """Refresh local read structures, log the write for other workers, then catch up.
+
+    Invalidating first means a request that sees the new ETag can no longer
+    be served a cached body from before the write. The ETag only moves once
+    this worker has applied every revision up to this one.
+    """
+    apply_catalog_changes(changes)
+    revision = await catalog_revision.bump()
+    try:
+        await change_log.append(revision, [server_id for server_id, _ in changes])
+        await catalog_sync.poll()
+    except Exception:
+        # The write itself succeeded; workers resync once the missing revision times out
+        logger.exception("Failed to publish catalog revision %d", revision)
+
+async def replay_catalog_changes(server_ids):
+    """Apply listings changed by any worker, read back from the primary; missing ids were deleted"""
+    servers = await db.mcp_servers.find({"id": {"$in": server_ids}}, server_encoder.projection).to_list(None)
+    by_id = {server["id"]: server for server in servers}
+    apply_catalog_changes([(server_id, by_id.get(server_id)) for server_id in server_ids])
+
+async def load_search_indexes():
+    """Build fresh search, suggest and ranking indexes from the database and swap them in"""
+    global search_index, suggest_index
+    fields = {"_id": 0, "id": 1, "name": 1, "description": 1, "features": 1, "category": 1,
+              "pricing_model": 1, "is_featured": 1, "is_sponsored": 1, "rating": 1, "total_reviews": 1}
+    servers = await db.mcp_servers.find({}, fields).to_list(None)
+    search, suggest = SearchIndex(), SuggestIndex()
+    search.build(servers)
+    suggest.build(servers)
+    search_index, suggest_index = search, suggest
+    ranking.build(servers)
+
+async def load_ranking_clicks():
+    """Recent `(views, conversions)` per server for the click-through scorer"""
+    counts = await rollup_reports.counts_by_server(datetime.utcnow() - RANKING_CTR_WINDOW, (VIEW_CLICKS, *CONVERSION_CLICKS))
+    clicks = {}
+    for (server_id, click_type), count in counts.items():
+        views, conversions = clicks.get(server_id, (0, 0))
+        if click_type == VIEW_CLICKS:
+            views += count
+        else:
+            conversions += count
+        clicks[server_id] = (views, conversions)
+    return clicks
+
+async def resync_catalog():
+    await load_search_indexes()
+    listing_cache.clear()
+    homepage.invalidate()
+
+# Replays writes made by other workers; see catalog_sync.py
+change_log = CatalogChangeLog(db)
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+# How far back a fresh change token starts; keep it above the reader's replication lag
+CHANGES_BOOTSTRAP_OVERLAP = timedelta(seconds=float(os.environ.get('CHANGES_BOOTSTRAP_OVERLAP', 60)))
+catalog_sync = CatalogSync(
+    change_log,
+    catalog_revision,
+    replay_catalog_changes,
+    resync_catalog,
+    interval=float(os.environ.get('CATALOG_SYNC_INTERVAL', 0.5)),
+    gap_timeout=float(os.environ.get('CATALOG_SYNC_GAP_TIMEOUT', 5)),
+)
+registry.add_collector(lambda: [
+    (f"catalog_sync_{name}", f"Catalog sync {name.replace('_', ' ')}", value)
+    for name, value in catalog_sync.stats().items()
+])
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Enums for better data structure
-class MCPCategory(str, Enum):
-    SEO_ANALYTICS = "SEO Analytics"
-    CONTENT_GENERATION = "Content Generation"
-    SOCIAL_MEDIA = "Social Media Management"
-    EMAIL_MARKETING = "Email Marketing"
-    PERFORMANCE_TRACKING = "Performance Tracking"
-    KEYWORD_RESEARCH = "Keyword Research"
-    COMPETITOR_ANALYSIS = "Competitor Analysis"
-    AUTOMATION = "Marketing Automation"
-
-class PricingModel(str, Enum):
-    FREE = "Free"
-    FREEMIUM = "Freemium"
-    PAID = "Paid"
-    ENTERPRISE = "Enterprise"
+class SortMode(str, Enum):
+    DEFAULT = DEFAULT_MODE
+    RELEVANCE = RELEVANCE_MODE
+    RANKED = RANKED_MODE
 
-# Data Models
-class MCPServer(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    name: str
-    description: str
-    detailed_description: str
-    category: MCPCategory
-    features: List[str]
-    pricing_model: PricingModel
-    pricing_details: str
-    affiliate_url: str
-    official_url: str
-    logo_url: str
-    rating: float = Field(ge=0, le=5)
-    total_reviews: int = Field(default=0)
-    is_sponsored: bool = Field(default=False)
-    is_featured: bool = Field(default=False)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-
-class MCPServerCreate(BaseModel):
-    name: str
-    description: str
-    detailed_description: str
-    category: MCPCategory
-    features: List[str]
-    pricing_model: PricingModel
-    pricing_details: str
-    affiliate_url: str
-    official_url: str
-    logo_url: str
-    rating: float = Field(ge=0, le=5)
-    total_reviews: int = Field(default=0)
-    is_sponsored: bool = Field(default=False)
-    is_featured: bool = Field(default=False)
+class ListingView(str, Enum):
+    FULL = "full"
+    SUMMARY = "summary"
+
+class ResponseFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+class ImportFormat(str, Enum):
+    NDJSON = NDJSON
+    CSV = CSV
 
+class SeriesWindow(str, Enum):
+    LAST_HOUR = "1h"
+    LAST_DAY = "24h"
+    LAST_WEEK = "7d"
+    LAST_MONTH = "30d"
+
+class Granularity(str, Enum):
+    MINUTE = MINUTE
+    HOUR = HOUR
+    DAY = DAY
+
+# Window length and the granularity used when none is requested
+SERIES_WINDOWS = {
+    SeriesWindow.LAST_HOUR: (timedelta(hours=1), Granularity.MINUTE),
+    SeriesWindow.LAST_DAY: (timedelta(days=1), Granularity.HOUR),
+    SeriesWindow.LAST_WEEK: (timedelta(days=7), Granularity.HOUR),
+    SeriesWindow.LAST_MONTH: (timedelta(days=30), Granularity.DAY),
+}
+
+DEFAULT_PAGE_SIZE = 50
+STREAM_BATCH_SIZE = 500
+BATCH_MAX_IDS = int(os.environ.get('BATCH_MAX_IDS', 100))
+
+# Data Models
 class ClickTracking(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     server_id: str
@@ -94,20 +319,89 @@ class ClickTrackingCreate(BaseModel):
     referrer: Optional[str] = None
     click_type: str
 
+# Read endpoints encode stored documents directly instead of validating them twice
+server_encoder = ModelEncoder(MCPServer)
+summary_encoder = ModelEncoder(MCPServerSummary)
+
+def listing_encoder(view):
+    return summary_encoder if view == ListingView.SUMMARY else server_encoder
+
+HOMEPAGE_FEATURED = 6
+HOMEPAGE_SPONSORED = 3
+
+async def compute_homepage():
+    """Everything the homepage renders, gathered in one pass"""
+    featured = await read_db.mcp_servers.find({"is_featured": True}, server_encoder.projection).sort([("rating", -1)]).limit(HOMEPAGE_FEATURED).to_list(HOMEPAGE_FEATURED)
+    sponsored = await read_db.mcp_servers.find({"is_sponsored": True}, server_encoder.projection).sort([("rating", -1)]).limit(HOMEPAGE_SPONSORED).to_list(HOMEPAGE_SPONSORED)
+    if search_index.ready:
+        counts = search_index.facets()
+        by_category = counts["category"]
+        totals = {"total_servers": counts["total"], "featured_servers": counts["featured"], "sponsored_servers": counts["sponsored"]}
+    else:
+        groups = await read_db.mcp_servers.aggregate([{"$group": {"_id": "$category", "n": {"$sum": 1}}}]).to_list(None)
+        by_category = {group["_id"]: group["n"] for group in groups}
+        totals = {
+            "total_servers": sum(by_category.values()),
+            "featured_servers": await read_db.mcp_servers.count_documents({"is_featured": True}),
+            "sponsored_servers": await read_db.mcp_servers.count_documents({"is_sponsored": True}),
+        }
+    return {
+        "featured": [server_encoder.document(server) for server in featured],
+        "sponsored": [server_encoder.document(server) for server in sponsored],
+        "categories": [{"value": cat.value, "label": cat.value, "count": by_category.get(cat.value, 0)} for cat in MCPCategory],
+        "analytics": {**totals, "total_clicks": await rollup_reports.count()},
+        "generated_at": datetime.utcnow(),
+    }
+
+# Operator-only endpoints take "Authorization: Bearer <ADMIN_TOKEN>" and are disabled without one
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def require_admin(authorization: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN")
+    if not authorization or not secrets.compare_digest(authorization.encode(), f"Bearer {ADMIN_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+# Background link health checks; LINK_CHECK_INTERVAL=0 leaves them to POST /api/links/check or cron
+link_checker = LinkChecker(
+    db,
+    analytics_db,
+    concurrency=int(os.environ.get('LINK_CHECK_CONCURRENCY', 50)),
+    host_rate=float(os.environ.get('LINK_CHECK_HOST_RATE', 2)),
+    timeout=float(os.environ.get('LINK_CHECK_TIMEOUT', 10)),
+    recheck_interval=timedelta(hours=float(os.environ.get('LINK_RECHECK_HOURS', 24))),
+)
+LINK_CHECK_INTERVAL = float(os.environ.get('LINK_CHECK_INTERVAL', 0))
+registry.add_collector(lambda: [
+    (f"link_check_{name}", f"Link checker {name.replace('_', ' ')}", float(value))
+    for name, value in link_checker.stats().items()
+])
+
+# The homepage is served from pre-encoded bytes, rebuilt when listings change
+homepage = HomepageSnapshot(
+    compute_homepage,
+    refresh_interval=float(os.environ.get('HOMEPAGE_REFRESH_INTERVAL', 60)),
+    unhashed=("generated_at",),
+)
+registry.add_collector(lambda: [
+    (f"homepage_snapshot_{name}", f"Homepage snapshot {name.replace('_', ' ')}", value)
+    for name, value in homepage.stats().items()
+])
+
 # API Endpoints
 @api_router.get("/")
 async def root():
     return {"message": "MCP Server Directory API", "version": "1.0.0"}
 
-@api_router.get("/servers", response_model=List[MCPServer])
-async def get_servers(
-    category: Optional[MCPCategory] = None,
-    pricing_model: Optional[PricingModel] = None,
-    search: Optional[str] = None,
-    featured_only: bool = False,
-    limit: int = Query(default=50, le=100)
-):
-    """Get MCP servers with optional filtering"""
+def use_search_index(search):
+    """Whether the in-memory index can answer `search`.
+
+    A term without letters or digits ("++") has no index tokens, so it falls
+    back to a substring match in Mongo instead of matching nothing.
+    """
+    return bool(search) and search_index.ready and bool(tokenize(search))
+
+def listing_query(category, pricing_model, search, featured_only):
     query = {}
     
     if category:
@@ -120,31 +414,360 @@ async def get_servers(
         query["is_featured"] = True
     
     if search:
+        # Substring match; the term is escaped so "c++" is not read as a pattern
+        pattern = re.escape(search)
         query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"features": {"$regex": search, "$options": "i"}}
+            {"name": {"$regex": pattern, "$options": "i"}},
+            {"description": {"$regex": pattern, "$options": "i"}},
+            {"features": {"$regex": pattern, "$options": "i"}}
         ]
     
-    servers = await db.mcp_servers.find(query).sort([("is_sponsored", -1), ("is_featured", -1), ("rating", -1)]).limit(limit).to_list(limit)
-    return [MCPServer(**server) for server in servers]
+    return query
+
+@api_router.get("/servers", response_model=Union[List[MCPServer], List[MCPServerSummary]])
+async def get_servers(
+    request: Request,
+    category: Optional[MCPCategory] = None,
+    pricing_model: Optional[PricingModel] = None,
+    search: Optional[str] = None,
+    featured_only: bool = False,
+    sort: SortMode = SortMode.DEFAULT,
+    view: ListingView = ListingView.FULL,
+    cursor: Optional[str] = None,
+    output: ResponseFormat = Query(default=ResponseFormat.JSON, alias="format"),
+    limit: Optional[int] = Query(default=None, ge=1, le=100)
+):
+    """Get MCP servers with optional filtering.
+
+    Pages are resumed with the opaque `cursor` returned in the X-Next-Cursor
+    header. `format=ndjson` streams every match (or `limit` of them) as
+    newline-delimited JSON instead of returning a single page.
+    `view=summary` returns only the fields the directory grid renders.
+    `sort=ranked` orders listings by the ranking engine's composite score.
+    """
+    # Ranked order applies to browsing; a search keeps the index's own orders
+    use_ranking = sort == SortMode.RANKED and not search and ranking.ready
+    # Read the validator before the data so a concurrent write can only make it older
+    headers = ranked_headers() if use_ranking else catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    encoder = listing_encoder(view)
+    use_index = use_search_index(search)
+    if use_ranking:
+        mode = RANKED_MODE
+    elif use_index and sort == SortMode.RELEVANCE:
+        mode = RELEVANCE_MODE
+    else:
+        mode = DEFAULT_MODE
+    try:
+        after = decode_cursor(cursor, mode) if cursor else None
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if use_ranking and after:
+        # Scores from an older click refresh or catalog revision would skip or repeat listings
+        if after[2] != ranked_generation():
+            raise HTTPException(status_code=410, detail="Ranking changed since this cursor was issued, restart from the first page")
+        after = after[:2]
+
+    if output == ResponseFormat.NDJSON:
+        if use_ranking:
+            hits = ranking.top(limit, category=category, pricing_model=pricing_model, featured_only=featured_only, after=after)
+            records = stream_search_hits(hits, encoder)
+        elif use_index:
+            hits = search_index.search(search, category=category, pricing_model=pricing_model,
+                                       featured_only=featured_only, relevance=sort == SortMode.RELEVANCE,
+                                       limit=limit, after=after)
+            records = stream_search_hits(hits, encoder)
+        else:
+            query = {"$and": [listing_query(category, pricing_model, search, featured_only), keyset_query(after)]}
+            records = stream_listings(query, encoder, limit)
+        return StreamingResponse(records, media_type="application/x-ndjson", headers=headers)
+
+    limit = limit or DEFAULT_PAGE_SIZE
+    if use_ranking:
+        hits = ranking.top(limit, category=category, pricing_model=pricing_model, featured_only=featured_only, after=after)
+        servers = await fetch_in_order([server_id for server_id, _ in hits], encoder)
+        last_key = [hits[-1][1], hits[-1][0], ranked_generation()] if hits else None
+    elif use_index:
+        servers, last_key = await search_servers(search, category, pricing_model, featured_only, sort, limit, after, encoder)
+    else:
+        query = {"$and": [listing_query(category, pricing_model, search, featured_only), keyset_query(after)]}
+        servers = await read_db.mcp_servers.find(query, encoder.projection).sort(LISTING_SORT).limit(limit).to_list(limit)
+        last_key = listing_key(servers[-1]) if servers else None
+
+    if len(servers) == limit and last_key:
+        headers["X-Next-Cursor"] = encode_cursor(mode, last_key)
+    return JSONBytesResponse(encoder.encode_many(servers), headers=headers)
+
+async def search_servers(search, category, pricing_model, featured_only, sort, limit, after=None, encoder=server_encoder):
+    """Resolve a search through the in-memory index, then fetch only the page of hits"""
+    relevance = sort == SortMode.RELEVANCE
+    hits = search_index.search(
+        search,
+        category=category,
+        pricing_model=pricing_model,
+        featured_only=featured_only,
+        relevance=relevance,
+        limit=limit,
+        after=after,
+    )
+    if not hits:
+        return [], None
+
+    servers = await fetch_in_order([server_id for server_id, _ in hits], encoder)
+    last_id, last_score = hits[-1]
+    return servers, search_index.cursor_key(last_id, last_score, relevance)
+
+async def fetch_in_order(ids, encoder):
+    """Fetch listings by id with one $in query, in the order given"""
+    servers = await read_db.mcp_servers.find({"id": {"$in": ids}}, encoder.projection).to_list(len(ids))
+    by_id = {server["id"]: server for server in servers}
+    return [by_id[server_id] for server_id in ids if server_id in by_id]
+
+async def stream_listings(query, encoder, limit=None):
+    """Yield listings as NDJSON straight off the Motor cursor"""
+    cursor = read_db.mcp_servers.find(query, encoder.projection, allow_disk_use=True)
+    cursor = cursor.sort(LISTING_SORT).batch_size(STREAM_BATCH_SIZE)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for server in cursor:
+        yield encoder.encode_line(server)
+
+async def stream_search_hits(hits, encoder):
+    """Yield search hits as NDJSON, fetching documents a batch at a time"""
+    for i in range(0, len(hits), STREAM_BATCH_SIZE):
+        ids = [server_id for server_id, _ in hits[i:i + STREAM_BATCH_SIZE]]
+        servers = await read_db.mcp_servers.find({"id": {"$in": ids}}, encoder.projection).to_list(len(ids))
+        by_id = {server["id"]: server for server in servers}
+        for server_id in ids:
+            if server_id in by_id:
+                yield encoder.encode_line(by_id[server_id])
+
+@api_router.get("/servers/facets")
+async def get_server_facets(
+    request: Request,
+    category: Optional[MCPCategory] = None,
+    pricing_model: Optional[PricingModel] = None,
+    search: Optional[str] = None,
+    featured_only: bool = False,
+    sort: SortMode = SortMode.DEFAULT,
+    view: ListingView = ListingView.FULL,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=100)
+):
+    """Get the first page of matching servers with per-filter counts.
+
+    Category and pricing counts apply every other active filter and the
+    search term, so they show what picking that value would match.
+    Further pages come from /servers with the X-Next-Cursor header.
+    """
+    headers = catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    encoder = listing_encoder(view)
+    if search_index.ready and (not search or use_search_index(search)):
+        counts = search_index.facets(search, category, pricing_model, featured_only)
+        if search:
+            servers, last_key = await search_servers(search, category, pricing_model, featured_only, sort, limit, encoder=encoder)
+            mode = sort.value
+        else:
+            query = listing_query(category, pricing_model, None, featured_only)
+            servers = await read_db.mcp_servers.find(query, encoder.projection).sort(LISTING_SORT).limit(limit).to_list(limit)
+            last_key, mode = (listing_key(servers[-1]) if servers else None), DEFAULT_MODE
+    else:
+        servers, counts = await facet_servers(category, pricing_model, search, featured_only, limit, encoder)
+        last_key, mode = (listing_key(servers[-1]) if servers else None), DEFAULT_MODE
+
+    # Every enum value is listed, zero counts included, in declaration order
+    counts["category"] = {c.value: counts["category"].get(c.value, 0) for c in MCPCategory}
+    counts["pricing_model"] = {p.value: counts["pricing_model"].get(p.value, 0) for p in PricingModel}
+
+    if len(servers) == limit and last_key:
+        headers["X-Next-Cursor"] = encode_cursor(mode, last_key)
+    body = {"results": [encoder.document(server) for server in servers], **counts}
+    return JSONBytesResponse(encode_json(body), headers=headers)
+
+async def facet_servers(category, pricing_model, search, featured_only, limit, encoder):
+    """First page plus facet counts from a single `$facet` aggregation"""
+    def match(**overrides):
+        filters = {"category": category, "pricing_model": pricing_model, "featured_only": featured_only, **overrides}
+        return {"$match": listing_query(filters["category"], filters["pricing_model"], None, filters["featured_only"])}
+
+    pipeline = [
+        {"$match": listing_query(None, None, search, False)},
+        {"$facet": {
+            "results": [match(), {"$sort": dict(LISTING_SORT)}, {"$limit": limit}, {"$project": encoder.projection}],
+            "total": [match(), {"$count": "n"}],
+            "category": [match(category=None), {"$group": {"_id": "$category", "n": {"$sum": 1}}}],
+            "pricing_model": [match(pricing_model=None), {"$group": {"_id": "$pricing_model", "n": {"$sum": 1}}}],
+            "featured": [match(featured_only=True), {"$count": "n"}],
+            "sponsored": [match(), {"$match": {"is_sponsored": True}}, {"$count": "n"}],
+        }},
+    ]
+    result = (await read_db.mcp_servers.aggregate(pipeline).to_list(1))[0]
+
+    def count(name):
+        return result[name][0]["n"] if result[name] else 0
+
+    counts = {
+        "total": count("total"),
+        "category": {group["_id"]: group["n"] for group in result["category"]},
+        "pricing_model": {group["_id"]: group["n"] for group in result["pricing_model"]},
+        "featured": count("featured"),
+        "sponsored": count("sponsored"),
+    }
+    return result["results"], counts
+
+@api_router.get("/suggest")
+async def suggest(q: str = Query(min_length=1, max_length=100), limit: int = Query(default=8, ge=1, le=20)):
+    """Typeahead suggestions (server names, features, categories) for a partial query"""
+    if suggest_index.ready:
+        return JSONBytesResponse(encode_json(suggest_index.suggest(q, limit)))
+    # Not built yet: fall back to an anchored name match
+    query = {"name": {"$regex": "^" + re.escape(q), "$options": "i"}}
+    servers = await read_db.mcp_servers.find(query, {"_id": 0, "id": 1, "name": 1}).sort(LISTING_SORT).limit(limit).to_list(limit)
+    return JSONBytesResponse(encode_json([{"text": s["name"], "kind": "server", "id": s["id"]} for s in servers]))
+
+@api_router.get("/servers/batch")
+async def get_servers_batch(request: Request, ids: List[str] = Query(default=[])):
+    """Get several servers by ID in request order, listing the IDs that were not found.
+
+    `ids` may be repeated or comma-separated. Listings already in the cache
+    are reused and the rest are fetched with a single $in query.
+    """
+    headers = catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    ids = list(dict.fromkeys(server_id for value in ids for server_id in value.split(",") if server_id))
+    if not ids or len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Pass between 1 and {BATCH_MAX_IDS} ids")
+
+    keys = {make_key("server", server_id=server_id): server_id for server_id in ids}
+
+    async def load(missing_keys):
+        wanted = [keys[key] for key in missing_keys]
+        servers = await read_db.mcp_servers.find({"id": {"$in": wanted}}, server_encoder.projection).to_list(len(wanted))
+        return {make_key("server", server_id=server["id"]): server_encoder.encode(server) for server in servers}
+
+    bodies = await listing_cache.get_or_load_many(list(keys), load)
+    found = [bodies[key] for key in keys if bodies[key]]
+    missing = [server_id for key, server_id in keys.items() if not bodies[key]]
+    body = b'{"servers":[' + b",".join(found) + b'],"missing":' + encode_json(missing) + b"}"
+    return JSONBytesResponse(body, headers=headers)
+
+@api_router.get("/servers/changes")
+async def get_server_changes(
+    request: Request,
+    since: Optional[str] = None,
+    limit: int = Query(default=CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    view: ListingView = ListingView.FULL,
+):
+    """Get listings created, updated or deleted since a change token.
+
+    Without `since` this returns no changes and a starting token; take it,
+    then pull /servers in full and poll with `since` from then on. Each
+    listing appears once, as an upsert with its current state or a delete
+    tombstone. Follow `next` while `has_more` is true. A token the change log
+    no longer covers gets 410, and the consumer starts over.
+    """
+    headers = catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    if since is None:
+        # Start far enough back that a full pull from a lagging secondary is still covered
+        revision = await change_log.revision_at(datetime.utcnow() - CHANGES_BOOTSTRAP_OVERLAP)
+        if revision is None:
+            oldest = await change_log.oldest()
+            revision = oldest - 1 if oldest is not None else await catalog_revision.current()
+        body = {"changes": [], "next": encode_cursor(CHANGES_MODE, [revision]), "has_more": False}
+        return JSONBytesResponse(encode_json(body), headers=headers)
+
+    try:
+        (revision,) = decode_cursor(since, CHANGES_MODE)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    try:
+        batch = await read_changes(change_log, revision, limit, catalog_sync.gap_timeout)
+    except ChangesExpired as exc:
+        raise HTTPException(status_code=410, detail=f"{exc}; resync from /api/servers and request a new token")
+
+    # Read from the primary: a lagging secondary could hand out a state older than the token
+    encoder = listing_encoder(view)
+    ids = list(batch.revisions)
+    servers = await db.mcp_servers.find({"id": {"$in": ids}}, encoder.projection).to_list(len(ids))
+    by_id = {server["id"]: server for server in servers}
+    changes = []
+    for server_id, changed_at in batch.revisions.items():
+        if server_id in by_id:
+            changes.append(b'{"op":"upsert","revision":%d,"server":%s}' % (changed_at, encoder.encode(by_id[server_id])))
+        else:
+            changes.append(b'{"op":"delete","revision":%d,"id":%s}' % (changed_at, encode_json(server_id)))
+    tail = encode_json({"next": encode_cursor(CHANGES_MODE, [batch.revision]), "has_more": batch.has_more})
+    return JSONBytesResponse(b'{"changes":[' + b",".join(changes) + b"]," + tail[1:], headers=headers)
 
 @api_router.get("/servers/{server_id}", response_model=MCPServer)
-async def get_server(server_id: str):
+async def get_server(server_id: str, request: Request):
     """Get a specific MCP server by ID"""
-    server = await db.mcp_servers.find_one({"id": server_id})
-    if not server:
+    headers = catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    async def load():
+        server = await read_db.mcp_servers.find_one({"id": server_id}, server_encoder.projection)
+        return server_encoder.encode(server) if server else None
+
+    body = await listing_cache.get_or_load(make_key("server", server_id=server_id), load)
+    if not body:
         raise HTTPException(status_code=404, detail="Server not found")
-    return MCPServer(**server)
+    return JSONBytesResponse(body, headers=headers)
 
 @api_router.post("/servers", response_model=MCPServer)
 async def create_server(server: MCPServerCreate):
     """Create a new MCP server listing"""
-    server_dict = server.dict()
-    server_obj = MCPServer(**server_dict)
+    with phase("validation"):
+        server_dict = server.dict()
+        server_obj = MCPServer(**server_dict)
     await db.mcp_servers.insert_one(server_obj.dict())
+    await record_catalog_changes([(server_obj.id, server_obj.dict())])
     return server_obj
 
+@api_router.post("/servers/bulk")
+async def bulk_import_servers(
+    request: Request,
+    input_format: Optional[ImportFormat] = Query(default=None, alias="format"),
+    ordered: bool = False,
+):
+    """Upsert listings keyed on id from an NDJSON or CSV request body.
+
+    The body is spooled to a temporary file and applied in chunks, so memory
+    stays flat regardless of size. Invalid rows are reported individually;
+    `ordered=true` stops at the first one.
+    """
+    if input_format is None:
+        content_type = request.headers.get("content-type", "")
+        input_format = ImportFormat.CSV if "csv" in content_type else ImportFormat.NDJSON
+
+    async def apply_chunk(servers):
+        if servers:
+            await record_catalog_changes([(server["id"], server) for server in servers])
+
+    importer = BulkImporter(db.mcp_servers, MCPServerImport, ordered=ordered, on_chunk=apply_chunk)
+    with tempfile.TemporaryFile() as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        rows = read_rows(io.TextIOWrapper(spool, encoding="utf-8", newline=""), input_format.value)
+        report = await importer.run(rows)
+    return report
+
 @api_router.put("/servers/{server_id}", response_model=MCPServer)
 async def update_server(server_id: str, server: MCPServerCreate):
     """Update an existing MCP server"""
@@ -160,7 +783,9 @@ async def update_server(server_id: str, server: MCPServerCreate):
         raise HTTPException(status_code=404, detail="Server not found")
     
     updated_server = await db.mcp_servers.find_one({"id": server_id})
-    return MCPServer(**updated_server)
+    await record_catalog_changes([(server_id, updated_server)])
+    with phase("validation"):
+        return MCPServer(**updated_server)
 
 @api_router.delete("/servers/{server_id}")
 async def delete_server(server_id: str):
@@ -168,53 +793,240 @@ async def delete_server(server_id: str):
     result = await db.mcp_servers.delete_one({"id": server_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Server not found")
+    await record_catalog_changes([(server_id, None)])
     return {"message": "Server deleted successfully"}
 
 @api_router.get("/categories")
-async def get_categories():
+async def get_categories(request: Request):
     """Get all available categories"""
-    return [{"value": cat.value, "label": cat.value} for cat in MCPCategory]
+    headers = catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+    categories = [{"value": cat.value, "label": cat.value} for cat in MCPCategory]
+    return JSONBytesResponse(encode_json(categories), headers=headers)
+
+@api_router.get("/homepage")
+async def get_homepage(request: Request):
+    """Get featured and sponsored servers, category counts and headline analytics in one response"""
+    body = await homepage.get()
+    headers = cache_headers(homepage.etag, CATALOG_MAX_AGE)
+    cached = not_modified(request, homepage.etag, CATALOG_MAX_AGE)
+    if cached:
+        return cached
+    return JSONBytesResponse(body, headers=headers)
+
+@api_router.get("/featured-servers", response_model=Union[List[MCPServer], List[MCPServerSummary]])
+async def get_featured_servers(
+    request: Request,
+    limit: int = Query(default=6, le=20),
+    view: ListingView = ListingView.FULL,
+    sort: SortMode = SortMode.DEFAULT,
+):
+    """Get featured MCP servers for homepage; `sort=ranked` orders them by the ranking engine instead of rating"""
+    ranked = sort == SortMode.RANKED and ranking.ready
+    headers = ranked_headers() if ranked else catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
 
-@api_router.get("/featured-servers", response_model=List[MCPServer])
-async def get_featured_servers(limit: int = Query(default=6, le=20)):
-    """Get featured MCP servers for homepage"""
-    servers = await db.mcp_servers.find({"is_featured": True}).sort([("rating", -1)]).limit(limit).to_list(limit)
-    return [MCPServer(**server) for server in servers]
+    async def load():
+        if ranked:
+            hits = ranking.top(limit, featured_only=True)
+            servers = await fetch_in_order([server_id for server_id, _ in hits], encoder)
+        else:
+            servers = await read_db.mcp_servers.find({"is_featured": True}, encoder.projection).sort([("rating", -1)]).limit(limit).to_list(limit)
+        return encoder.encode_many(servers)
 
-@api_router.get("/sponsored-servers", response_model=List[MCPServer])
-async def get_sponsored_servers(limit: int = Query(default=3, le=10)):
-    """Get sponsored MCP servers"""
-    servers = await db.mcp_servers.find({"is_sponsored": True}).sort([("rating", -1)]).limit(limit).to_list(limit)
-    return [MCPServer(**server) for server in servers]
+    encoder = listing_encoder(view)
+    # The generation keeps bodies cached under an older click refresh from being served
+    generation = ranking.generation if ranked else None
+    body = await listing_cache.get_or_load(make_key("featured-servers", limit=limit, view=view, ranked=generation), load)
+    return JSONBytesResponse(body, headers=headers)
+
+@api_router.get("/sponsored-servers", response_model=Union[List[MCPServer], List[MCPServerSummary]])
+async def get_sponsored_servers(
+    request: Request,
+    limit: int = Query(default=3, le=10),
+    view: ListingView = ListingView.FULL,
+    sort: SortMode = SortMode.DEFAULT,
+):
+    """Get sponsored MCP servers; `sort=ranked` orders them by the ranking engine instead of rating"""
+    ranked = sort == SortMode.RANKED and ranking.ready
+    headers = ranked_headers() if ranked else catalog_headers()
+    cached = not_modified(request, headers["ETag"], CATALOG_MAX_AGE)
+    if cached:
+        return cached
+
+    async def load():
+        if ranked:
+            hits = ranking.top(limit, sponsored_only=True)
+            servers = await fetch_in_order([server_id for server_id, _ in hits], encoder)
+        else:
+            servers = await read_db.mcp_servers.find({"is_sponsored": True}, encoder.projection).sort([("rating", -1)]).limit(limit).to_list(limit)
+        return encoder.encode_many(servers)
+
+    encoder = listing_encoder(view)
+    generation = ranking.generation if ranked else None
+    body = await listing_cache.get_or_load(make_key("sponsored-servers", limit=limit, view=view, ranked=generation), load)
+    return JSONBytesResponse(body, headers=headers)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Get listing cache hit/miss/eviction counters"""
+    return listing_cache.stats()
+
+# Reverse proxies in front of the API that append to X-Forwarded-For; 0 trusts only the socket peer
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+def client_ip(request: Request) -> Optional[str]:
+    """The caller's address as recorded by the outermost trusted proxy, or the socket peer.
+
+    Entries left of the ones our proxies appended are whatever the client
+    sent, so they are never used.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if TRUSTED_PROXY_COUNT and forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(TRUSTED_PROXY_COUNT, len(hops))]
+    return request.client.host if request.client else None
 
 @api_router.post("/track-click", response_model=ClickTracking)
-async def track_click(click: ClickTrackingCreate):
-    """Track affiliate and other clicks for analytics"""
-    click_dict = click.dict()
-    click_obj = ClickTracking(**click_dict)
-    await db.click_tracking.insert_one(click_obj.dict())
+async def track_click(click: ClickTrackingCreate, request: Request):
+    """Track affiliate and other clicks for analytics.
+
+    The address and user agent are taken from the request rather than the
+    body. Crawler clicks and repeats within the dedup window are answered
+    normally but not recorded.
+    """
+    with phase("validation"):
+        click_dict = click.dict()
+        click_dict["user_ip"] = client_ip(request) or click_dict["user_ip"]
+        click_dict["user_agent"] = request.headers.get("user-agent", click_dict["user_agent"])
+        click_obj = ClickTracking(**click_dict)
+    reason = click_filter.check(click_dict)
+    if reason:
+        return JSONBytesResponse(click_obj.model_dump_json().encode(), headers={"X-Click-Suppressed": reason})
+    try:
+        await click_queue.put(click_obj.dict())
+    except QueueFull:
+        # The client is told to retry, so the retry must not be dropped as a duplicate
+        click_filter.release(click_dict)
+        raise HTTPException(status_code=503, detail="Click tracking is overloaded, retry later", headers={"Retry-After": "1"})
     return click_obj
 
+@api_router.get("/links/report")
+async def get_link_report(
+    field: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    """Get the last link check run and the listings whose links are broken"""
+    if field is not None and field not in LINK_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of {', '.join(LINK_FIELDS)}")
+    return {
+        "checker": link_checker.stats(),
+        "last_run": await link_checker.lease.last_run(),
+        "broken": await broken_listings(analytics_db, field, limit),
+    }
+
+@api_router.post("/links/check", status_code=202, dependencies=[Depends(require_admin)])
+async def start_link_check(force: bool = False):
+    """Start a link check run in the background; requires the admin token"""
+    return {"started": link_checker.trigger(force)}
+
+@api_router.get("/ranking/stats")
+async def get_ranking_stats():
+    """Get the ranking engine's size, weights and last scoring time"""
+    return ranking.stats()
+
+@api_router.get("/catalog/stats")
+async def get_catalog_sync_stats():
+    """Get this worker's applied catalog revision and change-log replay counters"""
+    return {"pid": os.getpid(), **catalog_sync.stats()}
+
+@api_router.get("/db/stats")
+async def get_db_stats():
+    """Get connection pool occupancy and saturation for the reader and writer pools"""
+    return mongo.stats()
+
+@api_router.get("/track-click/stats")
+async def get_click_ingest_stats():
+    """Get click ingestion queue and filter counters"""
+    return {**click_queue.stats(), **click_filter.stats()}
+
 @api_router.get("/stats/{server_id}")
-async def get_server_stats(server_id: str):
-    """Get click statistics for a server"""
-    total_clicks = await db.click_tracking.count_documents({"server_id": server_id})
-    affiliate_clicks = await db.click_tracking.count_documents({"server_id": server_id, "click_type": "affiliate"})
+async def get_server_stats(server_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Get click statistics for a server, optionally limited to [start, end).
+
+    Counts cover whole minutes, or whole hours once minute buckets have
+    expired; `start` / `end` in the response are the bounds actually counted.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if start and start >= (end or datetime.utcnow()):
+        raise HTTPException(status_code=400, detail="start must be before end")
+    with budget(ANALYTICS_TIMEOUT):
+        total_clicks = await rollup_reports.count(server_id, start=start, end=end)
+        affiliate_clicks = await rollup_reports.count(server_id, "affiliate", start=start, end=end)
     
-    return {
+    stats = {
         "server_id": server_id,
         "total_clicks": total_clicks,
         "affiliate_clicks": affiliate_clicks,
         "conversion_rate": (affiliate_clicks / total_clicks * 100) if total_clicks > 0 else 0
     }
+    if start or end:
+        covered_start, covered_end = covered_range(start or datetime.min, end or datetime.utcnow())
+        stats["start"] = covered_start if start else None
+        stats["end"] = covered_end
+    return stats
+
+@api_router.get("/stats/{server_id}/series")
+async def get_server_click_series(
+    server_id: str,
+    window: SeriesWindow = SeriesWindow.LAST_DAY,
+    granularity: Optional[Granularity] = None,
+    click_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Get a server's clicks per minute, hour or day over a window ending at `end` (default now)"""
+    return await click_series(server_id, window, granularity, click_type, start, end)
+
+async def click_series(server_id, window, granularity, click_type, start, end):
+    length, default_granularity = SERIES_WINDOWS[window]
+    granularity = granularity or default_granularity
+    end = naive_utc(end) or datetime.utcnow()
+    start = naive_utc(start) or end - length
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    retention = RETENTION.get(granularity.value)
+    if retention and start < datetime.utcnow() - retention:
+        raise HTTPException(status_code=400, detail=f"{granularity.value} buckets are only kept for {retention.days} days")
+    try:
+        with budget(ANALYTICS_TIMEOUT):
+            points = await rollup_reports.series(start, end, granularity.value, server_id, click_type or ALL)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return JSONBytesResponse(encode_json({
+        "server_id": server_id,
+        "click_type": click_type or ALL,
+        "granularity": granularity.value,
+        "start": start,
+        "end": end,
+        "total": sum(count for _, count in points),
+        "points": [{"bucket": bucket, "count": count} for bucket, count in points],
+    }))
 
 @api_router.get("/analytics")
-async def get_analytics():
-    """Get overall platform analytics"""
-    total_servers = await db.mcp_servers.count_documents({})
-    total_clicks = await db.click_tracking.count_documents({})
-    featured_servers = await db.mcp_servers.count_documents({"is_featured": True})
-    sponsored_servers = await db.mcp_servers.count_documents({"is_sponsored": True})
+async def get_analytics(start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Get overall platform analytics; the click total can be limited to [start, end)"""
+    start, end = naive_utc(start), naive_utc(end)
+    total_servers = await analytics_db.mcp_servers.estimated_document_count()
+    with budget(ANALYTICS_TIMEOUT):
+        total_clicks = await rollup_reports.count(start=start, end=end)
+    featured_servers = await analytics_db.mcp_servers.count_documents({"is_featured": True})
+    sponsored_servers = await analytics_db.mcp_servers.count_documents({"is_sponsored": True})
     
     return {
         "total_servers": total_servers,
@@ -223,16 +1035,26 @@ async def get_analytics():
         "sponsored_servers": sponsored_servers
     }
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/analytics/series")
+async def get_click_series(
+    window: SeriesWindow = SeriesWindow.LAST_DAY,
+    granularity: Optional[Granularity] = None,
+    click_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Get platform-wide clicks per minute, hour or day over a window"""
+    return await click_series(ALL, window, granularity, click_type, start, end)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+async def database_timeout(request: Request, exc: Exception):
+    """A query that ran out of its time budget or waited too long for a connection"""
+    logger.warning("MongoDB timeout on %s: %s", request.url.path, exc)
+    return JSONResponse({"detail": "Database is busy, retry later"}, status_code=503, headers={"Retry-After": "1"})
 
 # Configure logging
 logging.basicConfig(
@@ -241,6 +1063,140 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
+async def connect_database():
+    try:
+        await mongo.connect()
+    except Exception:
+        logger.exception("Failed to connect to MongoDB, requests will retry")
+
+async def prepare_click_rollups():
+    """Backfill the click counters once if they have never been built.
+
+    Runs before the indexes are ensured, so raw events older than the TTL are
+    counted before a newly created TTL index can expire them. When workers start
+    together, the one holding the rebuild lease rebuilds and the others skip it.
+    """
+    try:
+        with budget(MAINTENANCE_TIMEOUT):
+            if await rollups.is_empty() and await db.click_tracking.find_one({}, {"_id": 1}):
+                logger.info("Click rollups are empty, rebuilding from click_tracking")
+                await rollups.rebuild()
+    except Exception:
+        logger.exception("Failed to prepare click rollups, run `python rollups.py rebuild`")
+
+async def create_indexes():
+    try:
+        with budget(MAINTENANCE_TIMEOUT):
+            await ensure_indexes(db)
+    except Exception:
+        logger.exception("Failed to ensure indexes, run `python indexes.py check`")
+
+async def load_catalog_revision():
+    try:
+        await catalog_revision.load()
+    except Exception:
+        logger.exception("Failed to load catalog revision")
+
+async def build_search_index():
+    """Load every listing into the search and suggest indexes; both fall back to $regex until ready"""
+    try:
+        await load_search_indexes()
+        logger.info("Search index built with %d servers, suggest index with %d keys",
+                    len(search_index), len(suggest_index))
+    except Exception:
+        logger.exception("Failed to build search index, using $regex search")
+
+async def start_ranking_refresh():
+    try:
+        await ranking.refresh_clicks(load_ranking_clicks)
+    except Exception:
+        logger.exception("Failed to load click counts for ranking")
+    ranking.start(load_ranking_clicks, RANKING_REFRESH_INTERVAL)
+
+async def start_catalog_sync():
+    """Replay other workers' writes from the revision loaded before the index build"""
+    catalog_sync.start()
+
+async def start_click_queue():
+    click_queue.start()
+
+async def build_homepage_snapshot():
+    try:
+        await homepage.rebuild()
+    except Exception:
+        logger.exception("Failed to build homepage snapshot, it will be built on first request")
+    homepage.start()
+
+async def start_link_checks():
+    link_checker.start(LINK_CHECK_INTERVAL)
+
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    await link_checker.stop()
+    await catalog_sync.stop()
+    await ranking.stop()
+    await homepage.stop()
+    await click_queue.stop()
+    mongo.close()
+
+# Run in order at startup; each step logs its own failure so the app still starts
+STARTUP_STEPS = (
+    connect_database,
+    prepare_click_rollups,
+    create_indexes,
+    load_catalog_revision,
+    build_search_index,
+    start_ranking_refresh,
+    start_catalog_sync,
+    start_click_queue,
+    build_homepage_snapshot,
+    start_link_checks,
+)
+
+# Optional warmup after startup, e.g.
+# WARMUP_CONNECTIONS=20 WARMUP_PATHS=/api/homepage,/api/featured-servers,/api/sponsored-servers,/api/categories
+WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', 0))
+WARMUP_PATHS = [path.strip() for path in os.environ.get('WARMUP_PATHS', '').split(',') if path.strip()]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for step in STARTUP_STEPS:
+        await step()
+    if WARMUP_CONNECTIONS or WARMUP_PATHS:
+        await warm_up(app, mongo, WARMUP_CONNECTIONS, WARMUP_PATHS)
+    yield
+    await shutdown_db_client()
+
+def create_app() -> FastAPI:
+    """Build the ASGI app; module-level state (pools, caches, indexes) is shared by every app built"""
+    app = FastAPI(title="MCP Server Directory API", version="1.0.0", lifespan=lifespan)
+    app.include_router(api_router)
+
+    for timeout_error in (ExecutionTimeout, NetworkTimeout, ServerSelectionTimeoutError, WaitQueueTimeoutError):
+        app.add_exception_handler(timeout_error, database_timeout)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
+    )
+
+    # Outside CORS so compression sees the final headers; inside metrics so its CPU time is a phase
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        cache=compressed_cache,
+    )
+
+    # Outermost, so latency includes CORS handling; PROFILE_SLOW_REQUEST_MS enables the sampling profiler
+    app.add_middleware(
+        MetricsMiddleware,
+        slow_request_ms=float(os.environ.get('PROFILE_SLOW_REQUEST_MS', 0)) or None,
+        profile_dir=os.environ.get('PROFILE_DIR', tempfile.gettempdir()),
+        profile_interval_ms=float(os.environ.get('PROFILE_INTERVAL_MS', 5)),
+    )
+    return app
+
+app = create_app()
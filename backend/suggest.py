@@ -0,0 +1,227 @@
+import heapq
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+from sortedcontainers import SortedList
+
+from search import tokenize
+
+SERVER = "server"
+FEATURE = "feature"
+CATEGORY = "category"
+
+
+@lru_cache(maxsize=65536)
+def normalize(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _enum_value(value):
+    return getattr(value, "value", value)
+
+
+class SuggestIndex:
+    """Typeahead over server names, features and categories.
+
+    Every phrase is stored under each of its word suffixes ("seo master pro",
+    "master pro", "pro") in one sorted list, so a prefix lookup is a pair of
+    bisects. Suggestions rank like the directory: sponsored, then featured,
+    then by rating; a feature or category ranks as its best server.
+
+    Keys live in a `SortedList`, so a write costs O(log n) rather than
+    shifting a flat list. Every prefix matching more than `scan_limit` keys
+    has its top suggestions cached, computed at build time by merging the
+    lists of its one-character-longer prefixes, so no lookup scans more than
+    `scan_limit` keys. Writes patch the cached lists in place.
+    """
+
+    def __init__(self, depth: int = 20, scan_limit: int = 256, max_words: int = 8):
+        self.depth = depth
+        self.scan_limit = scan_limit
+        self.max_words = max_words
+        self.ready = False
+        self._keys = SortedList()  # (key, entry_id)
+        self._pending: List[Tuple[str, str]] = []  # keys added during a build, sorted once at the end
+        self._entries: Dict[str, dict] = {}
+        self._server_entries: Dict[str, List[str]] = {}
+        self._top: Dict[str, List[str]] = {}
+        self._bulk = False
+
+    def __len__(self):
+        return len(self._keys)
+
+    def build(self, docs: Iterable[dict]):
+        """Replace the contents, sorting the keys once instead of inserting each"""
+        self.clear()
+        self._bulk = True
+        try:
+            for doc in docs:
+                self.add(doc)
+        finally:
+            self._bulk = False
+            self._keys = SortedList(self._pending)
+            self._pending = []
+        self._warm()
+        self.ready = True
+
+    def _warm(self):
+        """Cache the top suggestions of every prefix broader than `scan_limit`"""
+        self._ranked("", 0, len(self._keys))
+        self._top.pop("", None)
+
+    def clear(self):
+        self._keys.clear()
+        self._pending.clear()
+        self._entries.clear()
+        self._server_entries.clear()
+        self._top.clear()
+
+    def _sort_key(self, entry_id: str):
+        entry = self._entries[entry_id]
+        return entry["rank"], entry["text"]
+
+    def add(self, doc: dict):
+        """Index a server's suggestions, replacing any previous version"""
+        server_id = doc["id"]
+        self.remove(server_id)
+        rank = (not doc.get("is_sponsored", False), not doc.get("is_featured", False), -float(doc.get("rating", 0)))
+        phrases = [(f"{SERVER}:{server_id}", doc.get("name") or "", SERVER)]
+        phrases += [(f"{FEATURE}:{normalize(feature)}", feature, FEATURE) for feature in doc.get("features") or []]
+        category = _enum_value(doc.get("category"))
+        if category:
+            phrases.append((f"{CATEGORY}:{category}", category, CATEGORY))
+
+        attached = []
+        for entry_id, text, kind in phrases:
+            if entry_id in attached or not normalize(text):
+                continue
+            self._attach(entry_id, text, kind, server_id, rank)
+            attached.append(entry_id)
+        self._server_entries[server_id] = attached
+
+    def remove(self, server_id: str):
+        """Drop a server's suggestions; unknown ids are ignored"""
+        for entry_id in self._server_entries.pop(server_id, ()):
+            self._detach(entry_id, server_id)
+
+    def _entry_keys(self, text: str) -> List[str]:
+        words = tokenize(text)[:self.max_words]
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _attach(self, entry_id, text, kind, server_id, rank):
+        entry = self._entries.get(entry_id)
+        if entry is None:
+            entry = self._entries[entry_id] = {
+                "text": text,
+                "kind": kind,
+                "id": server_id if kind == SERVER else None,
+                "keys": self._entry_keys(text),
+                "members": {},
+                "rank": rank,
+            }
+            for key in entry["keys"]:
+                if self._bulk:
+                    self._pending.append((key, entry_id))
+                else:
+                    self._keys.add((key, entry_id))
+        entry["members"][server_id] = rank
+        if rank <= entry["rank"]:
+            entry["rank"] = rank
+            self._update_cached(entry_id, entry["keys"], worse=False)
+
+    def _detach(self, entry_id, server_id):
+        entry = self._entries[entry_id]
+        previous = entry["rank"]
+        removed_rank = entry["members"].pop(server_id, None)
+        if entry["members"]:
+            # Only losing the best-ranked member can change the entry's rank
+            if removed_rank == previous:
+                best = entry["rank"] = min(entry["members"].values())
+                self._update_cached(entry_id, entry["keys"], worse=best > previous)
+            return
+        if self._bulk:
+            for key in entry["keys"]:
+                self._pending.remove((key, entry_id))
+        else:
+            for key in entry["keys"]:
+                self._keys.discard((key, entry_id))
+        self._update_cached(entry_id, entry["keys"], worse=True, removed=True)
+        del self._entries[entry_id]
+
+    def _update_cached(self, entry_id, keys, worse, removed=False):
+        """Patch cached top lists for every prefix of the entry's keys.
+
+        A cached list is always the exact top of its prefix's range, just
+        possibly shorter than it was built. An entry that drops below the
+        last cached one is left out, and a list is only discarded once it
+        is shorter than `depth`.
+        """
+        if not self._top:
+            return
+        for key in keys:
+            for n in range(1, len(key) + 1):
+                prefix = key[:n]
+                cached = self._top.get(prefix)
+                if cached is None:
+                    continue
+                present = entry_id in cached
+                if present:
+                    cached.remove(entry_id)
+                if not removed and ((present and not worse) or (cached and self._sort_key(entry_id) < self._sort_key(cached[-1]))):
+                    cached.append(entry_id)
+                    cached.sort(key=self._sort_key)
+                    del cached[self.depth * 2:]
+                if len(cached) < self.depth:
+                    del self._top[prefix]
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[dict]:
+        query = normalize(prefix)
+        if not query:
+            return []
+        ranked = self._top.get(query)
+        if ranked is None:
+            lo = self._keys.bisect_left((query,))
+            hi = self._keys.bisect_left((query + "\uffff",))
+            ranked, _ = self._ranked(query, lo, hi)
+        return [self._payload(entry_id) for entry_id in ranked[:limit]]
+
+    def _ranked(self, prefix: str, lo: int, hi: int) -> Tuple[List[str], int]:
+        """Top entry ids for `prefix`, whose keys are `_keys[lo:hi]`.
+
+        Also returns how many leading ids are known exact: a patched cached
+        list may be shorter than `depth * 2` without the range running out.
+        """
+        # Cache twice the served depth so updates rarely invalidate a list
+        wanted = self.depth * 2
+        if hi - lo <= self.scan_limit:
+            ids = {entry_id for _, entry_id in self._keys.islice(lo, hi)}
+            return heapq.nsmallest(wanted, ids, key=self._sort_key), wanted
+        cached = self._top.get(prefix)
+        if cached is not None:
+            return cached, len(cached)
+        # Merge the lists of each one-character-longer prefix, plus keys equal to the prefix
+        ids, exact, n, i = set(), wanted, len(prefix), lo
+        while i < hi:
+            key, entry_id = self._keys[i]
+            if len(key) == n:
+                ids.add(entry_id)
+                i += 1
+                continue
+            end = self._keys.bisect_left((key[:n + 1] + "\uffff",))
+            child, child_exact = self._ranked(key[:n + 1], i, end)
+            ids.update(child[:child_exact])
+            exact = min(exact, child_exact)
+            i = end
+        ranked = heapq.nsmallest(exact, ids, key=self._sort_key)
+        self._top[prefix] = ranked
+        return ranked, len(ranked) if len(ranked) < wanted else wanted
+
+    def _payload(self, entry_id: str) -> dict:
+        entry = self._entries[entry_id]
+        payload = {"text": entry["text"], "kind": entry["kind"]}
+        if entry["id"]:
+            payload["id"] = entry["id"]
+        return payload
+
+    def stats(self) -> dict:
+        return {"keys": len(self._keys), "entries": len(self._entries), "cached_prefixes": len(self._top)}
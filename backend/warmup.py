@@ -0,0 +1,52 @@
+"""Optional warmup run at the end of startup, before the app reports ready.
+
+Startup already connects both pools, ensures indexes and builds the search,
+ranking and homepage structures. Warmup goes further so the first real
+requests find everything hot:
+
+- each MongoDB pool opens `connections` connections instead of one
+- every path in `paths` is requested once through the full middleware
+  stack, which fills the listing cache and, with a browser-like
+  Accept-Encoding, the compressed-body cache
+
+A failed path is logged and skipped; warmup never stops the app starting.
+"""
+import logging
+import time
+from typing import Iterable
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# What browsers send, so the primed compressed bodies are the ones they get
+ACCEPT_ENCODING = "gzip, deflate, br, zstd"
+
+
+async def warm_up(app, mongo: Database, connections: int, paths: Iterable[str]) -> dict:
+    """Warm the pools and prime read caches; return what was done and how long it took"""
+    # Only needed here, so the API process does not import it for nothing
+    import httpx
+
+    start = time.perf_counter()
+    summary = {"connections": 0, "paths": 0, "failed": []}
+    if connections:
+        try:
+            await mongo.warm(connections)
+            summary["connections"] = connections
+        except Exception:
+            logger.exception("Failed to warm the MongoDB pools")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+        for path in paths:
+            try:
+                response = await client.get(path, headers={"Accept-Encoding": ACCEPT_ENCODING})
+                response.raise_for_status()
+                summary["paths"] += 1
+            except Exception:
+                logger.exception("Warmup request to %s failed", path)
+                summary["failed"].append(path)
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("Warmup finished: %s", summary)
+    return summary
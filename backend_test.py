@@ -1,6 +1,9 @@
 import requests
 import unittest
+import base64
 import json
+import os
+import uuid
 import sys
 from datetime import datetime
 
@@ -144,6 +147,465 @@ class MCPServerDirectoryAPITester(unittest.TestCase):
         self.assertIn("sponsored_servers", analytics)
         print("✅ Get analytics test passed")
 
+    def test_13_search_relevance_sort(self):
+        """Test relevance-ranked and prefix search"""
+        print("\n🔍 Testing search with relevance sort...")
+        response = requests.get(f"{self.base_url}/servers?search=SEO&sort=relevance")
+        self.assertEqual(response.status_code, 200)
+        servers = response.json()
+        self.assertGreaterEqual(len(servers), 1)
+        self.assertEqual(servers[0]["name"], "SEO Master Pro")
+
+        response = requests.get(f"{self.base_url}/servers?search=keyw")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(len(response.json()), 1)  # Prefix match on "keyword"
+        print("✅ Search relevance sort test passed")
+
+    def test_14_click_ingest_stats(self):
+        """Test click ingestion queue counters"""
+        print("\n🔍 Testing click ingest stats endpoint...")
+        response = requests.get(f"{self.base_url}/track-click/stats")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for key in ("queue_depth", "accepted", "written", "dropped", "batches", "avg_batch_size"):
+            self.assertIn(key, stats)
+        print("✅ Click ingest stats test passed")
+
+    def test_15_get_server_stats_time_range(self):
+        """Test server statistics limited to a time range"""
+        print("\n🔍 Testing get server stats with a time range...")
+        response = requests.get(f"{self.base_url}/stats/{self.test_server_id}")
+        all_time = response.json()
+        response = requests.get(
+            f"{self.base_url}/stats/{self.test_server_id}",
+            params={"start": "2000-01-01T00:00:00", "end": "2100-01-01T00:00:00"},
+        )
+        self.assertEqual(response.status_code, 200)
+        ranged = response.json()
+        self.assertGreaterEqual(ranged["total_clicks"], all_time["total_clicks"])
+        self.assertLessEqual(ranged["affiliate_clicks"], ranged["total_clicks"])
+        print("✅ Get server stats time range test passed")
+
+    def test_16_cache_stats(self):
+        """Test listing cache counters"""
+        print("\n🔍 Testing cache stats endpoint...")
+        requests.get(f"{self.base_url}/featured-servers")
+        requests.get(f"{self.base_url}/featured-servers")
+        response = requests.get(f"{self.base_url}/cache/stats")
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()
+        for key in ("size", "hits", "misses", "evictions", "coalesced"):
+            self.assertIn(key, stats)
+        self.assertGreaterEqual(stats["hits"], 1)
+        print("✅ Cache stats test passed")
+
+    def test_17_paginate_servers_with_cursor(self):
+        """Test keyset pagination and NDJSON streaming of servers"""
+        print("\n🔍 Testing cursor pagination...")
+        response = requests.get(f"{self.base_url}/servers?limit=3")
+        self.assertEqual(response.status_code, 200)
+        first_page = [server["id"] for server in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        self.assertIsNotNone(cursor)
+
+        response = requests.get(f"{self.base_url}/servers", params={"limit": 3, "cursor": cursor})
+        self.assertEqual(response.status_code, 200)
+        second_page = [server["id"] for server in response.json()]
+        self.assertFalse(set(first_page) & set(second_page))
+
+        response = requests.get(f"{self.base_url}/servers?format=ndjson")
+        self.assertEqual(response.status_code, 200)
+        streamed = [json.loads(line)["id"] for line in response.text.splitlines()]
+        self.assertEqual(streamed[:6], first_page + second_page)
+
+        response = requests.get(f"{self.base_url}/servers?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+        print(f"✅ Cursor pagination test passed - Streamed {len(streamed)} servers")
+
+    def test_18_summary_view(self):
+        """Test the compact summary view of listing endpoints"""
+        print("\n🔍 Testing summary view...")
+        for path in ("servers", "featured-servers", "sponsored-servers"):
+            full = requests.get(f"{self.base_url}/{path}")
+            summary = requests.get(f"{self.base_url}/{path}?view=summary")
+            self.assertEqual(summary.status_code, 200)
+            self.assertLess(len(summary.content), len(full.content))
+            for server in summary.json():
+                self.assertIn("name", server)
+                self.assertIn("rating", server)
+                self.assertNotIn("detailed_description", server)
+                self.assertNotIn("features", server)
+        print("✅ Summary view test passed")
+
+    def test_19_conditional_requests(self):
+        """Test ETag / If-None-Match on catalog endpoints"""
+        print("\n🔍 Testing conditional requests...")
+        for path in ("servers", f"servers/{self.test_server_id}", "featured-servers", "sponsored-servers", "categories"):
+            response = requests.get(f"{self.base_url}/{path}")
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers.get("ETag")
+            self.assertIsNotNone(etag)
+            self.assertIn("max-age", response.headers.get("Cache-Control", ""))
+
+            response = requests.get(f"{self.base_url}/{path}", headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers.get("ETag"), etag)
+        print("✅ Conditional requests test passed")
+
+    def test_20_bulk_import(self):
+        """Test idempotent bulk upsert with per-row errors"""
+        print("\n🔍 Testing bulk import endpoint...")
+        row = {
+            "id": "bulk-test-1",
+            "name": "Bulk Import Test Server",
+            "description": "Created by the bulk import test",
+            "detailed_description": "Created by the bulk import test",
+            "category": "SEO Analytics",
+            "features": ["Bulk import"],
+            "pricing_model": "Free",
+            "pricing_details": "Free",
+            "affiliate_url": "https://example.com/affiliate",
+            "official_url": "https://example.com",
+            "logo_url": "https://example.com/logo.png",
+            "rating": 4.0,
+        }
+        body = json.dumps(row) + "\n" + json.dumps({**row, "id": "bulk-test-2", "rating": 9}) + "\n"
+        try:
+            response = requests.post(f"{self.base_url}/servers/bulk", data=body)
+            self.assertEqual(response.status_code, 200)
+            report = response.json()
+            self.assertEqual(report["received"], 2)
+            self.assertEqual(report["failed"], 1)
+            self.assertEqual(report["errors"][0]["id"], "bulk-test-2")
+
+            response = requests.post(f"{self.base_url}/servers/bulk", data=body)
+            report = response.json()
+            self.assertEqual(report["inserted"] + report["updated"], 0)
+            self.assertEqual(report["unchanged"], 1)
+        finally:
+            requests.delete(f"{self.base_url}/servers/bulk-test-1")
+        print("✅ Bulk import test passed")
+
+    def test_21_metrics(self):
+        """Test Prometheus latency metrics"""
+        print("\n🔍 Testing metrics endpoint...")
+        requests.get(f"{self.base_url}/servers")
+        response = requests.get(f"{self.base_url}/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/servers"', response.text)
+        self.assertIn('phase="db"', response.text)
+        self.assertIn("http_requests_in_flight", response.text)
+        print("✅ Metrics test passed")
+
+    def test_22_server_facets(self):
+        """Test facet counts alongside the first page of results"""
+        print("\n🔍 Testing server facets endpoint...")
+        response = requests.get(f"{self.base_url}/servers/facets")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(sum(data["category"].values()), data["total"])
+        self.assertEqual(sum(data["pricing_model"].values()), data["total"])
+
+        category = "SEO Analytics"
+        response = requests.get(f"{self.base_url}/servers/facets", params={"category": category})
+        filtered = response.json()
+        self.assertEqual(filtered["total"], data["category"][category])
+        self.assertTrue(all(server["category"] == category for server in filtered["results"]))
+        # The category facet ignores the category filter itself
+        self.assertEqual(filtered["category"], data["category"])
+        print("✅ Server facets test passed")
+
+    def test_23_homepage_snapshot(self):
+        """Test the combined homepage payload"""
+        print("\n🔍 Testing homepage endpoint...")
+        response = requests.get(f"{self.base_url}/homepage")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(all(server["is_featured"] for server in data["featured"]))
+        self.assertTrue(all(server["is_sponsored"] for server in data["sponsored"]))
+        self.assertEqual(len(data["categories"]), 8)
+        self.assertIn("total_servers", data["analytics"])
+
+        response = requests.get(f"{self.base_url}/homepage", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(response.status_code, 304)
+        print("✅ Homepage snapshot test passed")
+
+    def test_24_click_series(self):
+        """Test windowed click time series"""
+        print("\n🔍 Testing click series endpoints...")
+        response = requests.get(f"{self.base_url}/stats/{self.test_server_id}/series", params={"window": "1h"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["granularity"], "minute")
+        self.assertIn(len(data["points"]), (60, 61))
+        self.assertEqual(data["total"], sum(point["count"] for point in data["points"]))
+
+        response = requests.get(f"{self.base_url}/analytics/series", params={"window": "30d"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["granularity"], "day")
+
+        response = requests.get(f"{self.base_url}/analytics/series", params={"window": "30d", "granularity": "minute"})
+        self.assertEqual(response.status_code, 400)
+        print("✅ Click series test passed")
+
+    def test_25_click_dedup_and_bot_filter(self):
+        """Test that repeat clicks and crawler clicks are not recorded"""
+        print("\n🔍 Testing click dedup and bot filtering...")
+        click_data = {
+            "server_id": f"dedup-test-{uuid.uuid4()}",
+            "user_ip": "127.0.0.1",
+            "user_agent": "Test Agent",
+            "click_type": "affiliate"
+        }
+        browser = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"}
+        first = requests.post(f"{self.base_url}/track-click", json=click_data, headers=browser)
+        repeat = requests.post(f"{self.base_url}/track-click", json=click_data, headers=browser)
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNone(first.headers.get("X-Click-Suppressed"))
+        self.assertEqual(repeat.headers.get("X-Click-Suppressed"), "duplicate")
+
+        crawler = requests.post(f"{self.base_url}/track-click", json=click_data, headers={"User-Agent": "Googlebot/2.1"})
+        self.assertEqual(crawler.headers.get("X-Click-Suppressed"), "bot")
+
+        stats = requests.get(f"{self.base_url}/track-click/stats").json()
+        self.assertGreaterEqual(stats["suppressed_duplicates"], 1)
+        self.assertGreaterEqual(stats["suppressed_bots"], 1)
+        print("✅ Click dedup and bot filter test passed")
+
+    def test_26_suggest(self):
+        """Test typeahead suggestions"""
+        print("\n🔍 Testing suggest endpoint...")
+        response = requests.get(f"{self.base_url}/suggest", params={"q": "seo", "limit": 5})
+        self.assertEqual(response.status_code, 200)
+        suggestions = response.json()
+        self.assertLessEqual(len(suggestions), 5)
+        for suggestion in suggestions:
+            self.assertIn(suggestion["kind"], ("server", "feature", "category"))
+            self.assertIn("seo", suggestion["text"].lower())
+
+        response = requests.get(f"{self.base_url}/suggest", params={"q": ""})
+        self.assertEqual(response.status_code, 422)
+        print("✅ Suggest test passed")
+
+    def test_27_batch_lookup(self):
+        """Test fetching several servers in one request"""
+        print("\n🔍 Testing batch lookup...")
+        ids = [server["id"] for server in requests.get(f"{self.base_url}/servers", params={"limit": 3}).json()]
+        wanted = list(reversed(ids)) + ["does-not-exist"]
+        response = requests.get(f"{self.base_url}/servers/batch", params={"ids": wanted})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([server["id"] for server in data["servers"]], list(reversed(ids)))
+        self.assertEqual(data["missing"], ["does-not-exist"])
+
+        response = requests.get(f"{self.base_url}/servers/batch")
+        self.assertEqual(response.status_code, 400)
+        print("✅ Batch lookup test passed")
+
+    def test_28_db_pool_stats(self):
+        """Test reader and writer pool statistics"""
+        print("\n🔍 Testing database pool stats...")
+        response = requests.get(f"{self.base_url}/db/stats")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        for pool in ("read", "write"):
+            self.assertIn(pool, data)
+            self.assertGreater(data[pool]["max_size"], 0)
+            self.assertGreaterEqual(data[pool]["saturation"], 0)
+        self.assertGreater(data["read"]["checkouts"], 0)
+        print("✅ Database pool stats test passed")
+
+    def test_29_catalog_sync(self):
+        """Test that a write advances this worker's applied catalog revision and ETag"""
+        print("\n🔍 Testing catalog sync...")
+        before = requests.get(f"{self.base_url}/catalog/stats").json()["revision"]
+        server = requests.get(f"{self.base_url}/servers/{self.test_server_id}").json()
+        body = {k: v for k, v in server.items() if k not in ("id", "created_at", "updated_at")}
+        response = requests.put(f"{self.base_url}/servers/{self.test_server_id}", json=body)
+        self.assertEqual(response.status_code, 200)
+
+        stats = requests.get(f"{self.base_url}/catalog/stats").json()
+        self.assertGreater(stats["revision"], before)
+        self.assertIsNone(stats["waiting_for_revision"])
+        response = requests.get(f"{self.base_url}/servers/{self.test_server_id}")
+        self.assertEqual(response.headers["ETag"], f'"r{stats["revision"]}"')
+        print("✅ Catalog sync test passed")
+
+    def test_30_ranked_sort(self):
+        """Test that sort=ranked pages through every listing once, sponsored listings first"""
+        print("\n🔍 Testing ranked sort...")
+        seen, cursor = [], None
+        while True:
+            params = {"sort": "ranked", "limit": 3, "view": "summary"}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{self.base_url}/servers", params=params)
+            self.assertEqual(response.status_code, 200)
+            seen += response.json()
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        ids = [server["id"] for server in seen]
+        self.assertEqual(len(ids), len(set(ids)))
+        sponsored = [server["is_sponsored"] for server in seen]
+        self.assertEqual(sponsored, sorted(sponsored, reverse=True))
+
+        response = requests.get(f"{self.base_url}/featured-servers", params={"sort": "ranked"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(server["is_featured"] for server in response.json()))
+        self.assertIn("weights", requests.get(f"{self.base_url}/ranking/stats").json())
+        print("✅ Ranked sort test passed")
+
+    def test_31_link_report(self):
+        """Test that a link check can be started and the report lists broken links per field"""
+        print("\n🔍 Testing link health report...")
+        response = requests.post(f"{self.base_url}/links/check")
+        self.assertIn(response.status_code, (401, 403))
+        if os.environ.get("ADMIN_TOKEN"):
+            response = requests.post(f"{self.base_url}/links/check",
+                                     headers={"Authorization": f"Bearer {os.environ['ADMIN_TOKEN']}"})
+            self.assertEqual(response.status_code, 202)
+            self.assertIn("started", response.json())
+
+        response = requests.get(f"{self.base_url}/links/report", params={"field": "logo_url"})
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertIn("running", report["checker"])
+        self.assertTrue(all(entry["field"] == "logo_url" for entry in report["broken"]))
+        response = requests.get(f"{self.base_url}/links/report", params={"field": "name"})
+        self.assertEqual(response.status_code, 400)
+        print("✅ Link health report test passed")
+
+    def test_32_change_feed(self):
+        """Test that the change feed returns an update and a delete made after the token was taken"""
+        print("\n🔍 Testing change feed...")
+        token = requests.get(f"{self.base_url}/servers/changes").json()["next"]
+        server = requests.get(f"{self.base_url}/servers/{self.test_server_id}").json()
+        body = {k: v for k, v in server.items() if k not in ("id", "created_at", "updated_at")}
+        requests.put(f"{self.base_url}/servers/{self.test_server_id}", json=body)
+        created = requests.post(f"{self.base_url}/servers", json={**body, "name": "Change Feed Probe"}).json()
+        requests.delete(f"{self.base_url}/servers/{created['id']}")
+
+        response = requests.get(f"{self.base_url}/servers/changes", params={"since": token})
+        self.assertEqual(response.status_code, 200)
+        changes = {change.get("id") or change["server"]["id"]: change for change in response.json()["changes"]}
+        self.assertEqual(changes[self.test_server_id]["op"], "upsert")
+        self.assertEqual(changes[created["id"]]["op"], "delete")
+
+        response = requests.get(f"{self.base_url}/servers/changes", params={"since": "not-a-token"})
+        self.assertEqual(response.status_code, 400)
+        print("✅ Change feed test passed")
+
+    def test_33_compression(self):
+        """Test that large responses are compressed when the client accepts gzip and sent as-is otherwise"""
+        print("\n🔍 Testing response compression...")
+        response = requests.get(f"{self.base_url}/servers", params={"limit": 100},
+                                headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get("Content-Encoding"), "gzip")
+        self.assertIn("Accept-Encoding", response.headers.get("Vary", ""))
+        self.assertIsInstance(response.json(), list)
+
+        etag = response.headers.get("ETag")
+        if etag:
+            self.assertTrue(etag.startswith("W/"))
+            response = requests.get(f"{self.base_url}/servers", params={"limit": 100},
+                                    headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.headers.get("ETag"), etag)
+
+        response = requests.get(f"{self.base_url}/servers", params={"limit": 100},
+                                headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get("Content-Encoding"))
+        print("✅ Response compression test passed")
+
+    def test_34_cursor_with_wrong_types(self):
+        """Test that a well-formed cursor whose sort key has the wrong types is rejected with 400"""
+        print("\n🔍 Testing cursors with wrong key types...")
+        def cursor(mode, key):
+            raw = json.dumps({"m": mode, "k": key}).encode()
+            return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+        cases = [
+            ({}, cursor("default", ["x", False, 4.5, "id"])),
+            ({"search": "seo"}, cursor("default", [True, True, "5", "id"])),
+            ({"search": "seo", "sort": "relevance"}, cursor("relevance", ["x", "id"])),
+            ({"sort": "ranked"}, cursor("ranked", ["x", "id"])),
+        ]
+        for params, token in cases:
+            response = requests.get(f"{self.base_url}/servers", params={**params, "cursor": token})
+            self.assertEqual(response.status_code, 400, params)
+
+        response = requests.get(f"{self.base_url}/servers/changes", params={"since": cursor("changes", ["1"])})
+        self.assertEqual(response.status_code, 400)
+        print("✅ Cursor type validation test passed")
+
+    def test_35_stats_with_timezone_aware_range(self):
+        """Test that stats accept timezone-aware bounds and reject a range that ends before it starts"""
+        print("\n🔍 Testing stats with timezone-aware ranges...")
+        response = requests.get(f"{self.base_url}/stats/{self.test_server_id}", params={"start": "2026-01-01T10:15:00Z"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["start"], "2026-01-01T10:00:00")
+
+        response = requests.get(f"{self.base_url}/stats/{self.test_server_id}/series",
+                                params={"start": "2026-01-02T00:00:00+00:00", "end": "2026-01-01T00:00:00+00:00",
+                                        "granularity": "day"})
+        self.assertEqual(response.status_code, 400)
+        print("✅ Timezone-aware stats test passed")
+
+    def test_36_ranked_cursor_from_older_generation(self):
+        """Test that ranked ETags carry the ranking generation and a cursor from another generation or catalog revision is refused"""
+        print("\n🔍 Testing ranked cursors across click refreshes...")
+        generation = requests.get(f"{self.base_url}/ranking/stats").json()["generation"]
+        response = requests.get(f"{self.base_url}/servers", params={"sort": "ranked", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f"-g{generation}", response.headers["ETag"])
+
+        raw = json.dumps({"m": "ranked", "k": [1.0, "id", "stale"]}).encode()
+        token = base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+        response = requests.get(f"{self.base_url}/servers", params={"sort": "ranked", "cursor": token})
+        self.assertEqual(response.status_code, 410)
+
+        # A catalog write can change scores too, so it also retires outstanding cursors
+        cursor = requests.get(f"{self.base_url}/servers", params={"sort": "ranked", "limit": 1}).headers["X-Next-Cursor"]
+        server = requests.get(f"{self.base_url}/servers/{self.test_server_id}").json()
+        body = {k: v for k, v in server.items() if k not in ("id", "created_at", "updated_at")}
+        requests.put(f"{self.base_url}/servers/{self.test_server_id}", json={**body, "rating": 5.0 - body["rating"]})
+        response = requests.get(f"{self.base_url}/servers", params={"sort": "ranked", "cursor": cursor})
+        self.assertEqual(response.status_code, 410)
+        print("✅ Ranked cursor generation test passed")
+
+    def test_37_punctuation_only_search(self):
+        """Test that a search without letters or digits falls back to a substring match"""
+        print("\n🔍 Testing punctuation-only search...")
+        for term in ("++", "("):
+            response = requests.get(f"{self.base_url}/servers", params={"search": term})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(all(term in server["name"] + server["description"] + " ".join(server["features"])
+                                for server in response.json()))
+        print("✅ Punctuation-only search test passed")
+
+    def test_38_forwarded_for_rotation_and_phone_agents(self):
+        """Test that rotating X-Forwarded-For values do not bypass dedup and phone user agents are not bots"""
+        print("\n🔍 Testing click dedup with spoofed X-Forwarded-For...")
+        click_data = {
+            "server_id": f"xff-test-{uuid.uuid4()}",
+            "user_ip": "127.0.0.1",
+            "user_agent": "Test Agent",
+            "click_type": "affiliate"
+        }
+        phone = {"User-Agent": "Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36"}
+        first = requests.post(f"{self.base_url}/track-click", json=click_data,
+                              headers={**phone, "X-Forwarded-For": "203.0.113.1"})
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNone(first.headers.get("X-Click-Suppressed"))
+        for fake in ("203.0.113.2", "198.51.100.7"):
+            repeat = requests.post(f"{self.base_url}/track-click", json=click_data,
+                                   headers={**phone, "X-Forwarded-For": fake})
+            self.assertEqual(repeat.headers.get("X-Click-Suppressed"), "duplicate")
+        print("✅ Forwarded-for dedup test passed")
+
 def run_tests():
     """Run all API tests"""
     test_suite = unittest.TestLoader().loadTestsFromTestCase(MCPServerDirectoryAPITester)
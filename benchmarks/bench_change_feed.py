@@ -0,0 +1,107 @@
+"""Bytes and time to stay in sync: change feed vs. re-pulling the catalog.
+
+Runs the app in-process (see load_suite.py), seeds --servers listings, takes
+a change token, then applies --writes updates and deletes through the API.
+A consumer then catches up twice: once by re-pulling every listing
+(`/api/servers?format=ndjson`), once by following `/api/servers/changes`
+from the token. Reports response bytes and wall time for each.
+
+Usage:
+    pip install mongomock-motor
+    python benchmarks/bench_change_feed.py --servers 20000 --writes 200
+    python benchmarks/bench_change_feed.py --mongo    # uses MONGO_URL, database <DB_NAME>_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import httpx
+
+from load_suite import lifespan, load_app
+
+
+async def full_pull(client):
+    start = time.perf_counter()
+    response = await client.get("/api/servers", params={"format": "ndjson"})
+    return {"bytes": len(response.content), "listings": response.content.count(b"\n"),
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+async def follow_feed(client, token, limit):
+    start = time.perf_counter()
+    size = pages = upserts = deletes = 0
+    while True:
+        response = await client.get("/api/servers/changes", params={"since": token, "limit": limit})
+        response.raise_for_status()
+        page = response.json()
+        size += len(response.content)
+        pages += 1
+        upserts += sum(change["op"] == "upsert" for change in page["changes"])
+        deletes += sum(change["op"] == "delete" for change in page["changes"])
+        token = page["next"]
+        if not page["has_more"]:
+            break
+    return {"bytes": size, "pages": pages, "upserts": upserts, "deletes": deletes,
+            "seconds": round(time.perf_counter() - start, 3)}
+
+
+async def run(args):
+    server = load_app(args)
+    from seed_data import generate_servers
+
+    db = server.db
+    await db.mcp_servers.drop()
+    await db.catalog_changes.drop()
+    servers = list(generate_servers(args.servers, seed=args.seed))
+    now = datetime.utcnow()
+    for i in range(0, len(servers), 1000):
+        await db.mcp_servers.insert_many([{**s, "created_at": now, "updated_at": now} for s in servers[i:i + 1000]])
+
+    rng = random.Random(args.seed)
+    try:
+        async with lifespan(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                token = (await client.get("/api/servers/changes")).json()["next"]
+                for target in rng.sample(servers, args.writes):
+                    if rng.random() < args.delete_share:
+                        await client.delete(f"/api/servers/{target['id']}")
+                    else:
+                        body = {k: v for k, v in target.items() if k not in ("id", "created_at", "updated_at")}
+                        await client.put(f"/api/servers/{target['id']}", json={**body, "rating": round(rng.uniform(1, 5), 1)})
+                full = await full_pull(client)
+                feed = await follow_feed(client, token, args.limit)
+    finally:
+        if args.mongo:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            cleanup = AsyncIOMotorClient(os.environ["MONGO_URL"])
+            await cleanup.drop_database(os.environ["DB_NAME"])
+            cleanup.close()
+
+    return {
+        "config": {"backend": "mongod" if args.mongo else "mongomock", "servers": args.servers,
+                   "writes": args.writes, "limit": args.limit},
+        "full_pull": full,
+        "change_feed": feed,
+        "bytes_ratio": round(full["bytes"] / feed["bytes"], 1) if feed["bytes"] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=20000)
+    parser.add_argument("--writes", type=int, default=200, help="updates and deletes between the two syncs")
+    parser.add_argument("--delete-share", type=float, default=0.1)
+    parser.add_argument("--limit", type=int, default=500, help="change feed page size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of mongomock-motor")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
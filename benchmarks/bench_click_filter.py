@@ -0,0 +1,72 @@
+"""Per-event cost of click dedup and bot filtering.
+
+Replays a synthetic click stream (a mix of browsers, crawlers and repeat
+clicks) through ClickFilter and reports the mean time per event and the
+share of events suppressed.
+
+Usage:
+    python benchmarks/bench_click_filter.py --events 200000 --servers 5000 --clients 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from click_filter import BotClassifier, ClickFilter, DedupWindow
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+    "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    "python-requests/2.31.0",
+    "curl/8.4.0",
+]
+
+
+def make_events(args):
+    rng = random.Random(args.seed)
+    events = []
+    for _ in range(args.events):
+        if events and rng.random() < args.repeat_rate:
+            events.append(dict(rng.choice(events[-50:])))
+            continue
+        events.append({
+            "server_id": f"synthetic-{rng.randrange(args.servers)}",
+            "user_ip": f"10.0.{rng.randrange(args.clients) // 256}.{rng.randrange(256)}",
+            "user_agent": rng.choices(USER_AGENTS, weights=[30, 25, 25, 10, 4, 3, 2, 1])[0],
+            "click_type": rng.choice(["affiliate", "official", "details"]),
+        })
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--servers", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=20000)
+    parser.add_argument("--repeat-rate", type=float, default=0.1, help="share of events repeating a recent click")
+    parser.add_argument("--window", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    events = make_events(args)
+    click_filter = ClickFilter(DedupWindow(window=args.window), BotClassifier())
+    start = time.perf_counter()
+    for event in events:
+        click_filter.check(event)
+    elapsed = time.perf_counter() - start
+
+    stats = click_filter.stats()
+    print(f"{len(events)} events, {elapsed / len(events) * 1e6:.2f} us/event")
+    print(f"suppressed: {stats['suppressed_duplicates']} duplicates, {stats['suppressed_bots']} bots, "
+          f"{stats['dedup_keys']} keys in window")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Click ingestion throughput: per-click insert_one vs. the batched queue.
+
+Usage:
+    python benchmarks/bench_clicks.py --clicks 20000 --concurrency 200
+    python benchmarks/bench_clicks.py --mongo      # write to MONGO_URL instead
+
+By default writes go to a stand-in collection that sleeps `--write-latency-ms`
+per round-trip over a `--pool-size` connection pool, which is what dominates the per-click path in production.
+With --mongo the events are written to `<DB_NAME>_bench.click_tracking`.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from click_ingest import ClickIngestQueue
+
+
+class SimulatedCollection:
+    """Collection stand-in with a fixed round-trip latency and a bounded connection pool"""
+
+    def __init__(self, latency, pool_size):
+        self.latency = latency
+        self.pool = asyncio.Semaphore(pool_size)
+        self.count = 0
+
+    async def insert_one(self, doc):
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        self.count += 1
+
+    async def insert_many(self, docs, ordered=True):
+        async with self.pool:
+            await asyncio.sleep(self.latency)
+        self.count += len(docs)
+
+    async def drop(self):
+        pass
+
+
+def make_click(i):
+    return {
+        "id": str(uuid.uuid4()),
+        "server_id": str(i % 8 + 1),
+        "user_ip": "127.0.0.1",
+        "user_agent": "bench",
+        "referrer": None,
+        "click_type": "affiliate",
+        "timestamp": datetime.utcnow(),
+    }
+
+
+async def drive(handler, clicks, concurrency):
+    """Run `clicks` handler calls from `concurrency` workers; return per-call latencies"""
+    latencies = []
+    counter = iter(range(clicks))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            await handler(make_click(i))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, elapsed, latencies, extra=""):
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<10} {len(latencies) / elapsed:>12.0f} {statistics.median(latencies) * 1000:>10.3f} {p99 * 1000:>10.3f}  {extra}")
+
+
+async def run(args):
+    if args.mongo:
+        from dotenv import load_dotenv
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", ".env"))
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        collection = client[os.environ["DB_NAME"] + "_bench"].click_tracking
+    else:
+        collection = SimulatedCollection(args.write_latency_ms / 1000, args.pool_size)
+
+    print(f"{'path':<10} {'clicks/sec':>12} {'p50 ms':>10} {'p99 ms':>10}")
+
+    await collection.drop()
+    elapsed, latencies = await drive(collection.insert_one, args.clicks, args.concurrency)
+    report("insert_one", elapsed, latencies)
+
+    await collection.drop()
+    queue = ClickIngestQueue(
+        lambda batch: collection.insert_many(batch, ordered=False),
+        max_batch=args.batch_size,
+        flush_interval=args.flush_interval,
+    )
+    queue.start()
+    elapsed, latencies = await drive(queue.put, args.clicks, args.concurrency)
+    await queue.stop()
+    stats = queue.stats()
+    report("queued", elapsed, latencies, f"batches={stats['batches']} avg_batch={stats['avg_batch_size']:.0f} dropped={stats['dropped']}")
+    print(f"{'':<10} all {stats['written']} events written; ack-to-durable lag <= {args.flush_interval * 1000:.0f} ms + one insert_many")
+
+    await collection.drop()
+    if args.mongo:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clicks", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--write-latency-ms", type=float, default=2.0)
+    parser.add_argument("--pool-size", type=int, default=10, help="simulated connections available for writes")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--flush-interval", type=float, default=0.25)
+    parser.add_argument("--mongo", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Bytes on the wire and CPU per request for each response encoding.
+
+Runs the app in-process (see load_suite.py), seeds --servers listings and
+requests a few large catalog responses with each installed encoding and
+with none. Every encoding is measured twice: "uncached" clears the
+compressed-body cache before each request, so every request pays for a
+cache miss; "cached" serves the bytes compressed by the first request.
+
+CPU is process time per request, app work included, so compare it with the
+identity row. With the mongomock stand-in the app work is large and noisy,
+so each encoding also reports the codec alone on the identity body at its
+dynamic (uncacheable responses) and static (cached responses) levels as
+`codec_ms`.
+
+Usage:
+    pip install mongomock-motor brotli zstandard    # brotli and zstandard are optional
+    python benchmarks/bench_compression.py --servers 2000 --repeat 50
+    python benchmarks/bench_compression.py --mongo    # uses MONGO_URL, database <DB_NAME>_bench
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+
+from load_suite import lifespan, load_app
+
+
+async def measure(client, path, params, encoding, repeat, clear):
+    sizes, cpu = [], []
+    for _ in range(repeat):
+        clear()
+        start = time.process_time()
+        # Raw chunks are not decoded by httpx, so the size is what went over the wire
+        async with client.stream("GET", path, params=params, headers={"Accept-Encoding": encoding}) as response:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        cpu.append(time.process_time() - start)
+        sizes.append(len(body))
+        served = response.headers.get("content-encoding", "identity")
+        if served != encoding:
+            raise RuntimeError(f"{path} asked for {encoding}, got {served}")
+    return {"bytes": sizes[-1], "cpu_ms": round(statistics.median(cpu) * 1000, 3)}, body
+
+
+def codec_cost(codec, body, repeat):
+    costs = {}
+    for label, level in (("dynamic", codec.dynamic_level), ("static", codec.static_level)):
+        start = time.process_time()
+        for _ in range(repeat):
+            compressed = codec.compress(body, level)
+        costs[label] = {"level": level, "bytes": len(compressed),
+                        "cpu_ms": round((time.process_time() - start) / repeat * 1000, 3)}
+    return costs
+
+
+async def run(args):
+    server = load_app(args)
+    from compression import available_codecs
+    from seed_data import generate_servers
+
+    db = server.db
+    await db.mcp_servers.drop()
+    servers = list(generate_servers(args.servers, seed=args.seed))
+    now = datetime.utcnow()
+    for i in range(0, len(servers), 1000):
+        await db.mcp_servers.insert_many([{**s, "created_at": now, "updated_at": now} for s in servers[i:i + 1000]])
+
+    targets = {
+        "list": ("/api/servers", {"limit": 100}),
+        "featured": ("/api/featured-servers", {}),
+        "detail": (f"/api/servers/{servers[0]['id']}", {}),
+    }
+    codecs = {codec.name: codec for codec in available_codecs()}
+    encodings = ["identity", *codecs]
+    results = {}
+    try:
+        async with lifespan(server.app):
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for name, (path, params) in targets.items():
+                    rows = results[name] = {}
+                    identity, body = await measure(client, path, params, "identity", args.repeat, lambda: None)
+                    rows["identity"] = {"uncached": identity}
+                    for encoding, codec in codecs.items():
+                        uncached, _ = await measure(
+                            client, path, params, encoding, args.repeat, server.compressed_cache.clear)
+                        await measure(client, path, params, encoding, 1, lambda: None)
+                        cached, _ = await measure(client, path, params, encoding, args.repeat, lambda: None)
+                        rows[encoding] = {"uncached": uncached, "cached": cached,
+                                          "codec_ms": codec_cost(codec, body, args.repeat)}
+                    for row in rows.values():
+                        for key in ("uncached", "cached"):
+                            sample = row.get(key)
+                            if sample is None:
+                                continue
+                            sample["ratio"] = round(identity["bytes"] / sample["bytes"], 2) if sample["bytes"] else None
+    finally:
+        if args.mongo:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            cleanup = AsyncIOMotorClient(os.environ["MONGO_URL"])
+            await cleanup.drop_database(os.environ["DB_NAME"])
+            cleanup.close()
+
+    return {
+        "config": {"backend": "mongod" if args.mongo else "mongomock", "servers": args.servers,
+                   "repeat": args.repeat, "encodings": encodings},
+        "results": results,
+        "cache": server.compressed_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50, help="requests per endpoint, encoding and mode")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of mongomock-motor")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
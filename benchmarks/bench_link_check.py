@@ -0,0 +1,255 @@
+"""Link checker throughput against local stub HTTP servers.
+
+Starts --hosts stub servers on consecutive ports in a child process (each
+port is a separate host to the per-host rate limiter), seeds listings whose
+URLs point at them with a mix of healthy, missing, slow, flaky (503 then 200), HEAD-rejecting
+and redirecting targets, and runs LinkChecker three times:
+
+1. cold: every URL is checked
+2. again: nothing is due, so the run only scans the catalog
+3. forced: every URL is re-checked with its ETag, so healthy ones answer 304
+
+For each run it reports URLs per second, retries, broken links, the most
+requests any one host received within a second (compare with --host-rate)
+and the worst event-loop stall seen by a 10 ms ticker running alongside, which
+shows whether the checker would hold up API requests sharing the loop.
+
+Usage:
+    pip install mongomock-motor
+    python benchmarks/bench_link_check.py --listings 2000
+    python benchmarks/bench_link_check.py --mongo --listings 34000   # ~100k URLs, MONGO_URL, <DB_NAME>_bench
+
+The mongomock stand-in has no indexes and runs on the event loop thread, so
+every listing update scans the collection: it dominates the run time and
+the loop stalls beyond a few thousand listings. Use --mongo for 100k URLs.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import httpx
+
+from link_health import LinkChecker
+
+# Share of URLs per stub behaviour
+KINDS = {"ok": 0.8, "missing": 0.05, "slow": 0.05, "flaky": 0.04, "nohead": 0.03, "redirect": 0.03}
+
+
+class StubServer:
+    """Minimal keep-alive HTTP/1.1 server whose behaviour is chosen by the path.
+
+    /ok/<n>        200 with an ETag; 304 when If-None-Match matches
+    /missing/<n>   404
+    /slow/<ms>/<n> 200 after <ms> milliseconds
+    /flaky/<n>     503 with Retry-After: 0 on the first request, then 200
+    /nohead/<n>    405 for HEAD, 200 for GET
+    /redirect/<n>  301 to /ok/<n>
+    /__stats       this port's requests by method and the most it received in any one second
+    /__reset       clears this port's counters
+    """
+
+    def __init__(self):
+        self.requests = defaultdict(Counter)
+        self.arrivals = defaultdict(list)
+        self._seen = set()
+        self._servers = []
+
+    async def start(self, ports):
+        for port in ports:
+            self._servers.append(await asyncio.start_server(
+                lambda reader, writer, port=port: self._serve(reader, writer, port), "127.0.0.1", port))
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+
+    async def _serve(self, reader, writer, port):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+                if path == "/__stats":
+                    status, extra, body = 200, [], json.dumps(self._stats(port)).encode()
+                elif path == "/__reset":
+                    self.requests.pop(port, None)
+                    self.arrivals.pop(port, None)
+                    status, extra, body = 200, [], b""
+                else:
+                    self.requests[port][method] += 1
+                    self.arrivals[port].append(time.monotonic())
+                    status, extra, body = await self._respond(method, path, headers)
+                response = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}", *extra, "", ""]
+                writer.write("\r\n".join(response).encode() + (body if method == "GET" else b""))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _stats(self, port):
+        times = sorted(self.arrivals[port])
+        peak = start = 0
+        for end, at in enumerate(times):
+            while at - times[start] >= 1.0:
+                start += 1
+            peak = max(peak, end - start + 1)
+        return {"requests": dict(self.requests[port]), "peak_per_second": peak}
+
+    async def _respond(self, method, path, headers):
+        kind, _, rest = path.strip("/").partition("/")
+        if kind == "ok":
+            etag = f'"{rest}-v1"'
+            if headers.get("if-none-match") == etag:
+                return 304, [f"ETag: {etag}"], b""
+            return 200, [f"ETag: {etag}"], b"ok"
+        if kind == "missing":
+            return 404, [], b"missing"
+        if kind == "slow":
+            await asyncio.sleep(int(rest.split("/")[0]) / 1000)
+            return 200, [], b"slow"
+        if kind == "flaky":
+            if path not in self._seen:
+                self._seen.add(path)
+                return 503, ["Retry-After: 0"], b"busy"
+            return 200, [], b"ok"
+        if kind == "nohead":
+            return (405, [], b"") if method == "HEAD" else (200, [], b"ok")
+        if kind == "redirect":
+            return 301, [f"Location: /ok/{rest}"], b""
+        return 404, [], b""
+
+
+def serve_forever(ports, ready):
+    async def main():
+        await StubServer().start(ports)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def start_stub(ports):
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=serve_forever, args=(ports, ready), daemon=True)
+    process.start()
+    if not ready.wait(30):
+        sys.exit("stub servers did not start")
+    return process
+
+
+async def stub_stats(client, ports):
+    """Requests per method across all stub ports and the busiest second any one host saw"""
+    requests, peak = Counter(), 0
+    for port in ports:
+        stats = (await client.get(f"http://127.0.0.1:{port}/__stats")).json()
+        requests.update(stats["requests"])
+        peak = max(peak, stats["peak_per_second"])
+    return dict(requests), peak
+
+
+def make_listings(count, ports, rng):
+    kinds, weights = zip(*KINDS.items())
+
+    def url(n):
+        kind = rng.choices(kinds, weights)[0]
+        path = f"slow/{rng.randint(50, 300)}/{n}" if kind == "slow" else f"{kind}/{n}"
+        return f"http://127.0.0.1:{rng.choice(ports)}/{path}"
+
+    return [
+        {"id": str(i), "name": f"Listing {i}", "affiliate_url": url(f"a{i}"), "official_url": url(f"o{i}"),
+         "logo_url": url(f"l{i}")}
+        for i in range(count)
+    ]
+
+
+async def timed_run(checker, force):
+    stalls = []
+
+    async def ticker():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - start - 0.01)
+
+    task = asyncio.create_task(ticker())
+    try:
+        summary = await checker.run(force=force)
+    finally:
+        task.cancel()
+    stalls.sort()
+    summary["loop_stall_p99_ms"] = round(stalls[int(len(stalls) * 0.99)] * 1000, 1) if stalls else None
+    summary["loop_stall_max_ms"] = round(stalls[-1] * 1000, 1) if stalls else None
+    return summary
+
+
+async def run(args):
+    if args.mongo:
+        from dotenv import load_dotenv
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", ".env"))
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[(os.environ.get("DB_NAME") or "mcp_directory") + "_bench"]
+        await client.drop_database(db.name)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("mongomock-motor is not installed: pip install mongomock-motor, or pass --mongo")
+        client = AsyncMongoMockClient()
+        db = client.link_bench
+
+    rng = random.Random(args.seed)
+    ports = list(range(args.port, args.port + args.hosts))
+    stub = start_stub(ports)
+    control = httpx.AsyncClient()
+    try:
+        await db.mcp_servers.insert_many(make_listings(args.listings, ports, rng))
+        await db.link_checks.create_index("url", unique=True)
+        # The stubs listen on 127.0.0.1, which the checker refuses by default
+        checker = LinkChecker(db, concurrency=args.concurrency, host_rate=args.host_rate, timeout=5,
+                              retry_delay=0.05, allow_private=True)
+        report = {"config": vars(args), "runs": {}}
+        for name, force in (("cold", False), ("again", False), ("forced", True)):
+            for port in ports:
+                await control.get(f"http://127.0.0.1:{port}/__reset")
+            summary = await timed_run(checker, force)
+            summary["stub_requests"], summary["peak_host_rps"] = await stub_stats(control, ports)
+            summary.pop("started_at")
+            report["runs"][name] = summary
+        report["broken_listings"] = await db.mcp_servers.count_documents({"broken_links.0": {"$exists": True}})
+        return report
+    finally:
+        await control.aclose()
+        stub.terminate()
+        if args.mongo:
+            await client.drop_database(db.name)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=2000, help="three URLs each")
+    parser.add_argument("--hosts", type=int, default=50, help="stub servers, one port each")
+    parser.add_argument("--port", type=int, default=18100, help="first stub port")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--host-rate", type=float, default=200, help="requests per second per host")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of mongomock-motor")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Response size and encode cost of full vs. summary listing views.
+
+Usage:
+    python benchmarks/bench_payload.py --items 6 50 100
+"""
+import argparse
+import copy
+import gzip
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from models import MCPServer, MCPServerSummary
+from seed_data import sample_servers
+from serialization import ModelEncoder
+
+
+def make_docs(n):
+    docs = []
+    for i in range(n):
+        doc = copy.deepcopy(sample_servers[i % len(sample_servers)])
+        doc["id"] = f"bench-{i}"
+        doc["created_at"] = doc["updated_at"] = datetime.utcnow()
+        docs.append(doc)
+    return docs
+
+
+def encode_cost(encoder, docs, repeat):
+    projected = [{field: doc[field] for field in encoder.fields} for doc in docs]
+    start = time.process_time()
+    for _ in range(repeat):
+        encoder.encode_many(projected)
+    return (time.process_time() - start) / repeat, encoder.encode_many(projected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[6, 50, 100])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    views = {"full": ModelEncoder(MCPServer), "summary": ModelEncoder(MCPServerSummary)}
+    print(f"{'items':>6} {'view':<8} {'bytes':>9} {'gzip':>8} {'encode us':>10}")
+    for n in args.items:
+        docs = make_docs(n)
+        for view, encoder in views.items():
+            seconds, body = encode_cost(encoder, docs, args.repeat)
+            print(f"{n:>6} {view:<8} {len(body):>9} {len(gzip.compress(body)):>8} {seconds * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Ranking cost on a large catalog: RankingEngine vs. a Python sort.
+
+Builds a RankingEngine over synthetic listings with random click counts,
+then times a full re-score (what every write or click refresh costs the
+next request), top-k pages with and without filters, deep pages through the
+`[score, id]` cursor, and the equivalent `sorted()` over the listing dicts.
+
+Usage:
+    python benchmarks/bench_ranking.py --servers 1000000 --limit 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from ranking import RankingEngine
+from seed_data import generate_servers
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    print(f"{label:<22} p50 {statistics.median(samples) * 1000:>9.2f} ms   max {samples[-1] * 1000:>9.2f} ms")
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def python_rank(servers, clicks, engine):
+    """The same composite score computed per dict, then sorted"""
+    reviews = sum(s["total_reviews"] for s in servers)
+    mean = sum(s["rating"] * s["total_reviews"] for s in servers) / reviews
+    views = sum(v for v, _ in clicks.values())
+    base = sum(c for _, c in clicks.values()) / views if views else 0.0
+    weights = engine.weights
+
+    def score(s):
+        v, c = clicks.get(s["id"], (0, 0))
+        rating = (engine.prior_reviews * mean + s["rating"] * s["total_reviews"]) / (engine.prior_reviews + s["total_reviews"])
+        ctr = (c + engine.prior_views * base) / (v + engine.prior_views) - base
+        return (weights["sponsored"] * s["is_sponsored"] + weights["featured"] * s["is_featured"]
+                + weights["bayesian_rating"] * rating + weights["ctr"] * ctr)
+
+    return sorted(servers, key=lambda s: (-score(s), s["id"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=1000000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    servers = list(generate_servers(args.servers, seed=args.seed))
+    clicks = {}
+    for server in rng.sample(servers, len(servers) // 10):
+        views = rng.randint(1, 500)
+        clicks[server["id"]] = (views, rng.randint(0, views))
+
+    engine = RankingEngine()
+    start = time.perf_counter()
+    engine.build(servers)
+    engine.set_clicks(clicks)
+    print(f"built {len(engine)} listings in {time.perf_counter() - start:.2f}s")
+
+    def rescore():
+        engine.set_clicks(clicks)
+        engine.scores()
+
+    report("clicks + re-score", timed(rescore, args.repeat))
+    report("top-k", timed(lambda: engine.top(args.limit), args.repeat))
+    category = servers[0]["category"]
+    report("top-k (category)", timed(lambda: engine.top(args.limit, category=category), args.repeat))
+    report("top-k (featured)", timed(lambda: engine.top(args.limit, featured_only=True), args.repeat))
+
+    after = None
+    pages = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        hits = engine.top(args.limit, after=after)
+        pages.append(time.perf_counter() - start)
+        after = [hits[-1][1], hits[-1][0]]
+    report("next page (cursor)", pages)
+
+    samples = timed(lambda: python_rank(servers, clicks, engine), max(1, args.repeat // 10))
+    report("python score+sort", samples)
+    ranked = [server["id"] for server in python_rank(servers, clicks, engine)[:args.limit]]
+    print("same order:", ranked == [server_id for server_id, _ in engine.top(args.limit)])
+    print(engine.stats())
+
+
+if __name__ == "__main__":
+    main()
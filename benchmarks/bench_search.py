@@ -0,0 +1,116 @@
+"""Search latency benchmark: in-memory index vs. the $regex collection scan.
+
+Usage:
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+    python benchmarks/bench_search.py --mongo   # also time real $regex queries
+
+Without --mongo the regex path is measured in-process (same regex over the same
+fields for every document), which is a lower bound for what mongod does on a
+COLLSCAN. With --mongo the synthetic catalog is loaded into `<DB_NAME>_bench`
+and the query `get_servers` issues today is timed against it.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from search import SearchIndex
+from seed_data import generate_servers
+
+QUERIES = ["seo", "content", "social media", "keyword research", "analy", "auto", "email camp", "competitor"]
+LIMIT = 50
+
+
+def synthetic_catalog(n, seed=42):
+    return list(generate_servers(n, seed=seed))
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+
+def regex_scan(servers, term):
+    pattern = re.compile(term, re.IGNORECASE)
+    hits = [
+        s for s in servers
+        if pattern.search(s["name"]) or pattern.search(s["description"]) or any(pattern.search(f) for f in s["features"])
+    ]
+    hits.sort(key=lambda s: (not s["is_sponsored"], not s["is_featured"], -s["rating"]))
+    return hits[:LIMIT]
+
+
+def time_calls(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        for term in QUERIES:
+            start = time.perf_counter()
+            fn(term)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def mongo_regex(servers, repeat):
+    from pymongo import MongoClient
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", ".env"))
+    client = MongoClient(os.environ["MONGO_URL"])
+    collection = client[os.environ["DB_NAME"] + "_bench"].mcp_servers
+    collection.drop()
+    for start in range(0, len(servers), 10000):
+        collection.insert_many([dict(s) for s in servers[start:start + 10000]])
+
+    def query(term):
+        cursor = collection.find({"$or": [
+            {"name": {"$regex": term, "$options": "i"}},
+            {"description": {"$regex": term, "$options": "i"}},
+            {"features": {"$regex": term, "$options": "i"}},
+        ]}).sort([("is_sponsored", -1), ("is_featured", -1), ("rating", -1)]).limit(LIMIT)
+        list(cursor)
+
+    try:
+        return time_calls(query, repeat)
+    finally:
+        collection.drop()
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the query set per size")
+    parser.add_argument("--mongo", action="store_true", help="time $regex against MONGO_URL as well")
+    args = parser.parse_args()
+
+    print(f"{'listings':>10} {'path':<14} {'p50 ms':>10} {'p99 ms':>10}")
+    for size in args.sizes:
+        servers = synthetic_catalog(size)
+
+        start = time.perf_counter()
+        index = SearchIndex()
+        index.build(servers)
+        build_s = time.perf_counter() - start
+
+        results = {
+            "index": time_calls(lambda term: index.search(term, limit=LIMIT), args.repeat),
+            "index+rel": time_calls(lambda term: index.search(term, relevance=True, limit=LIMIT), args.repeat),
+            "regex(py)": time_calls(lambda term: regex_scan(servers, term), max(1, args.repeat // 5)),
+        }
+        if args.mongo:
+            results["regex(mongo)"] = mongo_regex(servers, args.repeat)
+
+        for path, stats in results.items():
+            print(f"{size:>10} {path:<14} {stats['p50_ms']:>10.2f} {stats['p99_ms']:>10.2f}")
+        print(f"{size:>10} {'index build':<14} {build_s * 1000:>10.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
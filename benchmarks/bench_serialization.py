@@ -0,0 +1,108 @@
+"""Per-request CPU cost of encoding a 100-listing response.
+
+Compares the previous read path (construct MCPServer per document, then let
+FastAPI validate and serialize the response_model again) with the
+ModelEncoder path (projected documents straight to orjson bytes). Both run
+as real FastAPI routes driven over ASGI in-process, with no database, so the
+difference is pure CPU.
+
+Usage:
+    python benchmarks/bench_serialization.py --items 100 --requests 2000
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import List
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from fastapi import FastAPI
+
+from models import MCPServer
+from seed_data import sample_servers
+from serialization import JSONBytesResponse, ModelEncoder
+
+
+def make_docs(n):
+    docs = []
+    for i in range(n):
+        doc = copy.deepcopy(sample_servers[i % len(sample_servers)])
+        doc["id"] = f"bench-{i}"
+        doc["created_at"] = doc["updated_at"] = datetime.utcnow()
+        docs.append(doc)
+    return docs
+
+
+def build_app(docs):
+    app = FastAPI()
+    encoder = ModelEncoder(MCPServer)
+
+    @app.get("/before", response_model=List[MCPServer])
+    async def before():
+        return [MCPServer(**server) for server in docs]
+
+    @app.get("/after", response_model=List[MCPServer])
+    async def after():
+        return JSONBytesResponse(encoder.encode_many(docs))
+
+    return app
+
+
+async def call(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def measure(app, path, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.process_time()
+        await call(app, path)
+        samples.append(time.process_time() - start)
+    return samples
+
+
+async def run(args):
+    docs = make_docs(args.items)
+    app = build_app(docs)
+    before, after = await call(app, "/before"), await call(app, "/after")
+    assert json.loads(before) == json.loads(after), "response bodies differ"
+
+    print(f"{args.items} items/response, {len(after)} bytes")
+    print(f"{'path':<8} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for path in ("/before", "/after"):
+        await measure(app, path, 20)  # warm up
+        samples = sorted(await measure(app, path, args.requests))
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"{path:<8} {statistics.mean(samples) * 1000:>10.3f} {statistics.median(samples) * 1000:>10.3f} {p99 * 1000:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
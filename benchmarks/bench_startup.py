@@ -0,0 +1,196 @@
+"""Cold-start cost of the API: import time and time to first request.
+
+Every sample is a fresh interpreter, so nothing is cached in-process:
+
+- import: `python -X importtime -c "import server"` with no MONGO_URL set,
+  reporting the total and the heaviest modules server.py pulls in
+- first request: a child process imports the app (see load_suite.py),
+  seeds --servers listings, runs startup and times the first and second
+  GET /api/servers?limit=20, once without and once with warmup
+  (WARMUP_PATHS, see backend/warmup.py)
+
+Medians over --repeat runs are written as JSON, which can be stored as a
+baseline and compared like load_suite.py reports to track cold starts over
+time.
+
+Usage:
+    pip install mongomock-motor
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+    python benchmarks/bench_startup.py --save-baseline benchmarks/startup_baseline.json
+    python benchmarks/bench_startup.py --baseline benchmarks/startup_baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+FIRST_PATH = "/api/servers"
+WARMUP_PATHS = "/api/homepage,/api/featured-servers,/api/sponsored-servers,/api/categories,/api/servers?limit=20"
+
+
+def parse_importtime(stderr):
+    """`(module, self_us, cumulative_us, depth)` per line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure_import(top):
+    env = {key: value for key, value in os.environ.items() if key not in ("MONGO_URL", "DB_NAME")}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"],
+                            cwd=BACKEND, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode:
+        sys.exit(f"import server failed:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    index = next(i for i, row in enumerate(rows) if row[0] == "server")
+    server = rows[index]
+    # Children are printed before their parent, after the previous module at the parent's depth
+    first = max((i for i, row in enumerate(rows[:index]) if row[3] <= server[3]), default=-1) + 1
+    direct = sorted((row for row in rows[first:index] if row[3] == server[3] + 1), key=lambda row: -row[2])
+    return {
+        "process_s": round(wall, 3),
+        "server_import_s": round(server[2] / 1e6, 3),
+        "heaviest": {name: round(cumulative / 1e6, 4) for name, _, cumulative, _ in direct[:top]},
+    }
+
+
+def measure_first_request(args, warmup):
+    env = dict(os.environ, BENCH_SPAWNED_AT=repr(time.time()))
+    env.pop("WARMUP_PATHS", None)
+    if warmup:
+        env["WARMUP_PATHS"] = WARMUP_PATHS
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--servers", str(args.servers)]
+    if args.mongo:
+        command.append("--mongo")
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(f"first-request child failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+async def child(args):
+    """Runs in the spawned process: import, seed, start up and time the first two requests"""
+    interpreter = time.time() - float(os.environ["BENCH_SPAWNED_AT"])
+    start = time.perf_counter()
+    from load_suite import lifespan, load_app
+    server = load_app(args)
+    imported = time.perf_counter() - start
+
+    import httpx
+    from seed_data import generate_servers
+
+    db = server.db
+    await db.mcp_servers.drop()
+    now = datetime.utcnow()
+    servers = list(generate_servers(args.servers, seed=42))
+    for i in range(0, len(servers), 1000):
+        await db.mcp_servers.insert_many([{**s, "created_at": now, "updated_at": now} for s in servers[i:i + 1000]])
+
+    timings = {"interpreter_s": interpreter, "import_s": imported}
+    try:
+        start = time.perf_counter()
+        async with lifespan(server.app):
+            timings["startup_s"] = time.perf_counter() - start
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name in ("first_request_s", "second_request_s"):
+                    start = time.perf_counter()
+                    response = await client.get(FIRST_PATH, params={"limit": 20}, headers={"Accept-Encoding": "gzip"})
+                    response.raise_for_status()
+                    timings[name] = time.perf_counter() - start
+    finally:
+        if args.mongo:
+            await server.mongo.client("write").drop_database(os.environ["DB_NAME"])
+    timings["ready_s"] = timings["interpreter_s"] + timings["import_s"] + timings["startup_s"]
+    print(json.dumps({name: round(value, 4) for name, value in timings.items()}))
+
+
+def median_of(samples):
+    return {key: round(statistics.median(sample[key] for sample in samples), 4) for key in samples[0]}
+
+
+def run(args):
+    imports = [measure_import(args.top) for _ in range(args.repeat)]
+    report = {
+        "config": {"backend": "mongod" if args.mongo else "mongomock", "servers": args.servers, "repeat": args.repeat},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "started_at": datetime.utcnow().isoformat(),
+        "import": {
+            "process_s": round(statistics.median(sample["process_s"] for sample in imports), 3),
+            "server_import_s": round(statistics.median(sample["server_import_s"] for sample in imports), 3),
+            "heaviest": imports[len(imports) // 2]["heaviest"],
+        },
+    }
+    for label, warmup in (("cold", False), ("warmup", True)):
+        report[label] = median_of([measure_first_request(args, warmup) for _ in range(args.repeat)])
+    return report
+
+
+def compare(report, baseline, threshold):
+    """List timings that rose by more than `threshold` (a fraction) over the baseline"""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        print("warning: baseline was recorded with different options", file=sys.stderr)
+    checks = [("import", "server_import_s")] + [
+        (label, key) for label in ("cold", "warmup") for key in ("ready_s", "first_request_s")]
+    for section, key in checks:
+        before, current = baseline.get(section, {}).get(key), report[section][key]
+        if before and current > before * (1 + threshold):
+            regressions.append(f"{section}.{key}: {before} s -> {current} s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=2000, help="synthetic listings to seed")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports to list")
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of mongomock-motor")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report and exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression, default 0.2")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as the baseline")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args))
+        return 0
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as out:
+            out.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            regressions = compare(report, json.load(stream), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
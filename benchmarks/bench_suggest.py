@@ -0,0 +1,94 @@
+"""Typeahead lookup latency on a large catalog.
+
+Builds a SuggestIndex over synthetic listings, then times lookups for
+prefixes of 1-6 characters taken from real keys, both on a cold cache and
+after warm-up, plus single incremental updates and a bulk batch of changes
+applied back to back, as a catalog sync or bulk import does.
+
+Usage:
+    python benchmarks/bench_suggest.py                      # 1M listings, ~3 GB
+    python benchmarks/bench_suggest.py --servers 150000 --lookups 20000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from seed_data import generate_servers
+from suggest import SuggestIndex
+
+INDEXED_FIELDS = ("id", "name", "features", "category", "rating", "is_sponsored", "is_featured")
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    print(f"{label:<18} p50 {statistics.median(samples) * 1e6:>8.1f} us   p99 {percentile(samples, 0.99) * 1e6:>8.1f} us"
+          f"   max {samples[-1] * 1e6:>9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=1000000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000, help="changes in the bulk batch")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Keep only what the index reads, so a million listings fit in memory
+    servers = [{field: server.get(field) for field in INDEXED_FIELDS}
+               for server in generate_servers(args.servers, seed=args.seed)]
+    index = SuggestIndex()
+    start = time.perf_counter()
+    index.build(servers)
+    print(f"built {len(index)} keys for {args.servers} servers in {time.perf_counter() - start:.2f}s")
+
+    rng = random.Random(args.seed)
+    keys = [key for key, _ in rng.sample(index._keys, min(5000, len(index)))]
+    prefixes = [key[:rng.randint(1, 6)] for key in keys for _ in range(args.lookups // len(keys) + 1)][:args.lookups]
+
+    for label in ("lookup (cold)", "lookup (warm)"):
+        samples = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.suggest(prefix)
+            samples.append(time.perf_counter() - start)
+        report(label, samples)
+
+    samples = []
+    for server in rng.sample(servers, args.updates):
+        server = dict(server, rating=round(rng.uniform(1, 5), 1))
+        start = time.perf_counter()
+        index.add(server)
+        samples.append(time.perf_counter() - start)
+    report("update", samples)
+
+    batch = rng.sample(servers, args.batch)
+    start = time.perf_counter()
+    for i, server in enumerate(batch):
+        if i % 10 == 0:
+            index.remove(server["id"])
+        else:
+            index.add(dict(server, rating=round(rng.uniform(1, 5), 1)))
+    elapsed = time.perf_counter() - start
+    print(f"{'bulk batch':<18} {args.batch} changes in {elapsed * 1000:.1f} ms ({elapsed / args.batch * 1e6:.1f} us each)")
+
+    samples = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix)
+        samples.append(time.perf_counter() - start)
+    report("lookup (after)", samples)
+    print(index.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Mixed-workload load test of the full API, run in-process.
+
+Starts the FastAPI app (startup and shutdown events included) against an
+in-memory mongomock-motor stand-in, or a real mongod with --mongo. Seeds a
+synthetic catalog, then drives a weighted mix of list, search, detail,
+track-click and stats requests over ASGI at a fixed concurrency. Throughput
+and p50/p95/p99 latency per operation are written as JSON and can be
+checked against a stored baseline.
+
+Usage:
+    pip install mongomock-motor
+    python benchmarks/load_suite.py --servers 5000 --requests 20000 --concurrency 50 --output run.json
+    python benchmarks/load_suite.py --save-baseline benchmarks/baseline.json
+    python benchmarks/load_suite.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/load_suite.py --mongo    # uses MONGO_URL, database <DB_NAME>_bench
+
+The client runs on the same event loop as the app, so latencies include
+client-side overhead and absolute numbers are only comparable between runs
+on the same machine with the same options. With the stand-in, database time
+is in-memory CPU rather than network round-trips.
+
+Exits 1 when any operation's p95 latency rises, or its throughput falls, by
+more than --threshold relative to the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from urllib.parse import urlencode
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+DEFAULT_MIX = "list=35,search=25,detail=20,click=15,stats=5"
+
+
+def load_app(args):
+    """Import the server module against the chosen database"""
+    os.environ["DB_NAME"] = (os.environ.get("DB_NAME") or "mcp_directory") + "_bench"
+    if not args.mongo:
+        try:
+            import mongomock
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("mongomock-motor is not installed: pip install mongomock-motor, or pass --mongo")
+        import motor.motor_asyncio
+        # The reader and writer pools must share one in-memory store
+        store = mongomock.MongoClient()
+        motor.motor_asyncio.AsyncIOMotorClient = lambda *args, **kwargs: AsyncMongoMockClient(mock_mongo_client=store)
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    import server
+    return server
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Run the app's ASGI lifespan: startup on entry, shutdown on exit"""
+    inbox = asyncio.Queue()
+    replies = asyncio.Queue()
+
+    async def send(message):
+        await replies.put(message)
+
+    async def event(name):
+        await inbox.put({"type": f"lifespan.{name}"})
+        reply = await replies.get()
+        if reply["type"].endswith("failed"):
+            raise RuntimeError(f"lifespan {name} failed: {reply.get('message')}")
+
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, inbox.get, send))
+    await event("startup")
+    try:
+        yield
+    finally:
+        await event("shutdown")
+        await task
+
+
+async def call(app, method, path, params=None, body=None, headers=None):
+    """Issue one request over ASGI; returns the status code"""
+    payload = json.dumps(body).encode() if body is not None else b""
+    headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    if body is not None:
+        headers.append((b"content-type", b"application/json"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(), "root_path": "", "headers": headers,
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = []
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+class Workload:
+    """Generates weighted, reproducible requests against the seeded catalog"""
+
+    def __init__(self, servers, mix, seed):
+        self.rng = random.Random(seed)
+        self.ids = [server["id"] for server in servers]
+        self.categories = sorted({server["category"] for server in servers})
+        self.terms = sorted({word.lower() for server in servers[:200] for word in server["name"].split() if word.isalpha()})
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+
+    def next(self):
+        name = self.rng.choices(self.operations, self.weights)[0]
+        return (name, *getattr(self, name)())
+
+    def list(self):
+        params = {"limit": 20}
+        if self.rng.random() < 0.5:
+            params["category"] = self.rng.choice(self.categories)
+        return "GET", "/api/servers", params, None, None
+
+    def search(self):
+        term = self.rng.choice(self.terms)
+        if self.rng.random() < 0.3:
+            term = term[:max(2, len(term) - 2)]  # prefix, as typed
+        return "GET", "/api/servers", {"search": term, "limit": 20}, None, None
+
+    def detail(self):
+        return "GET", f"/api/servers/{self.rng.choice(self.ids)}", None, None, None
+
+    def click(self):
+        ip = f"10.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}"
+        user_agent = "Mozilla/5.0 (X11; Linux x86_64) load-suite"
+        body = {
+            "server_id": self.rng.choice(self.ids),
+            "click_type": self.rng.choice(["affiliate", "official", "details"]),
+            "user_ip": ip,
+            "user_agent": user_agent,
+        }
+        # Distinct client addresses, so the click dedup window doesn't suppress the load
+        return "POST", "/api/track-click", None, body, {"X-Forwarded-For": ip, "User-Agent": user_agent}
+
+    def stats(self):
+        return "GET", f"/api/stats/{self.rng.choice(self.ids)}", None, None, None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("list", "search", "detail", "click", "stats"):
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of sorted samples"""
+    return samples[min(len(samples) - 1, max(0, int(round(q * len(samples) + 0.5)) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+async def drive(app, workload, requests, concurrency):
+    latencies = {name: [] for name in workload.operations}
+    errors = dict.fromkeys(workload.operations, 0)
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            name, method, path, params, body, headers = workload.next()
+            start = time.perf_counter()
+            status = await call(app, method, path, params, body, headers)
+            latencies[name].append(time.perf_counter() - start)
+            if status >= 400:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    operations = {name: summarize(samples, errors[name], elapsed) for name, samples in latencies.items() if samples}
+    overall = summarize([s for samples in latencies.values() for s in samples], sum(errors.values()), elapsed)
+    return operations, overall, elapsed
+
+
+async def run(args):
+    server = load_app(args)
+    from seed_data import generate_servers
+
+    db = server.db
+    await db.mcp_servers.drop()
+    await db.click_tracking.drop()
+    await db.click_rollups.drop()
+    servers = list(generate_servers(args.servers, seed=args.seed))
+    now = datetime.utcnow()
+    for i in range(0, len(servers), 1000):
+        await db.mcp_servers.insert_many([{**s, "created_at": now, "updated_at": now} for s in servers[i:i + 1000]])
+
+    try:
+        async with lifespan(server.app):
+            await drive(server.app, Workload(servers, args.mix, args.seed + 1), args.warmup, args.concurrency)
+            operations, overall, elapsed = await drive(
+                server.app, Workload(servers, args.mix, args.seed), args.requests, args.concurrency)
+    finally:
+        if args.mongo:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            cleanup = AsyncIOMotorClient(os.environ["MONGO_URL"])
+            await cleanup.drop_database(os.environ["DB_NAME"])
+            cleanup.close()
+
+    return {
+        "config": {
+            "backend": "mongod" if args.mongo else "mongomock",
+            "servers": args.servers,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "seed": args.seed,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "started_at": now.isoformat(),
+        "elapsed_s": round(elapsed, 3),
+        "overall": overall,
+        "operations": operations,
+    }
+
+
+def compare(report, baseline, threshold):
+    """List regressions of p95 latency or throughput beyond `threshold` (a fraction)"""
+    regressions = []
+    if report["config"] != baseline["config"]:
+        print("warning: baseline was recorded with different options", file=sys.stderr)
+    for name, current in {"overall": report["overall"], **report["operations"]}.items():
+        before = baseline["overall"] if name == "overall" else baseline["operations"].get(name)
+        if not before:
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {current['p95_ms']} ms")
+        if current["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", type=int, default=2000, help="synthetic listings to seed")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"operation weights, default {DEFAULT_MIX}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo", action="store_true", help="run against MONGO_URL instead of mongomock-motor")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this report and exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression, default 0.2")
+    parser.add_argument("--save-baseline", metavar="PATH", help="also store this run as the baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as out:
+            out.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as stream:
+            regressions = compare(report, json.load(stream), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} of {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Cross-worker cache coherence and throughput scaling against a real mongod.
+
+Starts N API workers on a seeded database <DB_NAME>_workers. Each worker is
+a separate uvicorn process on its own port so it can be addressed
+individually; `uvicorn server:app --workers N` shares one port but keeps
+the same per-process state. Then:
+
+1. Convergence: updates a listing through one worker, round-robin, and
+   polls every worker until its detail endpoint, search index and catalog
+   revision reflect the write. Exits 1 if any worker has not converged
+   within --max-lag seconds.
+2. Scaling: drives a read mix (list, detail, search, featured) against one
+   worker, then all N, from --client-procs load generator processes, and
+   reports requests per second and the speed-up. Leave spare cores for the
+   clients, or they become the bottleneck.
+
+Usage:
+    python benchmarks/multi_worker.py --workers 4 --servers 20000 --duration 10 --output workers.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.append(str(BACKEND_DIR))
+
+import httpx
+
+from seed_data import generate_servers
+
+
+def seed(mongo_url, db_name, count, seed_value):
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_url)
+    client.drop_database(db_name)
+    servers = list(generate_servers(count, seed=seed_value))
+    now = datetime.utcnow()
+    for i in range(0, len(servers), 1000):
+        client[db_name].mcp_servers.insert_many([{**s, "created_at": now, "updated_at": now} for s in servers[i:i + 1000]])
+    client.close()
+    return servers
+
+
+def start_workers(ports, env):
+    return [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env,
+        )
+        for port in ports
+    ]
+
+
+def wait_ready(ports, timeout=300):
+    deadline = time.monotonic() + timeout
+    for port in ports:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/api/catalog/stats").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                sys.exit(f"worker on port {port} did not start within {timeout}s")
+            time.sleep(0.2)
+
+
+def converged(client, port, server_id, name, token):
+    base = f"http://127.0.0.1:{port}/api"
+    detail = client.get(f"{base}/servers/{server_id}")
+    if detail.status_code != 200 or detail.json()["name"] != name:
+        return False
+    hits = client.get(f"{base}/servers", params={"search": token, "limit": 5}).json()
+    return any(hit["id"] == server_id for hit in hits)
+
+
+def check_convergence(ports, servers, rounds, max_lag, rng):
+    lags, unconverged = [], 0
+    with httpx.Client(timeout=10) as client:
+        for i in range(rounds):
+            writer = ports[i % len(ports)]
+            server_id = rng.choice(servers)["id"]
+            current = client.get(f"http://127.0.0.1:{writer}/api/servers/{server_id}").json()
+            token = f"coherence{i}q{rng.randrange(10 ** 9)}"
+            name = f"{current['name']} {token}"
+            body = {field: value for field, value in current.items() if field not in ("id", "created_at", "updated_at")}
+            start = time.perf_counter()
+            client.put(f"http://127.0.0.1:{writer}/api/servers/{server_id}", json={**body, "name": name}).raise_for_status()
+            pending = set(ports)
+            while pending and time.perf_counter() - start < max_lag:
+                for port in sorted(pending):
+                    if converged(client, port, server_id, name, token):
+                        pending.discard(port)
+                        lags.append(time.perf_counter() - start)
+                time.sleep(0.005)
+            unconverged += len(pending)
+        revisions = {client.get(f"http://127.0.0.1:{port}/api/catalog/stats").json()["revision"] for port in ports}
+    lags.sort()
+    return {
+        "writes": rounds,
+        "unconverged": unconverged,
+        "same_revision": len(revisions) == 1,
+        "p50_lag_ms": round(lags[len(lags) // 2] * 1000, 1) if lags else None,
+        "max_lag_ms": round(lags[-1] * 1000, 1) if lags else None,
+    }
+
+
+async def _drive(ports, duration, concurrency, ids, words, seed_value):
+    rng = random.Random(seed_value)
+    done = errors = 0
+    deadline = time.perf_counter() + duration
+
+    def request():
+        port = rng.choice(ports)
+        op = rng.random()
+        if op < 0.4:
+            return f"http://127.0.0.1:{port}/api/servers/{rng.choice(ids)}", None
+        if op < 0.7:
+            return f"http://127.0.0.1:{port}/api/servers", {"limit": 20, "view": "summary"}
+        if op < 0.9:
+            return f"http://127.0.0.1:{port}/api/servers", {"search": rng.choice(words), "limit": 20}
+        return f"http://127.0.0.1:{port}/api/featured-servers", None
+
+    async def worker(client):
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            url, params = request()
+            try:
+                response = await client.get(url, params=params)
+                errors += response.status_code >= 400
+            except httpx.TransportError:
+                errors += 1
+            done += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return done, errors
+
+
+def _client_process(job):
+    return asyncio.run(_drive(*job))
+
+
+def measure_throughput(ports, args, servers, rng):
+    ids = [server["id"] for server in rng.sample(servers, min(2000, len(servers)))]
+    words = sorted({word.lower() for server in servers[:500] for word in server["name"].split() if word.isalpha()})
+    jobs = [(ports, args.duration, args.concurrency, ids, words, args.seed + i) for i in range(args.client_procs)]
+    with multiprocessing.Pool(args.client_procs) as pool:
+        results = pool.map(_client_process, jobs)
+    done = sum(count for count, _ in results)
+    return {"workers": len(ports), "requests": done, "errors": sum(e for _, e in results),
+            "throughput_rps": round(done / args.duration, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=max(2, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--servers", type=int, default=20000, help="synthetic listings to seed")
+    parser.add_argument("--port", type=int, default=8100, help="first worker port")
+    parser.add_argument("--writes", type=int, default=20, help="convergence rounds")
+    parser.add_argument("--max-lag", type=float, default=5.0, help="seconds every worker has to converge")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per throughput run")
+    parser.add_argument("--client-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(BACKEND_DIR / ".env")
+    env = dict(os.environ, DB_NAME=(os.environ.get("DB_NAME") or "mcp_directory") + "_workers")
+    rng = random.Random(args.seed)
+    servers = seed(env["MONGO_URL"], env["DB_NAME"], args.servers, args.seed)
+
+    ports = list(range(args.port, args.port + args.workers))
+    processes = start_workers(ports, env)
+    try:
+        wait_ready(ports)
+        convergence = check_convergence(ports, servers, args.writes, args.max_lag, rng)
+        single = measure_throughput(ports[:1], args, servers, rng)
+        multi = measure_throughput(ports, args, servers, rng)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        from pymongo import MongoClient
+        MongoClient(env["MONGO_URL"]).drop_database(env["DB_NAME"])
+
+    report = {
+        "config": {"workers": args.workers, "servers": args.servers, "client_procs": args.client_procs,
+                   "concurrency": args.concurrency, "duration_s": args.duration},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "convergence": convergence,
+        "throughput": [single, multi],
+        "speedup": round(multi["throughput_rps"] / single["throughput_rps"], 2) if single["throughput_rps"] else None,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+    return 1 if convergence["unconverged"] or not convergence["same_revision"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
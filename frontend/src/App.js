@@ -10,29 +10,22 @@ const API = `${BACKEND_URL}/api`;
 const Homepage = () => {
   const [featuredServers, setFeaturedServers] = useState([]);
   const [sponsoredServers, setSponsoredServers] = useState([]);
+  const [categoryCounts, setCategoryCounts] = useState({});
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchFeaturedServers();
-    fetchSponsoredServers();
+    fetchHomepage();
   }, []);
 
-  const fetchFeaturedServers = async () => {
+  const fetchHomepage = async () => {
     try {
-      const response = await axios.get(`${API}/featured-servers`);
-      setFeaturedServers(response.data);
-    } catch (error) {
-      console.error('Error fetching featured servers:', error);
-    }
-  };
-
-  const fetchSponsoredServers = async () => {
-    try {
-      const response = await axios.get(`${API}/sponsored-servers`);
-      setSponsoredServers(response.data);
+      const response = await axios.get(`${API}/homepage`);
+      setFeaturedServers(response.data.featured);
+      setSponsoredServers(response.data.sponsored);
+      setCategoryCounts(Object.fromEntries(response.data.categories.map((category) => [category.value, category.count])));
       setLoading(false);
     } catch (error) {
-      console.error('Error fetching sponsored servers:', error);
+      console.error('Error fetching homepage:', error);
       setLoading(false);
     }
   };
@@ -243,6 +236,9 @@ const Homepage = () => {
                 <div className="text-3xl mb-3">{category.icon}</div>
                 <h3 className="text-lg font-semibold text-gray-900 mb-2">{category.name}</h3>
                 <p className="text-gray-600 text-sm">{category.description}</p>
+                {categoryCounts[category.name] !== undefined && (
+                  <p className="text-gray-500 text-xs mt-2">{categoryCounts[category.name]} servers</p>
+                )}
               </div>
             ))}
           </div>
@@ -293,9 +289,14 @@ const Homepage = () => {
   );
 };
 
+// Filter option label with the number of servers it would match
+const withCount = (label, counts) => (counts ? `${label} (${counts[label] || 0})` : label);
+
 // Directory/Browse Page Component
 const DirectoryPage = () => {
   const [servers, setServers] = useState([]);
+  const [facets, setFacets] = useState(null);
+  const [suggestions, setSuggestions] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filters, setFilters] = useState({
     category: '',
@@ -313,9 +314,12 @@ const DirectoryPage = () => {
       if (filters.category) params.append('category', filters.category);
       if (filters.pricing_model) params.append('pricing_model', filters.pricing_model);
       if (filters.search) params.append('search', filters.search);
+      params.append('view', 'summary');
 
-      const response = await axios.get(`${API}/servers?${params}`);
-      setServers(response.data);
+      const response = await axios.get(`${API}/servers/facets?${params}`);
+      const { results, ...counts } = response.data;
+      setServers(results);
+      setFacets(counts);
       setLoading(false);
     } catch (error) {
       console.error('Error fetching servers:', error);
@@ -323,6 +327,19 @@ const DirectoryPage = () => {
     }
   };
 
+  const fetchSuggestions = async (text) => {
+    if (!text.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    try {
+      const response = await axios.get(`${API}/suggest`, { params: { q: text } });
+      setSuggestions(response.data);
+    } catch (error) {
+      console.error('Error fetching suggestions:', error);
+    }
+  };
+
   const trackClick = async (serverId, clickType) => {
     try {
       await axios.post(`${API}/track-click`, {
@@ -386,23 +403,32 @@ const DirectoryPage = () => {
               type="text"
               placeholder="Search servers..."
               value={filters.search}
-              onChange={(e) => setFilters({...filters, search: e.target.value})}
+              list="search-suggestions"
+              onChange={(e) => {
+                setFilters({...filters, search: e.target.value});
+                fetchSuggestions(e.target.value);
+              }}
               className="px-4 py-2 border border-gray-300 rounded-md focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
             />
+            <datalist id="search-suggestions">
+              {suggestions.map((suggestion) => (
+                <option key={`${suggestion.kind}-${suggestion.id || suggestion.text}`} value={suggestion.text} />
+              ))}
+            </datalist>
             <select
               value={filters.category}
               onChange={(e) => setFilters({...filters, category: e.target.value})}
               className="px-4 py-2 border border-gray-300 rounded-md focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
             >
               <option value="">All Categories</option>
-              <option value="SEO Analytics">SEO Analytics</option>
-              <option value="Content Generation">Content Generation</option>
-              <option value="Social Media Management">Social Media Management</option>
-              <option value="Email Marketing">Email Marketing</option>
-              <option value="Performance Tracking">Performance Tracking</option>
-              <option value="Keyword Research">Keyword Research</option>
-              <option value="Competitor Analysis">Competitor Analysis</option>
-              <option value="Marketing Automation">Marketing Automation</option>
+              <option value="SEO Analytics">{withCount('SEO Analytics', facets?.category)}</option>
+              <option value="Content Generation">{withCount('Content Generation', facets?.category)}</option>
+              <option value="Social Media Management">{withCount('Social Media Management', facets?.category)}</option>
+              <option value="Email Marketing">{withCount('Email Marketing', facets?.category)}</option>
+              <option value="Performance Tracking">{withCount('Performance Tracking', facets?.category)}</option>
+              <option value="Keyword Research">{withCount('Keyword Research', facets?.category)}</option>
+              <option value="Competitor Analysis">{withCount('Competitor Analysis', facets?.category)}</option>
+              <option value="Marketing Automation">{withCount('Marketing Automation', facets?.category)}</option>
             </select>
             <select
               value={filters.pricing_model}
@@ -410,14 +436,14 @@ const DirectoryPage = () => {
               className="px-4 py-2 border border-gray-300 rounded-md focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
             >
               <option value="">All Pricing</option>
-              <option value="Free">Free</option>
-              <option value="Freemium">Freemium</option>
-              <option value="Paid">Paid</option>
-              <option value="Enterprise">Enterprise</option>
+              <option value="Free">{withCount('Free', facets?.pricing_model)}</option>
+              <option value="Freemium">{withCount('Freemium', facets?.pricing_model)}</option>
+              <option value="Paid">{withCount('Paid', facets?.pricing_model)}</option>
+              <option value="Enterprise">{withCount('Enterprise', facets?.pricing_model)}</option>
             </select>
           </div>
 
-          <p className="text-gray-600">Found {servers.length} MCP servers</p>
+          <p className="text-gray-600">Found {facets ? facets.total : servers.length} MCP servers</p>
         </div>
 
         {/* Server Grid */}